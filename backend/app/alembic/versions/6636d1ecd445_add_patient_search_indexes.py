@@ -0,0 +1,32 @@
+"""Add trigram and doctor_id indexes for patient search
+
+Revision ID: 6636d1ecd445
+Revises: f8e85c3e9d96
+Create Date: 2026-10-18 12:02:44.190375
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6636d1ecd445'
+down_revision = 'f8e85c3e9d96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Built concurrently so that existing deployments keep serving requests on
+    # a large user table while the indexes are built.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_user_doctor_id', 'user', ['doctor_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_user_full_name_trgm', 'user', ['full_name'], unique=False, postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_user_email_trgm', 'user', ['email'], unique=False, postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_email_trgm', table_name='user', postgresql_concurrently=True)
+        op.drop_index('ix_user_full_name_trgm', table_name='user', postgresql_concurrently=True)
+        op.drop_index('ix_user_doctor_id', table_name='user', postgresql_concurrently=True)
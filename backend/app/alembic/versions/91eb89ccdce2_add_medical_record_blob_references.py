@@ -0,0 +1,35 @@
+"""Add blob store references to medicalrecord
+
+Revision ID: 91eb89ccdce2
+Revises: 6636d1ecd445
+Create Date: 2026-10-18 14:05:41.218930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '91eb89ccdce2'
+down_revision = '6636d1ecd445'
+branch_labels = None
+depends_on = None
+
+BLOBS = ('pdf_resume', 'scanner_image')
+
+
+def upgrade():
+    # Existing bytes are moved out of the table by app/move_medical_record_blobs.py
+    for blob in BLOBS:
+        op.add_column('medicalrecord', sa.Column(f'{blob}_key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+        op.add_column('medicalrecord', sa.Column(f'{blob}_size', sa.BigInteger(), nullable=True))
+        op.add_column('medicalrecord', sa.Column(f'{blob}_content_type', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+
+
+def downgrade():
+    # Files already moved to the blob store are not copied back
+    for blob in BLOBS:
+        op.drop_column('medicalrecord', f'{blob}_content_type')
+        op.drop_column('medicalrecord', f'{blob}_size')
+        op.drop_column('medicalrecord', f'{blob}_key')
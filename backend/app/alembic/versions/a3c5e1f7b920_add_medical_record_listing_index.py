@@ -0,0 +1,23 @@
+"""Add (patient_id, record_date, id) index on medicalrecord
+
+Revision ID: a3c5e1f7b920
+Revises: 91eb89ccdce2
+Create Date: 2026-10-18 14:48:12.604317
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e1f7b920'
+down_revision = '91eb89ccdce2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_medicalrecord_patient_id_record_date_id', 'medicalrecord', ['patient_id', 'record_date', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_medicalrecord_patient_id_record_date_id', table_name='medicalrecord')
@@ -0,0 +1,54 @@
+"""Store appointments as a start/end range that cannot overlap per doctor
+
+Revision ID: a9f3d6e2c851
+Revises: e1c4a7f9d286
+Create Date: 2026-10-18 19:04:51.327810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9f3d6e2c851'
+down_revision = 'e1c4a7f9d286'
+branch_labels = None
+depends_on = None
+
+
+APPOINTMENT_RANGE = "tsrange(starts_at, ends_at, '[)')"
+# appointment_date had no duration: existing appointments get this one
+LEGACY_DURATION = '30 minutes'
+
+
+def upgrade():
+    # GiST operator class for the equality on doctor_id in the constraint
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('appointment', sa.Column('starts_at', sa.DateTime(), nullable=True))
+    op.add_column('appointment', sa.Column('ends_at', sa.DateTime(), nullable=True))
+    # "YYYY-MM-DD HH:MM:SS" strings; a malformed one aborts the migration
+    op.execute(
+        f"UPDATE appointment SET starts_at = appointment_date::timestamp, "
+        f"ends_at = appointment_date::timestamp + interval '{LEGACY_DURATION}'"
+    )
+    op.alter_column('appointment', 'starts_at', nullable=False)
+    op.alter_column('appointment', 'ends_at', nullable=False)
+    op.drop_column('appointment', 'appointment_date')
+    op.create_check_constraint('appointment_ends_after_start', 'appointment', 'ends_at > starts_at')
+    # Fails, naming the conflicting rows, if existing appointments of a doctor
+    # already overlap: they have to be moved before upgrading.
+    op.execute(
+        f"ALTER TABLE appointment ADD CONSTRAINT appointment_doctor_id_range_excl "
+        f"EXCLUDE USING gist (doctor_id WITH =, {APPOINTMENT_RANGE} WITH &&)"
+    )
+
+
+def downgrade():
+    op.add_column('appointment', sa.Column('appointment_date', sqlmodel.sql.sqltypes.AutoString(length=19), nullable=True))
+    op.execute("UPDATE appointment SET appointment_date = to_char(starts_at, 'YYYY-MM-DD HH24:MI:SS')")
+    op.alter_column('appointment', 'appointment_date', nullable=False)
+    op.drop_constraint('appointment_doctor_id_range_excl', 'appointment')
+    op.drop_constraint('appointment_ends_after_start', 'appointment')
+    op.drop_column('appointment', 'ends_at')
+    op.drop_column('appointment', 'starts_at')
@@ -0,0 +1,122 @@
+"""Add weekly appointment stats rollup maintained by triggers
+
+Revision ID: b3e8c5f1a947
+Revises: a9f3d6e2c851
+Create Date: 2026-10-18 20:11:08.562134
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8c5f1a947'
+down_revision = 'a9f3d6e2c851'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_appointment_doctor_id_starts_at', 'appointment', ['doctor_id', 'starts_at'], unique=False)
+    op.create_table('weeklyappointmentstats',
+    sa.Column('doctor_id', sa.Uuid(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('appointments', sa.Integer(), nullable=False),
+    sa.Column('patients', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['doctor_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('doctor_id', 'week')
+    )
+    # Recomputes the given (doctor, week) rows from that doctor's appointments
+    # of that week. The rows are locked first, in a fixed order: a concurrent
+    # writer of the same week waits, then counts with a fresh snapshot that
+    # includes the first one's appointments.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION weekly_appointment_stats_sync(doctor_ids uuid[], weeks date[])
+        RETURNS void AS $$
+        BEGIN
+            INSERT INTO weeklyappointmentstats (doctor_id, week, appointments, patients)
+            SELECT k.doctor_id, k.week, 0, 0 FROM unnest(doctor_ids, weeks) AS k(doctor_id, week)
+            ORDER BY 1, 2
+            ON CONFLICT (doctor_id, week) DO NOTHING;
+            PERFORM 1 FROM weeklyappointmentstats s
+            JOIN unnest(doctor_ids, weeks) AS k(doctor_id, week)
+                ON s.doctor_id = k.doctor_id AND s.week = k.week
+            ORDER BY s.doctor_id, s.week
+            FOR UPDATE OF s;
+            UPDATE weeklyappointmentstats s
+            SET appointments = c.appointments, patients = c.patients
+            FROM (
+                SELECT k.doctor_id, k.week, count(a.id) AS appointments,
+                       count(DISTINCT a.patient_id) AS patients
+                FROM unnest(doctor_ids, weeks) AS k(doctor_id, week)
+                LEFT JOIN appointment a ON a.doctor_id = k.doctor_id
+                    AND a.starts_at >= k.week AND a.starts_at < k.week + 7
+                GROUP BY k.doctor_id, k.week
+            ) c
+            WHERE s.doctor_id = c.doctor_id AND s.week = c.week;
+            DELETE FROM weeklyappointmentstats s
+            USING unnest(doctor_ids, weeks) AS k(doctor_id, week)
+            WHERE s.doctor_id = k.doctor_id AND s.week = k.week AND s.appointments = 0;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Statement-level triggers: a bulk import recomputes each week it touches
+    # once, not once per appointment.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION weekly_appointment_stats_refresh() RETURNS trigger AS $$
+        DECLARE
+            doctor_ids uuid[];
+            weeks date[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT array_agg(doctor_id), array_agg(week) INTO doctor_ids, weeks FROM (
+                    SELECT DISTINCT doctor_id, date_trunc('week', starts_at)::date AS week FROM new_rows
+                ) k;
+            ELSIF TG_OP = 'UPDATE' THEN
+                SELECT array_agg(doctor_id), array_agg(week) INTO doctor_ids, weeks FROM (
+                    SELECT doctor_id, date_trunc('week', starts_at)::date AS week FROM new_rows
+                    UNION
+                    SELECT doctor_id, date_trunc('week', starts_at)::date FROM old_rows
+                ) k;
+            ELSE
+                SELECT array_agg(doctor_id), array_agg(week) INTO doctor_ids, weeks FROM (
+                    SELECT DISTINCT doctor_id, date_trunc('week', starts_at)::date AS week FROM old_rows
+                ) k;
+            END IF;
+            IF doctor_ids IS NOT NULL THEN
+                PERFORM weekly_appointment_stats_sync(doctor_ids, weeks);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER weekly_appointment_stats_insert
+        AFTER INSERT ON appointment REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION weekly_appointment_stats_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER weekly_appointment_stats_update
+        AFTER UPDATE ON appointment REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION weekly_appointment_stats_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER weekly_appointment_stats_delete
+        AFTER DELETE ON appointment REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION weekly_appointment_stats_refresh()
+    """)
+    op.execute("""
+        SELECT weekly_appointment_stats_sync(array_agg(doctor_id), array_agg(week)) FROM (
+            SELECT DISTINCT doctor_id, date_trunc('week', starts_at)::date AS week FROM appointment
+        ) k
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS weekly_appointment_stats_delete ON appointment")
+    op.execute("DROP TRIGGER IF EXISTS weekly_appointment_stats_update ON appointment")
+    op.execute("DROP TRIGGER IF EXISTS weekly_appointment_stats_insert ON appointment")
+    op.execute("DROP FUNCTION IF EXISTS weekly_appointment_stats_refresh()")
+    op.execute("DROP FUNCTION IF EXISTS weekly_appointment_stats_sync(uuid[], date[])")
+    op.drop_table('weeklyappointmentstats')
+    op.drop_index('ix_appointment_doctor_id_starts_at', table_name='appointment')
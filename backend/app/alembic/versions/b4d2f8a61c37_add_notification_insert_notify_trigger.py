@@ -0,0 +1,38 @@
+"""Publish inserted notifications with NOTIFY
+
+Revision ID: b4d2f8a61c37
+Revises: a3c5e1f7b920
+Create Date: 2026-10-18 15:31:27.840215
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d2f8a61c37'
+down_revision = 'a3c5e1f7b920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every worker LISTENs on this channel to push new notifications to the
+    # dashboards connected to it. NOTIFY is only delivered on commit.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notification_notify_insert() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('notification', row_to_json(NEW)::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notification_notify_insert
+        AFTER INSERT ON notification
+        FOR EACH ROW EXECUTE FUNCTION notification_notify_insert()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS notification_notify_insert ON notification")
+    op.execute("DROP FUNCTION IF EXISTS notification_notify_insert()")
@@ -0,0 +1,90 @@
+"""Add notification read state, unread counter and (doctor_id, created_at) index
+
+Revision ID: c7e9a4d2b615
+Revises: b4d2f8a61c37
+Create Date: 2026-10-18 16:05:42.318907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e9a4d2b615'
+down_revision = 'b4d2f8a61c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('notification', sa.Column('read_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_notification_doctor_id_created_at', 'notification', ['doctor_id', 'created_at'], unique=False)
+    op.create_table('notificationcounter',
+    sa.Column('doctor_id', sa.Uuid(), nullable=False),
+    sa.Column('unread', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['doctor_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('doctor_id')
+    )
+    # Statement-level triggers: a bulk "mark read" updates each doctor's
+    # counter once, not once per notification.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notification_count_unread() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO notificationcounter (doctor_id, unread)
+                SELECT doctor_id, count(*) FROM new_rows
+                WHERE read_at IS NULL GROUP BY doctor_id
+                ON CONFLICT (doctor_id)
+                DO UPDATE SET unread = notificationcounter.unread + EXCLUDED.unread;
+            ELSIF TG_OP = 'UPDATE' THEN
+                UPDATE notificationcounter c SET unread = c.unread + d.delta
+                FROM (
+                    SELECT n.doctor_id, sum(
+                        (o.read_at IS NOT NULL)::int - (n.read_at IS NOT NULL)::int
+                    ) AS delta
+                    FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    GROUP BY n.doctor_id
+                ) d
+                WHERE c.doctor_id = d.doctor_id AND d.delta <> 0;
+            ELSE
+                UPDATE notificationcounter c SET unread = c.unread - d.removed
+                FROM (
+                    SELECT doctor_id, count(*) AS removed FROM old_rows
+                    WHERE read_at IS NULL GROUP BY doctor_id
+                ) d
+                WHERE c.doctor_id = d.doctor_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notification_count_unread_insert
+        AFTER INSERT ON notification REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()
+    """)
+    op.execute("""
+        CREATE TRIGGER notification_count_unread_update
+        AFTER UPDATE ON notification REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()
+    """)
+    op.execute("""
+        CREATE TRIGGER notification_count_unread_delete
+        AFTER DELETE ON notification REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()
+    """)
+    # Existing notifications have never been read
+    op.execute("""
+        INSERT INTO notificationcounter (doctor_id, unread)
+        SELECT doctor_id, count(*) FROM notification GROUP BY doctor_id
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS notification_count_unread_delete ON notification")
+    op.execute("DROP TRIGGER IF EXISTS notification_count_unread_update ON notification")
+    op.execute("DROP TRIGGER IF EXISTS notification_count_unread_insert ON notification")
+    op.execute("DROP FUNCTION IF EXISTS notification_count_unread()")
+    op.drop_table('notificationcounter')
+    op.drop_index('ix_notification_doctor_id_created_at', table_name='notification')
+    op.drop_column('notification', 'read_at')
@@ -0,0 +1,34 @@
+"""Add LLM response cache table
+
+Revision ID: d0a2287c4f83
+Revises: cfec8b71bc4e
+Create Date: 2026-10-18 09:12:31.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0a2287c4f83'
+down_revision = 'cfec8b71bc4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llmcacheentry',
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('model', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('response', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_llmcacheentry_expires_at'), 'llmcacheentry', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_llmcacheentry_expires_at'), table_name='llmcacheentry')
+    op.drop_table('llmcacheentry')
@@ -0,0 +1,38 @@
+"""Add doctormessage table
+
+Revision ID: d5b8f1c3e742
+Revises: c7e9a4d2b615
+Create Date: 2026-10-18 16:41:09.552163
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b8f1c3e742'
+down_revision = 'c7e9a4d2b615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('doctormessage',
+    sa.Column('patient_id', sa.Uuid(), nullable=False),
+    sa.Column('content', sqlmodel.sql.sqltypes.AutoString(length=5000), nullable=False),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('doctor_id', sa.Uuid(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['doctor_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['patient_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_doctormessage_doctor_id_patient_id_sent_at', 'doctormessage', ['doctor_id', 'patient_id', 'sent_at'], unique=False)
+    op.create_index('ix_doctormessage_doctor_id_sent_at', 'doctormessage', ['doctor_id', 'sent_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_doctormessage_doctor_id_sent_at', table_name='doctormessage')
+    op.drop_index('ix_doctormessage_doctor_id_patient_id_sent_at', table_name='doctormessage')
+    op.drop_table('doctormessage')
@@ -0,0 +1,45 @@
+"""Add outboundemail queue
+
+Revision ID: e1c4a7f9d286
+Revises: d5b8f1c3e742
+Create Date: 2026-10-18 17:12:36.094518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c4a7f9d286'
+down_revision = 'd5b8f1c3e742'
+branch_labels = None
+depends_on = None
+
+
+emailstatus = postgresql.ENUM('pending', 'sent', 'failed', name='emailstatus', create_type=False)
+
+
+def upgrade():
+    emailstatus.create(op.get_bind(), checkfirst=True)
+    op.create_table('outboundemail',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('email_to', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(length=1024), nullable=False),
+    sa.Column('html_content', sa.Text(), nullable=False),
+    sa.Column('status', emailstatus, nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(length=1024), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outboundemail_pending_next_attempt_at', 'outboundemail', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_outboundemail_pending_next_attempt_at', table_name='outboundemail', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('outboundemail')
+    emailstatus.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,60 @@
+"""Add LLM batch job tables
+
+Revision ID: e7781ccf886f
+Revises: d0a2287c4f83
+Create Date: 2026-10-18 10:05:47.216530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7781ccf886f'
+down_revision = 'd0a2287c4f83'
+branch_labels = None
+depends_on = None
+
+
+llmbatchstatus = postgresql.ENUM('pending', 'running', 'completed', 'failed', name='llmbatchstatus', create_type=False)
+
+
+def upgrade():
+    llmbatchstatus.create(op.get_bind(), checkfirst=True)
+    op.create_table('llmbatchjob',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('doctor_id', sa.Uuid(), nullable=False),
+    sa.Column('status', llmbatchstatus, nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('notify_each', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['doctor_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_llmbatchjob_doctor_id'), 'llmbatchjob', ['doctor_id'], unique=False)
+    op.create_table('llmbatchitem',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('job_id', sa.Uuid(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('prompt', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('status', llmbatchstatus, nullable=False),
+    sa.Column('result', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('error', sqlmodel.sql.sqltypes.AutoString(length=1024), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['llmbatchjob.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_llmbatchitem_job_id'), 'llmbatchitem', ['job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_llmbatchitem_job_id'), table_name='llmbatchitem')
+    op.drop_table('llmbatchitem')
+    op.drop_index(op.f('ix_llmbatchjob_doctor_id'), table_name='llmbatchjob')
+    op.drop_table('llmbatchjob')
+    llmbatchstatus.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,31 @@
+"""Claim outbound emails before sending
+
+Revision ID: f7a2d9c4b518
+Revises: b3e8c5f1a947
+Create Date: 2026-10-18 21:04:52.317806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a2d9c4b518'
+down_revision = 'b3e8c5f1a947'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A new enum value can't be used in the transaction that adds it
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE emailstatus ADD VALUE IF NOT EXISTS 'sending' AFTER 'pending'")
+    op.drop_index('ix_outboundemail_pending_next_attempt_at', table_name='outboundemail', postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('ix_outboundemail_due_next_attempt_at', 'outboundemail', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status IN ('pending', 'sending')"))
+
+
+def downgrade():
+    # Postgres can't drop an enum value: claimed emails go back to pending
+    op.drop_index('ix_outboundemail_due_next_attempt_at', table_name='outboundemail', postgresql_where=sa.text("status IN ('pending', 'sending')"))
+    op.execute("UPDATE outboundemail SET status = 'pending' WHERE status = 'sending'")
+    op.create_index('ix_outboundemail_pending_next_attempt_at', 'outboundemail', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
@@ -0,0 +1,23 @@
+"""Add (owner_id, id) index on item for keyset pagination
+
+Revision ID: f8e85c3e9d96
+Revises: e7781ccf886f
+Create Date: 2026-10-18 11:20:09.553104
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8e85c3e9d96'
+down_revision = 'e7781ccf886f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_item_owner_id_id', 'item', ['owner_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_owner_id_id', table_name='item')
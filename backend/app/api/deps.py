@@ -1,4 +1,5 @@
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 import jwt
@@ -7,11 +8,13 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.db import async_engine, engine
+from app.core.principals import principal_cache
+from app.models import Principal, TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -23,43 +26,107 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def _token_user_id(token: str) -> uuid.UUID:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         token_data = TokenPayload(**payload)
-    except (InvalidTokenError, ValidationError):
+        return uuid.UUID(token_data.sub)
+    except (InvalidTokenError, ValidationError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+
+
+def get_current_principal(session: SessionDep, token: TokenDep) -> Principal:
+    """
+    Authenticate the request. The user row is only read on a principal cache
+    miss, so most requests do not touch the database here.
+    """
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.model_validate(user)
+        principal_cache.set(principal)
+        # Give the connection back to the pool now: streaming responses keep
+        # this session open for as long as the client stays connected.
+        session.close()
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
+
+
+async def get_current_principal_async(
+    session: AsyncSessionDep, token: TokenDep
+) -> Principal:
+    """`get_current_principal` for async endpoints, run on the event loop."""
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.model_validate(user)
+        principal_cache.set(principal)
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+AsyncCurrentPrincipal = Annotated[Principal, Depends(get_current_principal_async)]
+
+
+def get_current_user(session: SessionDep, principal: CurrentPrincipal) -> User:
+    """The full user row, for endpoints that modify it or need more than the principal."""
+    user = session.get(User, principal.id)
     if not user:
+        principal_cache.invalidate(principal.id)
         raise HTTPException(status_code=404, detail="User not found")
-    if not user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentPrincipal) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return current_user
 
-def get_current_active_doctor(current_user: User = Depends(get_current_user)) -> User:
+
+def get_current_active_doctor(current_user: CurrentPrincipal) -> Principal:
+    return _require_doctor(current_user)
+
+
+async def get_current_active_doctor_async(
+    current_user: AsyncCurrentPrincipal,
+) -> Principal:
+    return _require_doctor(current_user)
+
+
+def _require_doctor(current_user: Principal) -> Principal:
     if not current_user.specialization:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User is not a doctor"
+            status_code=status.HTTP_403_FORBIDDEN, detail="User is not a doctor"
         )
-    return current_user
\ No newline at end of file
+    return current_user
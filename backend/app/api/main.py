@@ -1,14 +1,27 @@
 from fastapi import APIRouter
 
-from app.api.routes import items, login, private, users, utils, doctor_dashboard
+from app.api.routes import (
+    async_reads,
+    doctor_dashboard,
+    items,
+    login,
+    medical_records,
+    private,
+    users,
+    utils,
+)
 from app.core.config import settings
 
 api_router = APIRouter()
+# Registered first, so that they take the paths of the sync handlers
+if settings.ASYNC_READ_ENDPOINTS:
+    api_router.include_router(async_reads.router)
 api_router.include_router(login.router)
 api_router.include_router(users.router)
 api_router.include_router(utils.router)
 api_router.include_router(items.router)
 api_router.include_router(doctor_dashboard.router)
+api_router.include_router(medical_records.router)
 
 
 if settings.ENVIRONMENT == "local":
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import Dialect, TextClause, text
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+T = TypeVar("T")
+
+
+class CountMode(str, Enum):
+    none = "none"
+    # Planner row estimate, without scanning the table
+    estimated = "estimated"
+    exact = "exact"
+
+
+def encode_cursor(key: uuid.UUID) -> str:
+    return _encode({"id": str(key)})
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    payload = _decode(cursor)
+    try:
+        return uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_ranked_cursor(score: float, key: uuid.UUID) -> str:
+    return _encode({"score": score, "id": str(key)})
+
+
+def decode_ranked_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    payload = _decode(cursor)
+    try:
+        return float(payload["score"]), uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_dated_cursor(date: str, key: uuid.UUID) -> str:
+    return _encode({"date": date, "id": str(key)})
+
+
+def decode_dated_cursor(cursor: str) -> tuple[str, uuid.UUID]:
+    payload = _decode(cursor)
+    try:
+        return str(payload["date"]), uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_timestamp_cursor(timestamp: datetime, key: uuid.UUID) -> str:
+    return encode_dated_cursor(timestamp.isoformat(), key)
+
+
+def decode_timestamp_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    date, key = decode_dated_cursor(cursor)
+    try:
+        return datetime.fromisoformat(date), key
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _encode(payload: dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> Any:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def count_rows(
+    session: Session, statement: SelectOfScalar[Any], mode: CountMode
+) -> int | None:
+    """
+    Count the rows `statement` would return, without its ORDER BY/LIMIT.
+
+    Nothing is counted unless asked: `estimated` returns the planner's row
+    estimate, which costs no table scan, and only `exact` runs a COUNT(*).
+    """
+    if mode == CountMode.none:
+        return None
+    if mode == CountMode.estimated:
+        explain = _explain(statement, session.get_bind().dialect)
+        return _plan_rows(session.exec(explain).scalar_one())  # type: ignore
+    return session.exec(_count_statement(statement)).one()
+
+
+async def count_rows_async(
+    session: AsyncSession, statement: SelectOfScalar[Any], mode: CountMode
+) -> int | None:
+    """`count_rows` with an async session."""
+    if mode == CountMode.none:
+        return None
+    if mode == CountMode.estimated:
+        explain = _explain(statement, session.sync_session.get_bind().dialect)
+        return _plan_rows((await session.execute(explain)).scalar_one())
+    return (await session.exec(_count_statement(statement))).one()
+
+
+def _count_statement(statement: SelectOfScalar[Any]) -> SelectOfScalar[int]:
+    return select(func.count()).select_from(statement.subquery())
+
+
+def _explain(statement: SelectOfScalar[Any], dialect: Dialect) -> TextClause:
+    compiled = statement.compile(
+        dialect=dialect, compile_kwargs={"literal_binds": True}
+    )
+    return text(f"EXPLAIN (FORMAT JSON) {compiled}")
+
+
+def _plan_rows(plan: Any) -> int:
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def paginate(
+    session: Session,
+    statement: SelectOfScalar[T],
+    key: Any,
+    *,
+    cursor: str | None,
+    skip: int,
+    limit: int,
+) -> tuple[list[T], str | None]:
+    """
+    Fetch one page of `statement` ordered by the indexed, unique `key` column.
+
+    With a cursor the query seeks past the last key of the previous page, so
+    its cost does not grow with the page number. Without one, `skip` is
+    applied as an offset for clients that still page by number.
+    """
+    statement = _page_statement(statement, key, cursor=cursor, skip=skip, limit=limit)
+    return _page(list(session.exec(statement).all()), key, limit)
+
+
+async def paginate_async(
+    session: AsyncSession,
+    statement: SelectOfScalar[T],
+    key: Any,
+    *,
+    cursor: str | None,
+    skip: int,
+    limit: int,
+) -> tuple[list[T], str | None]:
+    """`paginate` with an async session."""
+    statement = _page_statement(statement, key, cursor=cursor, skip=skip, limit=limit)
+    return _page(list((await session.exec(statement)).all()), key, limit)
+
+
+def _page_statement(
+    statement: SelectOfScalar[T],
+    key: Any,
+    *,
+    cursor: str | None,
+    skip: int,
+    limit: int,
+) -> SelectOfScalar[T]:
+    statement = statement.order_by(key)
+    if cursor is not None:
+        statement = statement.where(key > decode_cursor(cursor))
+    elif skip:
+        statement = statement.offset(skip)
+    return statement.limit(limit + 1)
+
+
+def _page(rows: list[T], key: Any, limit: int) -> tuple[list[T], str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], key.key))
@@ -0,0 +1,71 @@
+from typing import BinaryIO
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.blob_store import iter_range
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single `bytes=` Range header into inclusive (start, end) offsets.
+
+    Returns None when the whole content should be sent: no header, another
+    unit, or several ranges (allowed by RFC 9110, and rare enough in practice
+    that answering with the full body is simpler than multipart/byteranges).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start or start < 0:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def range_response(
+    file: BinaryIO,
+    *,
+    size: int,
+    media_type: str,
+    range_header: str | None,
+    etag: str | None = None,
+) -> StreamingResponse:
+    """Stream `file`, or the part of it requested by `range_header`, in chunks."""
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    try:
+        byte_range = parse_range(range_header, size)
+    except HTTPException:
+        file.close()
+        raise
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_range(file, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
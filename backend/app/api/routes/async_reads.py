@@ -0,0 +1,152 @@
+"""
+Async versions of the read endpoints that mostly wait on Postgres, served from
+the async engine instead of the sync handlers when ASYNC_READ_ENDPOINTS is set.
+
+They share their queries with the sync handlers and return the same responses.
+app/benchmarks/async_endpoints.py compares both versions.
+"""
+
+from datetime import datetime
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import col, select
+
+from app import crud
+from app.api.deps import (
+    AsyncCurrentPrincipal,
+    AsyncSessionDep,
+    get_current_active_doctor_async,
+)
+from app.api.pagination import (
+    CountMode,
+    count_rows_async,
+    decode_ranked_cursor,
+    decode_timestamp_cursor,
+    encode_ranked_cursor,
+    encode_timestamp_cursor,
+    paginate_async,
+)
+from app.models import (
+    Item,
+    ItemsPublic,
+    NotificationPublic,
+    NotificationsPublic,
+    PatientPublic,
+    PatientsPublic,
+    Principal,
+    User,
+)
+
+router = APIRouter()
+
+AsyncCurrentDoctor = Annotated[Principal, Depends(get_current_active_doctor_async)]
+
+
+@router.get("/items/", response_model=ItemsPublic, tags=["items"])
+async def read_items(
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentPrincipal,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = CountMode.none,
+) -> Any:
+    """
+    Retrieve items.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page, and
+    `count=exact` (or `estimated`, from the query planner) to get a total.
+    """
+    statement = select(Item)
+    if not current_user.is_superuser:
+        statement = statement.where(Item.owner_id == current_user.id)
+    items, next_cursor = await paginate_async(
+        session, statement, col(Item.id), cursor=cursor, skip=skip, limit=limit
+    )
+    total = await count_rows_async(session, statement, count)
+    return ItemsPublic(data=items, count=total, next_cursor=next_cursor)
+
+
+@router.get(
+    "/doctor/notifications", response_model=NotificationsPublic, tags=["doctor"]
+)
+async def get_notifications(
+    session: AsyncSessionDep,
+    current_doctor: AsyncCurrentDoctor,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    unread_only: bool = False,
+) -> Any:
+    """
+    Notifications of the current doctor, newest first. Pass `next_cursor` as
+    `cursor` for the next page, and `since` to only get the notifications
+    created since the last call. `unread` is the total of unread ones.
+    """
+    after = decode_timestamp_cursor(cursor) if cursor else None
+    notifications = await crud.list_notifications_async(
+        session=session,
+        doctor_id=current_doctor.id,
+        limit=limit + 1,
+        after=after,
+        since=since,
+        unread_only=unread_only,
+    )
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        next_cursor = encode_timestamp_cursor(last.created_at, last.id)
+    return NotificationsPublic(
+        data=[NotificationPublic.model_validate(n) for n in notifications],
+        next_cursor=next_cursor,
+        unread=await crud.get_unread_notification_count_async(
+            session=session, doctor_id=current_doctor.id
+        ),
+    )
+
+
+@router.get("/doctor/patients", response_model=PatientsPublic, tags=["doctor"])
+async def search_patients(
+    session: AsyncSessionDep,
+    current_doctor: AsyncCurrentDoctor,
+    q: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+) -> Any:
+    """
+    Patients of the current doctor matching `q` by name or email, best matches
+    first; all of them without `q`. Pass `next_cursor` as `cursor` for the
+    next page.
+    """
+    if not q:
+        statement = select(User).where(User.doctor_id == current_doctor.id)
+        patients, next_cursor = await paginate_async(
+            session, statement, col(User.id), cursor=cursor, skip=0, limit=limit
+        )
+        return PatientsPublic(
+            data=[PatientPublic.model_validate(patient) for patient in patients],
+            next_cursor=next_cursor,
+        )
+
+    after = decode_ranked_cursor(cursor) if cursor else None
+    rows = await crud.search_patients_async(
+        session=session,
+        doctor_id=current_doctor.id,
+        q=q,
+        limit=limit + 1,
+        after=after,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_patient, last_score = rows[-1]
+        next_cursor = encode_ranked_cursor(last_score, last_patient.id)
+    return PatientsPublic(
+        data=[
+            PatientPublic.model_validate(patient, update={"score": score})
+            for patient, score in rows
+        ],
+        next_cursor=next_cursor,
+    )
@@ -1,107 +1,573 @@
 from __future__ import annotations
+
+import json
+import time
 import uuid
-from typing import List, Optional
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from datetime import datetime
-import httpx
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.db import get_session
-from app.models import LLMAnalyzeRequest, Notification, User, Message
-from app.api.deps import get_current_active_doctor
-from app.services.llm_service import generate_content
+from app import crud
+from app.api.deps import (
+    get_async_db,
+    get_current_active_doctor,
+    get_current_active_doctor_async,
+    get_db,
+)
+from app.api.pagination import (
+    decode_ranked_cursor,
+    decode_timestamp_cursor,
+    encode_ranked_cursor,
+    encode_timestamp_cursor,
+    paginate,
+)
+from app.models import (
+    AppointmentCreate,
+    AppointmentPublic,
+    AppointmentsPublic,
+    DoctorDashboardPublic,
+    DoctorMessageCreate,
+    DoctorMessagePublic,
+    DoctorMessagesPublic,
+    DoctorMessagesSend,
+    LLMAnalyzeRequest,
+    LLMBatchJob,
+    LLMBatchJobPublic,
+    LLMBatchRequest,
+    NotificationPublic,
+    NotificationsMarkRead,
+    NotificationsPublic,
+    NotificationUnreadCount,
+    PatientPublic,
+    PatientsPublic,
+    Principal,
+    User,
+    WeeklyAppointmentStatsList,
+    WeeklyAppointmentStatsPublic,
+    naive_utc,
+)
+from app.services.llm_batch import run_batch_job
+from app.services.llm_service import (
+    LLMOverloadedError,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    llm_gateway,
+)
+from app.services.notification_hub import notification_events, notification_hub
 
 router = APIRouter(prefix="/doctor", tags=["doctor"])
 
 
-@router.get("/notifications", response_model=List[Notification])
+@router.get("/dashboard", response_model=DoctorDashboardPublic)
+async def get_dashboard(
+    appointments: int = Query(default=5, ge=1, le=50),
+    notifications: int = Query(default=10, ge=1, le=50),
+    session: AsyncSession = Depends(get_async_db),
+    current_doctor: Principal = Depends(get_current_active_doctor_async)
+) -> Any:
+    """
+    Résumé affiché au chargement du tableau de bord, en une seule requête SQL :
+    notifications non lues, nombre de patients, les `appointments` prochains
+    rendez-vous et les `notifications` notifications les plus récentes.
+    """
+    unread, patients, upcoming, recent = await crud.get_doctor_dashboard_async(
+        session=session,
+        doctor_id=current_doctor.id,
+        now=datetime.now(timezone.utc),
+        appointments=appointments,
+        notifications=notifications,
+    )
+    return DoctorDashboardPublic(
+        unread_notifications=unread,
+        patients=patients,
+        upcoming_appointments=[AppointmentPublic.model_validate(a) for a in upcoming],
+        recent_notifications=[NotificationPublic.model_validate(n) for n in recent],
+    )
+
+
+@router.get("/notifications", response_model=NotificationsPublic)
 def get_notifications(
-    session: Session = Depends(get_session),
-    current_doctor: User = Depends(get_current_active_doctor)
-):
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    unread_only: bool = False,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Fil des notifications du médecin connecté, les plus récentes en premier.
+    Passer `next_cursor` en `cursor` pour la page suivante, et `since` pour ne
+    récupérer que les notifications créées depuis le dernier appel.
+    `unread` donne le nombre total de notifications non lues.
+    """
+    after = decode_timestamp_cursor(cursor) if cursor else None
+    notifications = crud.list_notifications(
+        session=session,
+        doctor_id=current_doctor.id,
+        limit=limit + 1,
+        after=after,
+        since=since,
+        unread_only=unread_only,
+    )
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        next_cursor = encode_timestamp_cursor(last.created_at, last.id)
+    return NotificationsPublic(
+        data=[NotificationPublic.model_validate(n) for n in notifications],
+        next_cursor=next_cursor,
+        unread=crud.get_unread_notification_count(
+            session=session, doctor_id=current_doctor.id
+        ),
+    )
+
+
+@router.get("/notifications/unread-count", response_model=NotificationUnreadCount)
+def get_unread_notification_count(
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Nombre de notifications non lues du médecin connecté (compteur tenu à jour
+    par la base, sans parcourir les notifications).
+    """
+    return NotificationUnreadCount(
+        unread=crud.get_unread_notification_count(
+            session=session, doctor_id=current_doctor.id
+        )
+    )
+
+
+@router.post("/notifications/read", response_model=NotificationUnreadCount)
+def mark_notifications_read(
+    body: NotificationsMarkRead,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Marque comme lues les notifications `ids`, ou toutes celles créées jusqu'à
+    `until` si `ids` est absent. Renvoie le nombre de notifications encore non lues.
+    """
+    crud.mark_notifications_read(
+        session=session,
+        doctor_id=current_doctor.id,
+        ids=body.ids,
+        until=body.until,
+    )
+    return NotificationUnreadCount(
+        unread=crud.get_unread_notification_count(
+            session=session, doctor_id=current_doctor.id
+        )
+    )
+
+
+@router.get("/notifications/stream", response_class=StreamingResponse)
+async def stream_notifications(
+    last_event_id: str | None = Header(default=None),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
     """
-    Récupère toutes les notifications du médecin connecté.
+    Pousse les nouvelles notifications du médecin connecté en Server-Sent Events,
+    au lieu de relire toute la liste à intervalle régulier : un événement
+    `notification` par ligne insérée, identifié par l'id de la notification.
+    À la reconnexion, l'en-tête `Last-Event-ID` fait renvoyer celles créées depuis.
     """
-    statement = select(Notification).where(Notification.doctor_id == current_doctor.id)
-    notifications = session.exec(statement).all()
-    return notifications
+    return StreamingResponse(
+        notification_events(notification_hub, current_doctor.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@router.get("/patients", response_model=List[User])
+@router.get("/patients", response_model=PatientsPublic)
 def search_patients(
-    q: Optional[str] = None,
-    session: Session = Depends(get_session),
-    current_doctor: User = Depends(get_current_active_doctor)
-):
-    """
-    Recherche des patients associés au médecin connecté par nom ou email.
-    """
-    statement = select(User).where(User.doctor_id == current_doctor.id)
-    if q:
-        # Recherche case-insensitive dans full_name et email
-        statement = statement.where(
-            User.full_name.ilike(f"%{q}%") | User.email.ilike(f"%{q}%")
+    q: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Recherche des patients associés au médecin connecté par nom ou email,
+    les plus pertinents en premier (similarité trigramme).
+    Sans `q`, liste les patients. Passer `next_cursor` en `cursor` pour la page suivante.
+    """
+    if not q:
+        statement = select(User).where(User.doctor_id == current_doctor.id)
+        patients, next_cursor = paginate(
+            session, statement, col(User.id), cursor=cursor, skip=0, limit=limit
         )
-    patients = session.exec(statement).all()
-    return patients
+        return PatientsPublic(
+            data=[PatientPublic.model_validate(patient) for patient in patients],
+            next_cursor=next_cursor,
+        )
+
+    after = decode_ranked_cursor(cursor) if cursor else None
+    rows = crud.search_patients(
+        session=session,
+        doctor_id=current_doctor.id,
+        q=q,
+        limit=limit + 1,
+        after=after,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_patient, last_score = rows[-1]
+        next_cursor = encode_ranked_cursor(last_score, last_patient.id)
+    return PatientsPublic(
+        data=[
+            PatientPublic.model_validate(patient, update={"score": score})
+            for patient, score in rows
+        ],
+        next_cursor=next_cursor,
+    )
 
 
-@router.get("/messages", response_model=List[Message])
+@router.get("/messages", response_model=DoctorMessagesPublic)
 def get_message_history(
-    patient_id: Optional[uuid.UUID] = None,
-    session: Session = Depends(get_session),
-    current_doctor: User = Depends(get_current_active_doctor)
-):
+    patient_id: uuid.UUID | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = None,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
     """
-    Récupère l'historique des messages du médecin connecté.
+    Récupère l'historique des messages du médecin connecté, les plus récents en premier.
     Optionnellement, filtre par identifiant de patient.
+    Passer `next_cursor` en `cursor` pour la page suivante.
     """
-    statement = select(Message).where(Message.doctor_id == current_doctor.id)
-    if patient_id:
-        statement = statement.where(Message.patient_id == patient_id)
-    messages = session.exec(statement).all()
-    return messages
+    after = decode_timestamp_cursor(cursor) if cursor else None
+    messages = crud.list_doctor_messages(
+        session=session,
+        doctor_id=current_doctor.id,
+        patient_id=patient_id,
+        limit=limit + 1,
+        after=after,
+    )
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        last = messages[-1]
+        next_cursor = encode_timestamp_cursor(last.sent_at, last.id)
+    return DoctorMessagesPublic(
+        data=[DoctorMessagePublic.model_validate(m) for m in messages],
+        next_cursor=next_cursor,
+    )
 
 
-@router.post("/llm/analyze", response_model=dict)
-def gemini_llm_analyze(
-    request: LLMAnalyzeRequest,
-    current_doctor: User = Depends(get_current_active_doctor)
-):
+@router.post(
+    "/llm/analyze",
+    response_model=dict,
+    dependencies=[Depends(get_current_active_doctor)],
+)
+async def gemini_llm_analyze(request: LLMAnalyzeRequest) -> Any:
     """
     Utilise l'API Gemini (ou un service LLM) pour générer du contenu à partir d'un prompt.
+    L'appel est asynchrone et borné par worker : 503 si la file d'attente est pleine,
+    504 si l'échéance est dépassée.
     """
     try:
-        generated_text = generate_content(request.prompt)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Gemini API error: {e}"
+        generated_text = await llm_gateway.generate(
+            request.prompt, use_cache=not request.bypass_cache
         )
+    except Exception as e:
+        raise _llm_http_error(e)
     return {"generated_text": generated_text}
 
 
+@router.post(
+    "/llm/analyze/stream",
+    response_class=StreamingResponse,
+    dependencies=[Depends(get_current_active_doctor)],
+)
+async def gemini_llm_analyze_stream(request: LLMAnalyzeRequest) -> Any:
+    """
+    Comme /llm/analyze, mais relaie la réponse au fil de sa génération en
+    Server-Sent Events : un événement `data: {"text": ...}` par fragment, puis
+    `event: done` avec le délai avant le premier fragment (`ttft_ms`).
+    La déconnexion du client annule l'appel au LLM.
+    """
+    start = time.perf_counter()
+    chunks = llm_gateway.stream(request.prompt, use_cache=not request.bypass_cache)
+    # Le premier fragment est attendu ici pour que les erreurs d'admission et
+    # d'échéance deviennent un vrai code HTTP plutôt qu'un événement du flux.
+    try:
+        first = await anext(chunks)
+    except StopAsyncIteration:
+        first = ""
+    except Exception as e:
+        raise _llm_http_error(e)
+    ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+    return StreamingResponse(
+        _sse_events(chunks, first, ttft_ms),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Time-To-First-Token-Ms": str(ttft_ms),
+        },
+    )
+
+
+@router.post(
+    "/llm/batch",
+    response_model=LLMBatchJobPublic,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def submit_llm_batch(
+    batch_in: LLMBatchRequest,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Soumet plusieurs prompts d'un coup. Les prompts sont traités en arrière-plan
+    avec un parallélisme borné ; les résultats sont enregistrés au fil de l'eau
+    et une notification de type `analysis` est créée à la fin du travail.
+    """
+    job = crud.create_llm_batch_job(
+        session=session, batch_in=batch_in, doctor_id=current_doctor.id
+    )
+    background_tasks.add_task(
+        run_batch_job, job.id, use_cache=not batch_in.bypass_cache
+    )
+    return LLMBatchJobPublic.model_validate(job, update={"items": []})
 
 
-@router.post("/messages/send", response_model=Message)
+@router.get("/llm/batch/{job_id}", response_model=LLMBatchJobPublic)
+def get_llm_batch(
+    job_id: uuid.UUID,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    État d'un travail en lot et résultats des prompts déjà traités.
+    """
+    job = session.get(LLMBatchJob, job_id)
+    if not job or job.doctor_id != current_doctor.id:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return LLMBatchJobPublic.model_validate(
+        job, update={"items": sorted(job.items, key=lambda item: item.position)}
+    )
+
+
+@router.get(
+    "/llm/stats",
+    response_model=dict,
+    dependencies=[Depends(get_current_active_doctor)],
+)
+def llm_gateway_stats() -> Any:
+    """
+    Charge courante et délais avant premier fragment de la passerelle LLM de ce worker.
+    """
+    return llm_gateway.stats()
+
+
+@router.get(
+    "/llm/cache",
+    response_model=dict,
+    dependencies=[Depends(get_current_active_doctor)],
+)
+def llm_cache_stats() -> Any:
+    """
+    Statistiques du cache de réponses LLM de ce worker.
+    """
+    if llm_gateway.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_gateway.cache.stats()}
+
+
+def _llm_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, LLMOverloadedError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM service overloaded: {e}",
+            headers={"Retry-After": "1"},
+        )
+    if isinstance(e, LLMTimeoutError):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e),
+        )
+    if isinstance(e, LLMUnavailableError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Gemini API error: {e}"
+    )
+
+
+def _sse(data: dict[str, Any], event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def _sse_events(
+    chunks: AsyncGenerator[str, None], first: str, ttft_ms: float
+) -> AsyncGenerator[str, None]:
+    async with aclosing(chunks):
+        try:
+            if first:
+                yield _sse({"text": first})
+            async for chunk in chunks:
+                yield _sse({"text": chunk})
+        except Exception as e:
+            yield _sse({"detail": str(e)}, event="error")
+            return
+    yield _sse({"ttft_ms": ttft_ms}, event="done")
+
+
+@router.post("/messages/send", response_model=DoctorMessagePublic)
 def send_message(
     patient_id: uuid.UUID,
-    content: str,
-    session: Session = Depends(get_session),
-    current_doctor: User = Depends(get_current_active_doctor)
-):
+    content: str = Query(min_length=1, max_length=5000),
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
     """
     Envoie un message du médecin à un patient.
     Ce message pourrait contenir la réponse générée par le LLM.
     """
-    new_message = Message(
-        doctor_id=current_doctor.id,
-        patient_id=patient_id,
-        content=content,
-        sent_at=datetime.utcnow().isoformat()
+    message_in = DoctorMessageCreate(patient_id=patient_id, content=content)
+    _check_patients(session, current_doctor, [patient_id])
+    [message] = crud.send_doctor_messages(
+        session=session, doctor_id=current_doctor.id, messages_in=[message_in]
+    )
+    return message
+
+
+@router.post("/messages/bulk", response_model=list[DoctorMessagePublic])
+def send_messages(
+    body: DoctorMessagesSend,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Envoie plusieurs messages d'un coup (par exemple le même rappel à plusieurs
+    patients), insérés en une seule requête. Tous les destinataires doivent
+    être des patients du médecin connecté.
+    """
+    _check_patients(session, current_doctor, [m.patient_id for m in body.messages])
+    return crud.send_doctor_messages(
+        session=session, doctor_id=current_doctor.id, messages_in=body.messages
+    )
+
+
+@router.get("/appointments", response_model=AppointmentsPublic)
+def get_appointments(
+    start: datetime,
+    end: datetime,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Agenda du médecin connecté : ses rendez-vous qui chevauchent [start, end),
+    dans l'ordre chronologique.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=422, detail="end must be after start")
+    appointments = crud.list_doctor_appointments(
+        session=session, doctor_id=current_doctor.id, start=start, end=end
+    )
+    return AppointmentsPublic(
+        data=[AppointmentPublic.model_validate(a) for a in appointments]
+    )
+
+
+@router.post("/appointments", response_model=AppointmentPublic)
+def create_appointment(
+    appointment_in: AppointmentCreate,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Réserve un créneau avec un patient du médecin connecté.
+    409 si le créneau chevauche un autre rendez-vous du médecin.
+    """
+    _check_patients(session, current_doctor, [appointment_in.patient_id])
+    appointment = crud.create_appointment(
+        session=session, appointment_in=appointment_in, doctor_id=current_doctor.id
+    )
+    if appointment is None:
+        raise HTTPException(
+            status_code=409, detail="The doctor already has an appointment then"
+        )
+    return appointment
+
+
+# Dix ans de semaines : borne la taille de la réponse
+MAX_STATS_WEEKS = 520
+
+
+@router.get("/stats/weekly", response_model=WeeklyAppointmentStatsList)
+def get_weekly_stats(
+    start: date,
+    end: date,
+    session: Session = Depends(get_db),
+    current_doctor: Principal = Depends(get_current_active_doctor)
+) -> Any:
+    """
+    Rendez-vous et patients distincts du médecin connecté pour chaque semaine
+    ISO de [start, end], lus dans le cumul hebdomadaire tenu à jour par la base
+    (aucun comptage sur `appointment`). Les semaines sans rendez-vous valent 0.
+    """
+    if end < start:
+        raise HTTPException(status_code=422, detail="end must not be before start")
+    first = start - timedelta(days=start.weekday())
+    last = end - timedelta(days=end.weekday())
+    weeks = (last - first).days // 7 + 1
+    if weeks > MAX_STATS_WEEKS:
+        raise HTTPException(
+            status_code=422, detail=f"At most {MAX_STATS_WEEKS} weeks at once"
+        )
+    rows = {
+        row.week: row
+        for row in crud.get_weekly_appointment_stats(
+            session=session, doctor_id=current_doctor.id, start=first, end=last
+        )
+    }
+    data = []
+    for i in range(weeks):
+        week = first + timedelta(weeks=i)
+        iso_year, iso_week, _ = week.isocalendar()
+        row = rows.get(week)
+        data.append(
+            WeeklyAppointmentStatsPublic(
+                week=week,
+                iso_year=iso_year,
+                iso_week=iso_week,
+                appointments=row.appointments if row else 0,
+                patients=row.patients if row else 0,
+            )
+        )
+    return WeeklyAppointmentStatsList(data=data)
+
+
+def _check_patients(
+    session: Session, current_doctor: Principal, patient_ids: list[uuid.UUID]
+) -> None:
+    found = crud.get_doctor_patient_ids(
+        session=session, doctor_id=current_doctor.id, patient_ids=patient_ids
     )
-    session.add(new_message)
-    session.commit()
-    session.refresh(new_message)
-    return new_message
+    if found != set(patient_ids):
+        raise HTTPException(status_code=404, detail="Patient not found")
@@ -2,47 +2,117 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlmodel import col, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app import crud
+from app.api.deps import CurrentPrincipal, SessionDep
+from app.api.pagination import CountMode, count_rows, paginate
+from app.models import (
+    Item,
+    ItemBatchCreate,
+    ItemBatchDelete,
+    ItemBatchResult,
+    ItemCreate,
+    ItemPublic,
+    ItemsBatch,
+    ItemsBatchResults,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+)
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
 @router.get("/", response_model=ItemsPublic)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentPrincipal,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = CountMode.none,
 ) -> Any:
     """
     Retrieve items.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page, and
+    `count=exact` (or `estimated`, from the query planner) to get a total.
+    """
+
+    statement = select(Item)
+    if not current_user.is_superuser:
+        statement = statement.where(Item.owner_id == current_user.id)
+    items, next_cursor = paginate(
+        session, statement, col(Item.id), cursor=cursor, skip=skip, limit=limit
+    )
+    total = count_rows(session, statement, count)
+
+    return ItemsPublic(data=items, count=total, next_cursor=next_cursor)
+
+
+@router.post("/batch", response_model=ItemsBatchResults)
+def batch_items(
+    *, session: SessionDep, current_user: CurrentPrincipal, batch: ItemsBatch
+) -> Any:
     """
+    Create, update and delete several items in one request and one transaction.
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        items = session.exec(statement).all()
-
-    return ItemsPublic(data=items, count=count)
+    Each operation gets a result, in the order of `operations`, with the status
+    its single-item endpoint would have returned. Operations that fail are
+    skipped and the others are applied. An item may only appear once per batch.
+    """
+    existing = crud.get_items_for_update(
+        session=session,
+        ids=[op.id for op in batch.operations if not isinstance(op, ItemBatchCreate)],
+    )
+    created: list[Item] = []
+    updated: list[ItemPublic] = []
+    deleted: list[uuid.UUID] = []
+    seen: set[uuid.UUID] = set()
+    results = []
+    for op in batch.operations:
+        if isinstance(op, ItemBatchCreate):
+            new_item = Item.model_validate(
+                op.item, update={"owner_id": current_user.id}
+            )
+            created.append(new_item)
+            results.append(
+                ItemBatchResult(status=200, item=ItemPublic.model_validate(new_item))
+            )
+            continue
+        target = existing.get(op.id)
+        if target is None:
+            results.append(ItemBatchResult(status=404, detail="Item not found"))
+        elif not current_user.is_superuser and target.owner_id != current_user.id:
+            results.append(ItemBatchResult(status=400, detail="Not enough permissions"))
+        elif op.id in seen:
+            results.append(
+                ItemBatchResult(status=400, detail="Item already changed in this batch")
+            )
+        elif isinstance(op, ItemBatchDelete):
+            seen.add(op.id)
+            deleted.append(op.id)
+            results.append(ItemBatchResult(status=200))
+        else:
+            changes = op.item.model_dump(exclude_unset=True)
+            if "title" in changes and changes["title"] is None:
+                results.append(
+                    ItemBatchResult(status=422, detail="title cannot be null")
+                )
+                continue
+            seen.add(op.id)
+            public = ItemPublic.model_validate(target, update=changes)
+            updated.append(public)
+            results.append(ItemBatchResult(status=200, item=public))
+    crud.write_items(session=session, created=created, updated=updated, deleted=deleted)
+    return ItemsBatchResults(data=results)
 
 
 @router.get("/{id}", response_model=ItemPublic)
-def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+def read_item(
+    session: SessionDep, current_user: CurrentPrincipal, id: uuid.UUID
+) -> Any:
     """
     Get item by ID.
     """
@@ -56,7 +126,7 @@ def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) ->
 
 @router.post("/", response_model=ItemPublic)
 def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+    *, session: SessionDep, current_user: CurrentPrincipal, item_in: ItemCreate
 ) -> Any:
     """
     Create new item.
@@ -72,7 +142,7 @@ def create_item(
 def update_item(
     *,
     session: SessionDep,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     id: uuid.UUID,
     item_in: ItemUpdate,
 ) -> Any:
@@ -94,7 +164,7 @@ def update_item(
 
 @router.delete("/{id}")
 def delete_item(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+    session: SessionDep, current_user: CurrentPrincipal, id: uuid.UUID
 ) -> Message:
     """
     Delete an item.
@@ -0,0 +1,164 @@
+import io
+import uuid
+from typing import Annotated, Any
+
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+
+from app import crud
+from app.api.deps import CurrentPrincipal, SessionDep
+from app.api.pagination import decode_dated_cursor, encode_dated_cursor
+from app.api.ranges import range_response
+from app.models import (
+    MedicalRecord,
+    MedicalRecordBlob,
+    MedicalRecordCreate,
+    MedicalRecordPublic,
+    MedicalRecordsPublic,
+    Principal,
+    User,
+)
+from app.services.blob_store import BlobNotFoundError, blob_store
+
+router = APIRouter(prefix="/medical-records", tags=["medical-records"])
+
+
+def _check_access(
+    session: Session, current_user: Principal, patient_id: uuid.UUID
+) -> None:
+    """Records are visible to their patient, the patient's doctor and superusers."""
+    if current_user.is_superuser or current_user.id == patient_id:
+        return
+    patient = session.get(User, patient_id)
+    if not patient or patient.doctor_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+
+@router.get("/", response_model=MedicalRecordsPublic)
+def read_medical_records(
+    session: SessionDep,
+    current_user: CurrentPrincipal,
+    patient_id: uuid.UUID,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+) -> Any:
+    """
+    List a patient's medical records, newest first.
+
+    Only metadata is returned: file contents are fetched one at a time from
+    the download endpoint. Pass the returned `next_cursor` as `cursor` to get
+    the next page.
+    """
+    _check_access(session, current_user, patient_id)
+    after = decode_dated_cursor(cursor) if cursor else None
+    records = crud.list_medical_records(
+        session=session, patient_id=patient_id, limit=limit + 1, after=after
+    )
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_dated_cursor(records[-1].record_date, records[-1].id)
+    return MedicalRecordsPublic(
+        data=[MedicalRecordPublic.model_validate(record) for record in records],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/{id}", response_model=MedicalRecordPublic)
+def read_medical_record(
+    session: SessionDep, current_user: CurrentPrincipal, id: uuid.UUID
+) -> Any:
+    """
+    Get a medical record's metadata by ID.
+    """
+    record = session.get(MedicalRecord, id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    _check_access(session, current_user, record.patient_id)
+    return record
+
+
+@router.post("/", response_model=MedicalRecordPublic)
+def create_medical_record(
+    session: SessionDep,
+    current_user: CurrentPrincipal,
+    patient_id: Annotated[uuid.UUID, Form()],
+    record_date: Annotated[str, Form(max_length=10)],
+    description: Annotated[str, Form(max_length=1024)],
+    pdf_resume: Annotated[UploadFile | None, File()] = None,
+    scanner_image: Annotated[UploadFile | None, File()] = None,
+) -> Any:
+    """
+    Create a medical record, uploading its files as multipart form data.
+
+    Files are copied to the blob store in chunks; only their key, size and
+    content type are stored in the database.
+    """
+    patient = session.get(User, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if not current_user.is_superuser and patient.doctor_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    blobs = {}
+    for blob, upload in [
+        (MedicalRecordBlob.pdf_resume, pdf_resume),
+        (MedicalRecordBlob.scanner_image, scanner_image),
+    ]:
+        if upload is not None:
+            blobs[blob] = (blob_store.put(upload.file), upload.content_type)
+
+    record_in = MedicalRecordCreate(
+        patient_id=patient_id, record_date=record_date, description=description
+    )
+    return crud.create_medical_record(session=session, record_in=record_in, blobs=blobs)
+
+
+@router.get("/{id}/{blob}", response_class=StreamingResponse)
+def download_medical_record_blob(
+    session: SessionDep,
+    current_user: CurrentPrincipal,
+    id: uuid.UUID,
+    blob: MedicalRecordBlob,
+    range: Annotated[str | None, Header()] = None,
+) -> Any:
+    """
+    Download a file of a medical record. Single byte ranges are supported
+    (`Range: bytes=start-end`), so large scans can be resumed or read in parts.
+    """
+    record = session.get(MedicalRecord, id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    _check_access(session, current_user, record.patient_id)
+
+    key: str | None = getattr(record, f"{blob.value}_key")
+    media_type = (
+        getattr(record, f"{blob.value}_content_type")
+        or crud.MEDICAL_RECORD_CONTENT_TYPES[blob]
+    )
+    if key is None:
+        # Not moved to the blob store yet: the column is deferred, select it alone
+        content = session.exec(
+            select(getattr(MedicalRecord, blob.value)).where(MedicalRecord.id == id)
+        ).one()
+        if content is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return range_response(
+            io.BytesIO(content),
+            size=len(content),
+            media_type=media_type,
+            range_header=range,
+        )
+
+    try:
+        file = blob_store.open(key)
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    return range_response(
+        file,
+        size=getattr(record, f"{blob.value}_size"),
+        media_type=media_type,
+        range_header=range,
+        etag=key,
+    )
@@ -1,16 +1,20 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from sqlmodel import col, delete, select
 
 from app import crud
 from app.api.deps import (
+    AsyncCurrentPrincipal,
+    CurrentPrincipal,
     CurrentUser,
     SessionDep,
     get_current_active_superuser,
 )
+from app.api.pagination import CountMode, count_rows, paginate
 from app.core.config import settings
+from app.core.principals import principal_cache
 from app.core.security import get_password_hash, verify_password
 from app.models import (
     Item,
@@ -20,10 +24,12 @@ from app.models import (
     UserCreate,
     UserPublic,
     UserRegister,
+    UsersImportReport,
     UsersPublic,
     UserUpdate,
     UserUpdateMe,
 )
+from app.services.patient_import import ImportFormat, import_patients
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -34,18 +40,27 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count: CountMode = CountMode.none,
+) -> Any:
     """
     Retrieve users.
-    """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    Pass the returned `next_cursor` as `cursor` to get the next page, and
+    `count=exact` (or `estimated`, from the query planner) to get a total.
+    """
 
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
+    statement = select(User)
+    users, next_cursor = paginate(
+        session, statement, col(User.id), cursor=cursor, skip=skip, limit=limit
+    )
+    total = count_rows(session, statement, count)
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=total, next_cursor=next_cursor)
 
 
 @router.post(
@@ -75,6 +90,26 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     return user
 
 
+@router.post(
+    "/import",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=UsersImportReport,
+)
+def import_users(*, session: SessionDep, file: UploadFile) -> Any:
+    """
+    Create users in bulk from a .csv (header row with UserCreate field names)
+    or .jsonl file (one UserCreate object per line).
+
+    The file is read as a stream and loaded in chunks, so rows before an error
+    are kept: the report lists every rejected row by line number. No welcome
+    emails are sent.
+    """
+    file_format = ImportFormat.from_filename(file.filename or "")
+    if file_format is None:
+        raise HTTPException(status_code=422, detail="Expected a .csv or .jsonl file")
+    return import_patients(session, file.file, file_format)
+
+
 @router.patch("/me", response_model=UserPublic)
 def update_user_me(
     *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
@@ -93,6 +128,7 @@ def update_user_me(
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     session.refresh(current_user)
     return current_user
 
@@ -114,11 +150,12 @@ def update_password_me(
     current_user.hashed_password = hashed_password
     session.add(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     return Message(message="Password updated successfully")
 
 
 @router.get("/me", response_model=UserPublic)
-def read_user_me(current_user: CurrentUser) -> Any:
+async def read_user_me(current_user: AsyncCurrentPrincipal) -> Any:
     """
     Get current user.
     """
@@ -136,6 +173,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         )
     session.delete(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     return Message(message="User deleted successfully")
 
 
@@ -157,13 +195,13 @@ def register_user(session: SessionDep, user_in: UserRegister) -> Any:
 
 @router.get("/{user_id}", response_model=UserPublic)
 def read_user_by_id(
-    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+    user_id: uuid.UUID, session: SessionDep, current_user: CurrentPrincipal
 ) -> Any:
     """
     Get a specific user by id.
     """
     user = session.get(User, user_id)
-    if user == current_user:
+    if user and user.id == current_user.id:
         return user
     if not current_user.is_superuser:
         raise HTTPException(
@@ -207,7 +245,7 @@ def update_user(
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
 def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+    session: SessionDep, current_user: CurrentPrincipal, user_id: uuid.UUID
 ) -> Message:
     """
     Delete a user.
@@ -215,7 +253,7 @@ def delete_user(
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
@@ -223,4 +261,5 @@ def delete_user(
     session.exec(statement)  # type: ignore
     session.delete(user)
     session.commit()
+    principal_cache.invalidate(user_id)
     return Message(message="User deleted successfully")
@@ -1,8 +1,13 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.db import pool_stats
+from app.core.principals import principal_cache
 from app.models import Message
+from app.services.email_queue import email_worker
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -26,6 +31,40 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/principal-cache/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def principal_cache_stats() -> dict[str, Any]:
+    """
+    Hit rate of the authenticated-user cache of this worker process.
+    """
+    return principal_cache.stats()
+
+
+@router.get(
+    "/db-pool/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def db_pool_stats() -> dict[str, Any]:
+    """
+    Connections of this worker process' database pool, and how long
+    requests waited to get one.
+    """
+    return pool_stats()
+
+
+@router.get(
+    "/email-queue/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def email_queue_stats() -> dict[str, Any]:
+    """
+    Pending emails, and what the email worker of this process has sent.
+    """
+    return email_worker.stats()
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
@@ -0,0 +1,66 @@
+import logging
+import uuid
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.db import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+# Semaines ayant des rendez-vous, plus les lignes existantes du cumul : une
+# ligne dont les rendez-vous ont disparu est ainsi remise à zéro (supprimée).
+WEEKS = """
+    SELECT doctor_id, date_trunc('week', starts_at)::date AS week FROM appointment
+    UNION
+    SELECT doctor_id, week FROM weeklyappointmentstats
+"""
+
+
+def backfill_weekly_stats(session: Session, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Recalcule `weeklyappointmentstats` depuis `appointment`, `batch_size`
+    médecins à la fois, avec la fonction qu'utilisent les triggers. Chaque lot
+    est validé séparément : le script peut être interrompu et relancé, et les
+    écritures concurrentes restent possibles pendant qu'il tourne.
+    """
+    doctors = 0
+    after = uuid.UUID(int=0)
+    while True:
+        doctor_ids = (
+            session.execute(
+                text(
+                    f"SELECT DISTINCT doctor_id FROM ({WEEKS}) k "
+                    "WHERE doctor_id > :after ORDER BY doctor_id LIMIT :limit"
+                ),
+                params={"after": after, "limit": batch_size},
+            )
+            .scalars()
+            .all()
+        )
+        if not doctor_ids:
+            return doctors
+        session.execute(
+            text(
+                "SELECT weekly_appointment_stats_sync(array_agg(doctor_id), "
+                f"array_agg(week)) FROM ({WEEKS}) k WHERE doctor_id = ANY(:ids)"
+            ),
+            params={"ids": list(doctor_ids)},
+        )
+        session.commit()
+        doctors += len(doctor_ids)
+        after = doctor_ids[-1]
+        logger.info(f"Recomputed the weekly stats of {doctors} doctors")
+
+
+def main() -> None:
+    with Session(engine) as session:
+        doctors = backfill_weekly_stats(session)
+    logger.info(f"Weekly stats recomputed for {doctors} doctors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Charge sur les endpoints de lecture, servis par leur handler sync (`def` dans
+le threadpool, moteur psycopg sync) puis par leur version async (moteur async).
+
+    python -m app.benchmarks.async_endpoints --requests 2000 --concurrency 40
+
+« sync » et « async » sont deux applications montées pour la mesure : les
+routeurs sync de l'application (plus l'ancien `/users/me` sync, défini ici) et
+ceux servis par le moteur async (`/users/me`, et les lectures de
+`app/api/routes/async_reads.py`, qui remplacent les handlers sync quand
+ASYNC_READ_ENDPOINTS est activé). Les requêtes passent par ASGI en mémoire,
+pour un médecin de test créé au besoin avec ses patients, items et
+notifications.
+
+--threads fixe la taille du threadpool, qui borne la concurrence des handlers
+sync. Par défaut la concurrence est le nombre de connexions du pool sync ;
+au-delà du pool async (POSTGRES_ASYNC_POOL_SIZE + POSTGRES_ASYNC_MAX_OVERFLOW),
+les requêtes async attendent elles aussi une connexion.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+from typing import Any
+
+import anyio
+import httpx
+from fastapi import APIRouter, FastAPI
+from sqlmodel import Session
+
+from app import crud
+from app.api.deps import CurrentPrincipal
+from app.api.routes import async_reads, doctor_dashboard, items, users
+from app.core import security
+from app.core.config import settings
+from app.core.db import engine
+from app.models import (
+    ItemCreate,
+    Notification,
+    NotificationTypeEnum,
+    UserCreate,
+    UserPublic,
+)
+
+EMAIL = "async-benchmark@example.com"
+PASSWORD = "async-benchmark"
+ROWS = 50
+
+ENDPOINTS = {
+    "users/me": "/users/me",
+    "items": "/items/?limit=20",
+    "notifications": "/doctor/notifications?limit=20",
+    "patients": "/doctor/patients?q=patient&limit=20",
+}
+
+# L'ancien handler sync de /users/me, que l'application sert en async
+sync_users_me = APIRouter()
+
+
+@sync_users_me.get("/users/me", response_model=UserPublic)
+def read_user_me(current_user: CurrentPrincipal) -> Any:
+    return current_user
+
+
+def create_apps() -> dict[str, FastAPI]:
+    sync_app, async_app = FastAPI(), FastAPI()
+    for router in (sync_users_me, items.router, doctor_dashboard.router):
+        sync_app.include_router(router, prefix=settings.API_V1_STR)
+    for router in (users.router, async_reads.router):
+        async_app.include_router(router, prefix=settings.API_V1_STR)
+    return {"sync": sync_app, "async": async_app}
+
+
+def ensure_doctor() -> str:
+    """Médecin de test et ses données ; renvoie un jeton d'accès."""
+    with Session(engine) as session:
+        doctor = crud.get_user_by_email(session=session, email=EMAIL)
+        if not doctor:
+            doctor = crud.create_user(
+                session=session,
+                user_create=UserCreate(
+                    email=EMAIL, password=PASSWORD, specialization="Cardiology"
+                ),
+            )
+            for i in range(ROWS):
+                crud.create_user(
+                    session=session,
+                    user_create=UserCreate(
+                        email=f"async-benchmark-patient-{i}@example.com",
+                        password=PASSWORD,
+                        full_name=f"Patient {i}",
+                        doctor_id=doctor.id,
+                    ),
+                )
+                crud.create_item(
+                    session=session,
+                    item_in=ItemCreate(title=f"Item {i}"),
+                    owner_id=doctor.id,
+                )
+                session.add(
+                    Notification(
+                        doctor_id=doctor.id,
+                        type=NotificationTypeEnum.message,
+                        content=f"Notification {i}",
+                    )
+                )
+            session.commit()
+        doctor_id = doctor.id
+    return security.create_access_token(doctor_id, timedelta(hours=1))
+
+
+async def load(
+    target: FastAPI, path: str, *, token: str, requests: int, concurrency: int
+) -> tuple[float, list[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failed = 0
+    transport = httpx.ASGITransport(app=target)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers=headers
+    ) as client:
+
+        async def one() -> None:
+            nonlocal failed
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.get(f"{settings.API_V1_STR}{path}")
+                if r.status_code != 200:
+                    failed += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        # Warm-up: pools and principal cache
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        latencies.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, sorted(latencies), failed
+
+
+async def run(*, requests: int, concurrency: int, threads: int) -> None:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    token = await asyncio.to_thread(ensure_doctor)
+    targets = create_apps()
+    for name, path in ENDPOINTS.items():
+        for label, target in targets.items():
+            elapsed, latencies, failed = await load(
+                target, path, token=token, requests=requests, concurrency=concurrency
+            )
+            p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+            median = statistics.median(latencies) if latencies else 0.0
+            print(
+                f"{name:<14} {label:<6} rps={len(latencies) / elapsed:8.1f} "
+                f"p50={median * 1000:7.1f}ms p99={p99 * 1000:7.1f}ms failed={failed}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW,
+    )
+    parser.add_argument("--threads", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(
+        run(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            threads=args.threads,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
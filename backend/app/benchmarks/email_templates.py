@@ -0,0 +1,66 @@
+"""
+Coût d'un rendu de template d'email, avant et après l'environnement Jinja partagé.
+
+    python -m app.benchmarks.email_templates --renders 2000
+
+« before » relit le fichier et compile un nouveau `jinja2.Template` à chaque
+rendu, comme le faisait `render_email_template` ; « after » passe par
+`app.utils.render_email_template` et ses templates déjà compilés.
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+from jinja2 import Template
+
+from app.utils import (
+    EMAIL_TEMPLATES_DIR,
+    email_templates,
+    preload_email_templates,
+    render_email_template,
+)
+
+CONTEXT = {
+    "project_name": "Benchmark",
+    "username": "patient@example.com",
+    "email": "patient@example.com",
+    "password": "changethis",
+    "valid_hours": 48,
+    "link": "http://localhost:5173/reset-password?token=abc",
+}
+
+
+def render_uncached(*, template_name: str, context: dict[str, Any]) -> str:
+    template_str = (EMAIL_TEMPLATES_DIR / template_name).read_text()
+    return str(Template(template_str).render(context))
+
+
+def measure(render: Callable[..., str], template_name: str, renders: int) -> float:
+    start = time.perf_counter()
+    for _ in range(renders):
+        render(template_name=template_name, context=CONTEXT)
+    return (time.perf_counter() - start) / renders
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    preload_email_templates()
+    print(f"preload={(time.perf_counter() - start) * 1000:.1f}ms")
+
+    for template_name in email_templates.list_templates(extensions=["html"]):
+        before = measure(render_uncached, template_name, args.renders)
+        after = measure(render_email_template, template_name, args.renders)
+        print(
+            f"{template_name}: before={before * 1e6:.0f}us "
+            f"after={after * 1e6:.0f}us speedup={before / after:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Mesure hors ligne de la passerelle LLM avec le fournisseur factice.
+
+    python -m app.benchmarks.llm_gateway --requests 500 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.llm_service import FakeProvider, LLMGateway, LLMOverloadedError
+
+
+async def run(
+    *, requests: int, latency: float, concurrency: int, queue_depth: int
+) -> None:
+    gateway = LLMGateway(
+        FakeProvider(latency=latency),
+        max_concurrency=concurrency,
+        max_queue_depth=queue_depth,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+    )
+    latencies: list[float] = []
+    rejected = 0
+
+    async def one(i: int) -> None:
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            await gateway.generate(f"prompt {i}")
+        except LLMOverloadedError:
+            rejected += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(f"completed={len(latencies)} rejected={rejected} elapsed={elapsed:.2f}s")
+    print(f"throughput={len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--latency", type=float, default=settings.LLM_FAKE_LATENCY_SECONDS
+    )
+    parser.add_argument("--concurrency", type=int, default=settings.LLM_MAX_CONCURRENCY)
+    parser.add_argument("--queue-depth", type=int, default=settings.LLM_MAX_QUEUE_DEPTH)
+    args = parser.parse_args()
+    asyncio.run(
+        run(
+            requests=args.requests,
+            latency=args.latency,
+            concurrency=args.concurrency,
+            queue_depth=args.queue_depth,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Débit du endpoint de connexion sous une rafale de logins concurrents.
+
+    python -m app.benchmarks.login --logins 200 --concurrency 32 --workers 4
+
+Les requêtes passent par l'application ASGI en mémoire (sans réseau), avec un
+utilisateur de test créé au besoin. --workers fixe PASSWORD_HASH_WORKERS
+(0 : bcrypt dans le threadpool, comme avant le pool de processus).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlmodel import Session
+
+from app import crud
+from app.core import security
+from app.core.config import settings
+from app.core.db import engine
+from app.main import app
+from app.models import UserCreate
+
+EMAIL = "login-benchmark@example.com"
+PASSWORD = "login-benchmark"
+
+
+def ensure_user() -> None:
+    with Session(engine) as session:
+        if not crud.get_user_by_email(session=session, email=EMAIL):
+            crud.create_user(
+                session=session,
+                user_create=UserCreate(email=EMAIL, password=PASSWORD),
+            )
+
+
+async def run(*, logins: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failed = 0
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one() -> None:
+            nonlocal failed
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.post(
+                    f"{settings.API_V1_STR}/login/access-token",
+                    data={"username": EMAIL, "password": PASSWORD},
+                )
+                if r.status_code != 200:
+                    failed += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        # Warm-up: starts the pool's worker processes
+        await one()
+        latencies.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(
+        f"workers={settings.PASSWORD_HASH_WORKERS} rounds={settings.BCRYPT_ROUNDS} "
+        f"completed={len(latencies)} failed={failed} elapsed={elapsed:.2f}s"
+    )
+    print(f"throughput={len(latencies) / elapsed:.1f} logins/s")
+    if latencies:
+        print(f"p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+
+    settings.PASSWORD_HASH_WORKERS = args.workers
+    ensure_user()
+    try:
+        asyncio.run(run(logins=args.logins, concurrency=args.concurrency))
+    finally:
+        security.shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Débit de création de patients en masse : un `crud.create_user` par ligne
+(validation, hachage, commit et relecture à chaque patient, comme
+`POST /users/`) contre l'import par lots (hachage parallèle puis COPY).
+
+    BCRYPT_ROUNDS=4 python -m app.benchmarks.patient_import --rows 100000 --workers 8
+
+Le hachage bcrypt domine dès que BCRYPT_ROUNDS est réaliste : la ligne
+« hashing » donne le débit du seul hachage, qui borne celui de l'import et
+augmente avec --workers. Les données vont dans un schéma à part
+(`bench_patient_import`), supprimé à la fin sauf avec --keep.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import Connection, text
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.core.security import get_password_hashes, shutdown_password_pool
+from app.models import UserCreate
+from app.services.patient_import import ImportFormat, import_patients
+
+SCHEMA = "bench_patient_import"
+FIRST_NAMES = "Alice Bruno Chloé David Emma Félix Gabriel Hugo Inès Jules Léa Louis Manon Nathan Océane Paul Rose Sacha Théo Zoé".split()
+LAST_NAMES = "Martin Bernard Dubois Thomas Robert Richard Petit Durand Leroy Moreau Simon Laurent Lefebvre Michel Garcia".split()
+
+
+def create_schema(connection: Connection, *, doctors: int) -> list[uuid.UUID]:
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # Mêmes index que la vraie table (email unique, doctor_id, trigrammes)
+    connection.execute(
+        text(f'CREATE TABLE {SCHEMA}."user" (LIKE public."user" INCLUDING ALL)')
+    )
+    doctor_ids = [uuid.uuid4() for _ in range(doctors)]
+    connection.execute(
+        text(
+            f'INSERT INTO {SCHEMA}."user" (id, email, is_active, is_superuser, '
+            "hashed_password, specialization) "
+            "SELECT id, 'doctor-' || id || '@bench.example.com', true, false, 'x', "
+            "'Cardiology' FROM unnest(CAST(:ids AS uuid[])) AS id"
+        ),
+        {"ids": doctor_ids},
+    )
+    connection.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    connection.commit()
+    return doctor_ids
+
+
+def patient(prefix: str, i: int, doctor_ids: list[uuid.UUID]) -> dict[str, str]:
+    return {
+        "email": f"{prefix}{i}@bench.example.com",
+        "password": f"password-{i:08d}",
+        "full_name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+        "date_of_birth": f"{random.randint(1930, 2020)}-01-01",
+        "doctor_id": str(random.choice(doctor_ids)),
+    }
+
+
+def rate(label: str, rows: int, seconds: float) -> None:
+    print(
+        f"{label:<8} rows={rows} time={seconds:.2f}s rate={rows / seconds:.0f} rows/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=500, help="lignes « before »")
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    settings.PASSWORD_HASH_WORKERS = args.workers
+    print(f"BCRYPT_ROUNDS={settings.BCRYPT_ROUNDS} workers={args.workers}")
+
+    with (
+        engine.connect() as connection,
+        tempfile.NamedTemporaryFile("w", suffix=".jsonl") as file,
+    ):
+        doctor_ids = create_schema(connection, doctors=args.doctors)
+        for i in range(args.rows):
+            file.write(json.dumps(patient("patient", i, doctor_ids)) + "\n")
+        file.flush()
+        try:
+            with Session(bind=connection) as session:
+                sample = [
+                    UserCreate.model_validate(patient("before", i, doctor_ids))
+                    for i in range(args.sample)
+                ]
+                # Démarre les processus du pool hors mesure
+                get_password_hashes(["warm-up"] * args.workers)
+                start = time.perf_counter()
+                get_password_hashes([user_in.password for user_in in sample])
+                rate("hashing", args.sample, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                for user_in in sample:
+                    crud.create_user(session=session, user_create=user_in)
+                rate("before", args.sample, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                with open(file.name, "rb") as stream:
+                    report = import_patients(
+                        session,
+                        stream,
+                        ImportFormat.jsonl,
+                        chunk_size=args.chunk_size,
+                    )
+                rate("after", report.imported, time.perf_counter() - start)
+                assert not report.errors, report.errors[:5]
+        finally:
+            shutdown_password_pool()
+            if not args.keep:
+                connection.rollback()
+                connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+                connection.commit()
+
+
+if __name__ == "__main__":
+    main()
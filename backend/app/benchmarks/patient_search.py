@@ -0,0 +1,148 @@
+"""
+Latence de la recherche de patients sur une table synthétique, avant et après
+les index de recherche (doctor_id, trigrammes sur full_name et email).
+
+    python -m app.benchmarks.patient_search --rows 1000000 --doctors 1000
+
+Les données sont créées dans un schéma à part (`bench_patient_search`), supprimé
+à la fin sauf avec --keep. Nécessite l'extension pg_trgm.
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import Connection, text
+from sqlmodel import Session, col, select
+
+from app import crud
+from app.core.db import engine
+from app.models import User
+
+SCHEMA = "bench_patient_search"
+FIRST_NAMES = "Alice Bruno Chloé David Emma Félix Gabriel Hugo Inès Jules Léa Louis Manon Nathan Océane Paul Rose Sacha Théo Zoé"
+LAST_NAMES = "Martin Bernard Dubois Thomas Robert Richard Petit Durand Leroy Moreau Simon Laurent Lefebvre Michel Garcia David Bertrand Roux Vincent Fournier Morel Girard André Mercier Dupont Lambert Bonnet François Martinez Legrand"
+QUERIES = ["mar", "martin", "léa dub", "zoé", "patient123", "fournier", "xyz"]
+
+
+def populate(connection: Connection, *, rows: int, doctors: int) -> None:
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    connection.execute(
+        text(f'CREATE TABLE {SCHEMA}."user" (LIKE public."user" INCLUDING DEFAULTS)')
+    )
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO {SCHEMA}."user"
+                (id, email, is_active, is_superuser, full_name, hashed_password, doctor_id)
+            SELECT
+                gen_random_uuid(),
+                'patient' || i || '@' || substr(md5(i::text), 1, 8) || '.com',
+                true,
+                false,
+                (string_to_array(:first_names, ' '))[1 + i % 20] || ' '
+                    || (string_to_array(:last_names, ' '))[1 + (i / 20) % 30],
+                'x',
+                md5('doctor' || (i % :doctors))::uuid
+            FROM generate_series(1, :rows) AS i
+            """
+        ),
+        {
+            "first_names": FIRST_NAMES,
+            "last_names": LAST_NAMES,
+            "doctors": doctors,
+            "rows": rows,
+        },
+    )
+    connection.execute(text(f'ANALYZE {SCHEMA}."user"'))
+    connection.commit()
+
+
+def create_indexes(connection: Connection) -> None:
+    table = f'{SCHEMA}."user"'
+    connection.execute(text(f"CREATE INDEX ON {table} (doctor_id)"))
+    connection.execute(
+        text(f"CREATE INDEX ON {table} USING gin (full_name gin_trgm_ops)")
+    )
+    connection.execute(text(f"CREATE INDEX ON {table} USING gin (email gin_trgm_ops)"))
+    connection.execute(text(f"ANALYZE {table}"))
+    connection.commit()
+
+
+def legacy_search(session: Session, doctor_id: uuid.UUID, q: str) -> list[Any]:
+    statement = select(User).where(User.doctor_id == doctor_id)
+    statement = statement.where(
+        col(User.full_name).ilike(f"%{q}%") | col(User.email).ilike(f"%{q}%")
+    )
+    return list(session.exec(statement).all())
+
+
+def ranked_search(session: Session, doctor_id: uuid.UUID, q: str) -> list[Any]:
+    return crud.search_patients(session=session, doctor_id=doctor_id, q=q, limit=20)
+
+
+def measure(
+    session: Session,
+    search: Callable[[Session, uuid.UUID, str], list[Any]],
+    doctor_ids: list[uuid.UUID],
+    repeat: int,
+) -> list[float]:
+    timings = []
+    for i in range(repeat):
+        for q in QUERIES:
+            doctor_id = doctor_ids[i % len(doctor_ids)]
+            start = time.perf_counter()
+            search(session, doctor_id, q)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95)]
+    print(
+        f"{label:<8} queries={len(timings)} "
+        f"p50={statistics.median(timings) * 1000:.2f}ms p95={p95 * 1000:.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--doctors", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        print(f"Populating {args.rows} users for {args.doctors} doctors...")
+        populate(connection, rows=args.rows, doctors=args.doctors)
+        doctor_ids = [
+            row[0]
+            for row in connection.execute(
+                text(f'SELECT DISTINCT doctor_id FROM {SCHEMA}."user" LIMIT 20')
+            )
+        ]
+        try:
+            with Session(bind=connection) as session:
+                report(
+                    "before", measure(session, legacy_search, doctor_ids, args.repeat)
+                )
+                create_indexes(connection)
+                report(
+                    "after", measure(session, ranked_search, doctor_ids, args.repeat)
+                )
+        finally:
+            if not args.keep:
+                connection.rollback()
+                connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+                connection.commit()
+
+
+if __name__ == "__main__":
+    main()
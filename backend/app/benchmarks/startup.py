@@ -0,0 +1,93 @@
+"""
+Démarrage à froid d'un worker : import de `app.main` puis événements de
+démarrage, chaque mesure dans un nouvel interpréteur.
+
+    python -m app.benchmarks.startup --runs 5 --top 15
+
+« before » importe le SDK Gemini et crée son client avant `app.main`, comme
+le faisait `llm_service` à l'import ; « after » laisse le fournisseur LLM se
+créer au premier appel. --top affiche les modules dont l'import coûte le plus
+(`python -X importtime`), mesurés sur un dernier lancement.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+{eager}
+import app.main
+imported = time.perf_counter()
+asyncio.run(app.main.app.router.startup())
+started = time.perf_counter()
+asyncio.run(app.main.app.router.shutdown())
+print(json.dumps({{"import": imported - start, "startup": started - imported}}))
+"""
+
+EAGER_LLM = """
+from google import genai
+from app.core.config import settings
+genai.Client(api_key=settings.LLM_API_KEY)
+"""
+
+VARIANTS = {"before": EAGER_LLM, "after": ""}
+
+
+def cold_start(eager: str) -> dict[str, float]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(eager=eager)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, "process": time.perf_counter() - start}
+
+
+def import_profile(top: int) -> list[tuple[int, str]]:
+    """Modules dont l'import cumulé (dépendances comprises) est le plus long, en µs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for label, eager in VARIANTS.items():
+        runs = [cold_start(eager) for _ in range(args.runs)]
+        print(
+            label,
+            " ".join(
+                f"{key}={statistics.median(r[key] for r in runs) * 1000:.0f}ms"
+                for key in ("import", "startup", "process")
+            ),
+        )
+
+    if args.top:
+        print(f"\nimport app.main, top {args.top} (cumulative):")
+        for cumulative, name in import_profile(args.top):
+            print(f"{cumulative / 1000:9.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -51,11 +51,39 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str
     SENTRY_DSN: HttpUrl | None = None
+    # When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN: str | None = None
+    # Debug: log the SQL statements of each request and sum them up in an
+    # X-SQL-Profile response header; a statement repeated this many times in
+    # one request is logged as a likely N+1
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 3
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Connection pools of each worker process, one for the sync engine and one
+    # for the async engine. Budget: every worker may open up to POOL_SIZE +
+    # MAX_OVERFLOW connections in each, plus one for notifications (LISTEN),
+    # so WORKERS x (8 + 4 + 4 + 4 + 1) = 84 with the defaults, below
+    # Postgres' max_connections of 100. Startup logs a warning when the
+    # settings go over the server's max_connections.
+    # Worker processes per server, as started by backend/Dockerfile
+    WORKERS: int = 4
+    POSTGRES_POOL_SIZE: int = 8
+    POSTGRES_MAX_OVERFLOW: int = 4
+    POSTGRES_ASYNC_POOL_SIZE: int = 4
+    POSTGRES_ASYNC_MAX_OVERFLOW: int = 4
+    # Seconds a request waits for a free connection before failing
+    POSTGRES_POOL_TIMEOUT: float = 30.0
+    POSTGRES_POOL_PRE_PING: bool = True
+    # Connections older than this many seconds are replaced (-1: never)
+    POSTGRES_POOL_RECYCLE: int = 30 * 60
+    # Serve /items/, /doctor/notifications and /doctor/patients from the async
+    # engine (app/api/routes/async_reads.py); compare both versions with
+    # app/benchmarks/async_endpoints.py before turning it on
+    ASYNC_READ_ENDPOINTS: bool = False
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -69,8 +97,40 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # bcrypt cost factor (2**rounds iterations), and the size of the process
+    # pool hashing and verifying passwords off the request threads. With 0
+    # workers hashing runs in the calling thread.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+
+    # Authenticated users cached per worker process; writes only invalidate the
+    # local entry, so the TTL bounds staleness on the other workers. 0 disables.
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+
+    # Medical record files (PDF resumes, scans). Relative paths are resolved
+    # from the working directory, /app in the Docker image.
+    BLOB_STORE_PATH: str = "data/blobs"
+
     LLM_MODEL_NAME: str = "gemini-2.0-flash-thinking-exp-01-21"
     LLM_API_KEY: str | None = None
+    # "fake" answers locally without network access, for tests and load runs
+    LLM_PROVIDER: Literal["gemini", "fake"] = "gemini"
+    LLM_FAKE_LATENCY_SECONDS: float = 0.05
+    # Per worker process: calls allowed in flight and callers allowed to wait
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE_DEPTH: int = 32
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 60 * 60
+    # Also store responses in the llmcacheentry table, shared by all workers
+    LLM_CACHE_PERSIST: bool = False
+    # Prompts of one batch job processed in parallel
+    LLM_BATCH_CONCURRENCY: int = 4
+    # A pending or running batch job with no prompt finished for this long lost
+    # its worker (restart, crash) and is closed as interrupted
+    LLM_BATCH_STALE_SECONDS: int = 15 * 60
 
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
@@ -88,6 +148,24 @@ class Settings(BaseSettings):
         return self
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
+    # Compiled email templates; None uses a directory in the system temp dir
+    EMAIL_TEMPLATES_BYTECODE_CACHE_DIR: str | None = None
+    # Outgoing emails are queued in the database and sent by a background
+    # worker, over at most EMAIL_WORKER_CONCURRENCY reused SMTP connections
+    EMAIL_WORKER_CONCURRENCY: int = 2
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_POLL_SECONDS: float = 5.0
+    EMAIL_MAX_ATTEMPTS: int = 5
+    # Retry delay doubles after each failed attempt, up to EMAIL_RETRY_MAX_SECONDS
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    EMAIL_RETRY_MAX_SECONDS: float = 60 * 60
+    # A claimed email is sent again by any worker once this lease runs out, so
+    # it must outlast a whole batch: EMAIL_BATCH_SIZE x SMTP_TIMEOUT_SECONDS /
+    # EMAIL_WORKER_CONCURRENCY = 250s with the defaults
+    EMAIL_SEND_LEASE_SECONDS: float = 10 * 60
+    SMTP_TIMEOUT_SECONDS: float = 10.0
+    # Pooled connections unused for longer are closed rather than reused
+    SMTP_IDLE_TIMEOUT_SECONDS: float = 60.0
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -1,11 +1,160 @@
-from typing import Generator
+import logging
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+logger = logging.getLogger(__name__)
+
+
+class PoolWaitStats:
+    """Time spent by checkouts waiting for a pooled connection."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, seconds: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(
+                    self.total_wait / self.checkouts * 1000 if self.checkouts else 0.0,
+                    3,
+                ),
+                "wait_max_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout takes, pre-ping included."""
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.POSTGRES_POOL_SIZE,
+    max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+    pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+)
+
+# Same database for the async endpoints, with its own pool
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    pool_size=settings.POSTGRES_ASYNC_POOL_SIZE,
+    max_overflow=settings.POSTGRES_ASYNC_MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+    pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+)
+
+
+def warm_up_pool() -> None:
+    """Open the pool's connections now rather than on the first requests."""
+    connections = [engine.connect() for _ in range(settings.POSTGRES_POOL_SIZE)]
+    for connection in connections:
+        connection.close()
+    pool_wait_stats.reset()
+
+
+async def warm_up_async_pool() -> None:
+    """Same as `warm_up_pool`, for the engine behind the async endpoints."""
+    connections = [
+        await async_engine.connect() for _ in range(settings.POSTGRES_ASYNC_POOL_SIZE)
+    ]
+    for connection in connections:
+        await connection.close()
+
+
+def connections_per_worker() -> int:
+    """Most connections one worker process may hold: both pools and LISTEN."""
+    return (
+        settings.POSTGRES_POOL_SIZE
+        + settings.POSTGRES_MAX_OVERFLOW
+        + settings.POSTGRES_ASYNC_POOL_SIZE
+        + settings.POSTGRES_ASYNC_MAX_OVERFLOW
+        + 1
+    )
+
+
+def check_connection_budget() -> bool:
+    """
+    Warn when WORKERS processes could open more connections than the server's
+    max_connections, in which case requests fail once the pools fill up.
+    """
+    with engine.connect() as connection:
+        max_connections = int(
+            connection.execute(text("SHOW max_connections")).scalar_one()
+        )
+    needed = settings.WORKERS * connections_per_worker()
+    if needed <= max_connections:
+        return True
+    logger.warning(
+        f"{settings.WORKERS} workers may open {needed} Postgres connections "
+        f"({connections_per_worker()} each), over max_connections="
+        f"{max_connections}: lower the POSTGRES_*POOL_SIZE/MAX_OVERFLOW settings"
+    )
+    return False
+
+
+def pool_stats() -> dict[str, Any]:
+    """Live state of this process' pool, to size it against Postgres' limits."""
+    pool, async_pool = engine.pool, async_engine.pool
+    assert isinstance(pool, QueuePool) and isinstance(async_pool, QueuePool)
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.POSTGRES_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        **pool_wait_stats.stats(),
+        "async": {
+            "size": async_pool.size(),
+            "max_overflow": settings.POSTGRES_ASYNC_MAX_OVERFLOW,
+            "checked_out": async_pool.checkedout(),
+            "checked_in": async_pool.checkedin(),
+            "overflow": async_pool.overflow(),
+        },
+    }
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -32,7 +181,3 @@ def init_db(session: Session) -> None:
             is_superuser=True,
         )
         user = crud.create_user(session=session, user_create=user_in)
-
-def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
@@ -0,0 +1,325 @@
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import query_profiler
+from app.core.config import settings
+from app.core.db import async_engine, engine, pool_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [
+            f"{self.name}{_labels(self.labels, values)} {_number(value)}"
+            for values, value in series
+        ]
+
+
+class Histogram:
+    """
+    Observations counted per bucket. Buckets are stored non-cumulative and only
+    summed up when rendered, so observing is one bisect and three increments.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...],
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # Per series: counts per bucket (the last one is +Inf), sum
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = [
+                (values, list(counts), total[0])
+                for values, (counts, total) in self._series.items()
+            ]
+        lines = []
+        bounds = [_number(float(b)) for b in self.buckets] + ["+Inf"]
+        names = (*self.labels, "le")
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts, strict=True):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(names, (*values, bound))} {cumulative}"
+                )
+            label_str = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{label_str} {_number(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """Gauges read from a callback at scrape time, one per key it returns."""
+
+    def __init__(
+        self, name: str, help: str, read: Callable[[], dict[str, float]]
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: list[Counter | Histogram] = []
+        self.gauges: list[Gauges] = []
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...],
+    ) -> Histogram:
+        metric = Histogram(name, help, labels, buckets=buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, read: Callable[[], dict[str, float]]) -> None:
+        self.gauges.append(Gauges(name, help, read))
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for gauges in self.gauges:
+            values = gauges.read()
+            for key, value in values.items():
+                lines.append(f"# HELP {gauges.name}_{key} {gauges.help}")
+                lines.append(f"# TYPE {gauges.name}_{key} gauge")
+                lines.append(f"{gauges.name}_{key} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request, until its response is sent.",
+    ("method", "route"),
+    buckets=LATENCY_BUCKETS,
+)
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements",
+    "SQL statements executed by one HTTP request.",
+    ("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds",
+    "Time one HTTP request spent executing SQL statements.",
+    ("method", "route"),
+    buckets=LATENCY_BUCKETS,
+)
+db_statements = registry.counter(
+    "db_statements_total", "SQL statements executed, in and out of requests."
+)
+db_statement_duration = registry.counter(
+    "db_statement_duration_seconds_total",
+    "Time spent executing SQL statements, in and out of requests.",
+)
+llm_call_duration = registry.histogram(
+    "llm_call_duration_seconds",
+    "Latency of LLM calls, queueing in the gateway included.",
+    ("model", "outcome"),
+    buckets=LLM_BUCKETS,
+)
+
+
+def _pool_gauges() -> dict[str, float]:
+    stats = pool_stats()
+    return {
+        "checked_out": stats["checked_out"],
+        "overflow": stats["overflow"],
+        "async_checked_out": stats["async"]["checked_out"],
+        "async_overflow": stats["async"]["overflow"],
+    }
+
+
+registry.gauge("db_pool", "Connections of this process' database pools.", _pool_gauges)
+
+
+class RequestQueries:
+    """
+    SQL statements executed while handling the current request; with `record`,
+    their text and timing too (SQL_PROFILER_ENABLED).
+    """
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self, *, record: bool = False) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: list[tuple[str, float]] | None = [] if record else None
+
+
+# Set by the middleware; the threadpool and SQLAlchemy's async greenlets run
+# with a copy of the request's context, so they update the same object.
+current_request_queries: ContextVar[RequestQueries | None] = ContextVar(
+    "current_request_queries", default=None
+)
+
+
+def _before_cursor_execute(conn: Any, *_: Any) -> None:
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, _cursor: Any, statement: str, *_: Any) -> None:
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    db_statements.inc()
+    db_statement_duration.inc(amount=elapsed)
+    queries = current_request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += elapsed
+        if queries.statements is not None:
+            queries.statements.append((statement, elapsed))
+
+
+def instrument_engine(target: Engine) -> None:
+    """Count and time the statements executed through `target`."""
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def instrument_engines() -> None:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
+
+class MetricsMiddleware:
+    """
+    Records the count, status and latency of each request, and the SQL it ran,
+    under its route template rather than its path (bounded label values).
+
+    With SQL_PROFILER_ENABLED, each request's statements are also logged, and
+    summed up in an X-SQL-Profile response header (statements run after the
+    response has started, by a streaming body or a background task, are only
+    in the log).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        record = settings.SQL_PROFILER_ENABLED
+        method = scope["method"]
+
+        def route() -> str:
+            return getattr(scope.get("route"), "path", "unmatched")
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if queries.statements is not None:
+                    profile = query_profiler.QueryProfile(
+                        method, route(), queries.statements
+                    )
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (query_profiler.HEADER.encode(), profile.header().encode()),
+                    ]
+            await send(message)
+
+        queries = RequestQueries(record=record)
+        token = current_request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_queries.reset(token)
+            path = route()
+            http_requests.inc(method, path, str(status))
+            http_request_duration.observe(elapsed, method, path)
+            http_request_db_statements.observe(queries.count, method, path)
+            http_request_db_duration.observe(queries.seconds, method, path)
+            if queries.statements is not None:
+                query_profiler.report(
+                    query_profiler.QueryProfile(method, path, queries.statements)
+                )
@@ -0,0 +1,66 @@
+import logging
+from collections import Counter
+from collections.abc import Callable
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-SQL-Profile"
+
+
+class QueryProfile:
+    """
+    The SQL statements one request executed, in order, with their timings.
+
+    Statements are compared by their SQL text, parameters excluded: the same
+    statement run again and again with different parameters is the signature
+    of an N+1 (a lazy relationship loaded once per row of a list).
+    """
+
+    def __init__(
+        self, method: str, route: str, statements: list[tuple[str, float]]
+    ) -> None:
+        self.method = method
+        self.route = route
+        self.statements = statements
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.statements)
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Statements executed more than once, most repeated first."""
+        counts = Counter(statement for statement, _ in self.statements)
+        return [(s, n) for s, n in counts.most_common() if n > 1]
+
+    def header(self) -> str:
+        repeats = sum(n - 1 for _, n in self.repeated())
+        return (
+            f"queries={self.count}; time_ms={self.seconds * 1000:.2f}; "
+            f"repeated={repeats}"
+        )
+
+    def log(self) -> None:
+        logger.info(f"{self.method} {self.route}: {self.header()}")
+        for statement, times in self.repeated():
+            if times >= settings.SQL_PROFILER_REPEAT_THRESHOLD:
+                logger.warning(
+                    f"Possible N+1 in {self.method} {self.route}: statement "
+                    f"executed {times} times: {' '.join(statement.split())}"
+                )
+
+
+# Called with the profile of each request; the test suite checks query
+# budgets through this.
+profile_hooks: list[Callable[[QueryProfile], None]] = []
+
+
+def report(profile: QueryProfile) -> None:
+    profile.log()
+    for hook in profile_hooks:
+        hook(profile)
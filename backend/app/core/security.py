@@ -1,12 +1,29 @@
+import asyncio
+import multiprocessing
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Hashes made with fewer rounds than BCRYPT_ROUNDS report `needs_update`, and
+# are upgraded on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+_password_pool: ProcessPoolExecutor | None = None
+_password_pool_lock = threading.Lock()
 
 
 ALGORITHM = "HS256"
@@ -19,9 +36,93 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     return encoded_jwt
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _get_password_pool() -> ProcessPoolExecutor | None:
+    global _password_pool
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _password_pool_lock:
+        if _password_pool is None:
+            # spawn: forking a process that runs threads (the server's
+            # threadpool, database drivers) is unsafe
+            _password_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _password_pool
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown()
+            _password_pool = None
+
+
+def _run_in_pool(fn: Callable[..., T], *args: Any) -> T:
+    pool = _get_password_pool()
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+
+async def _run_in_pool_async(fn: Callable[..., T], *args: Any) -> T:
+    pool = _get_password_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+# Run in the pool's worker processes, so they must stay module-level functions.
+def _verify(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    verified: bool
+    new_hash: str | None
+    verified, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    return verified, new_hash
+
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run_in_pool(_verify, plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """
+    Check the password and, if its hash uses outdated settings, return a new
+    hash to store in its place: `(verified, new_hash or None)`.
+    """
+    return _run_in_pool(_verify_and_update, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return await _run_in_pool_async(_verify_and_update, plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    return _run_in_pool(_hash, password)
+
+
+def get_password_hashes(passwords: list[str]) -> list[str]:
+    """
+    Hash many passwords at once (bulk imports), spread over all the pool's
+    worker processes instead of one hash at a time.
+    """
+    pool = _get_password_pool()
+    if pool is None:
+        return [_hash(password) for password in passwords]
+    # A few tasks per worker: balanced without a round trip per password
+    chunksize = max(1, len(passwords) // (settings.PASSWORD_HASH_WORKERS * 4))
+    return list(pool.map(_hash, passwords, chunksize=chunksize))
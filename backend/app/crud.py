@@ -1,10 +1,60 @@
 import uuid
+from datetime import date, datetime
 from typing import Any
 
-from sqlmodel import Session, select
+import psycopg.errors
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import (
+    ColumnClause,
+    String,
+    Uuid,
+    column,
+    delete,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select, SelectOfScalar
 
-from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core.principals import principal_cache
+from app.core.security import (
+    get_password_hash,
+    verify_and_update_password,
+    verify_and_update_password_async,
+)
+from app.models import (
+    APPOINTMENT_RANGE,
+    Appointment,
+    AppointmentCreate,
+    DoctorMessage,
+    DoctorMessageCreate,
+    Item,
+    ItemCreate,
+    ItemPublic,
+    LLMBatchItem,
+    LLMBatchJob,
+    LLMBatchRequest,
+    MedicalRecord,
+    MedicalRecordBlob,
+    MedicalRecordCreate,
+    Notification,
+    NotificationCounter,
+    User,
+    UserCreate,
+    UserUpdate,
+    WeeklyAppointmentStats,
+    naive_utc,
+)
+from app.services.blob_store import BlobInfo
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -27,6 +77,7 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
     session.commit()
+    principal_cache.invalidate(db_user.id)
     session.refresh(db_user)
     return db_user
 
@@ -37,18 +88,545 @@ def get_user_by_email(*, session: Session, email: str) -> User | None:
     return session_user
 
 
+def search_patients(
+    *,
+    session: Session,
+    doctor_id: uuid.UUID,
+    q: str,
+    limit: int,
+    after: tuple[float, uuid.UUID] | None = None,
+) -> list[tuple[User, float]]:
+    """
+    Patients of `doctor_id` whose name or email contains `q` or is close to it,
+    best matches first.
+
+    Substring (ILIKE) and word-similarity (`<%`) filters are both served by the
+    pg_trgm GIN indexes on full_name and email. Ties on the score are broken by
+    id so that `after` (score, id of the last row seen) resumes a page exactly.
+    """
+    statement = _patient_search_statement(doctor_id, q, limit, after)
+    return [(user, user_score) for user, user_score in session.exec(statement).all()]
+
+
+async def search_patients_async(
+    *,
+    session: AsyncSession,
+    doctor_id: uuid.UUID,
+    q: str,
+    limit: int,
+    after: tuple[float, uuid.UUID] | None = None,
+) -> list[tuple[User, float]]:
+    """`search_patients` with an async session."""
+    statement = _patient_search_statement(doctor_id, q, limit, after)
+    rows = (await session.exec(statement)).all()
+    return [(user, user_score) for user, user_score in rows]
+
+
+def _patient_search_statement(
+    doctor_id: uuid.UUID,
+    q: str,
+    limit: int,
+    after: tuple[float, uuid.UUID] | None,
+) -> Select[tuple[User, float]]:
+    pattern = (
+        "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    )
+    term = literal(q)
+    score = func.greatest(
+        func.word_similarity(term, User.full_name),
+        func.word_similarity(term, User.email),
+    ).label("score")
+    statement = select(User, score).where(
+        User.doctor_id == doctor_id,
+        or_(
+            col(User.full_name).ilike(pattern),
+            col(User.email).ilike(pattern),
+            term.op("<%")(User.full_name),
+            term.op("<%")(User.email),
+        ),
+    )
+    if after is not None:
+        after_score, after_id = after
+        statement = statement.where(
+            or_(score < after_score, (score == after_score) & (col(User.id) > after_id))
+        )
+    return statement.order_by(score.desc(), col(User.id)).limit(limit)
+
+
 def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        _upgrade_password_hash(session=session, db_user=db_user, new_hash=new_hash)
     return db_user
 
 
+async def authenticate_async(
+    *, session: Session, email: str, password: str
+) -> User | None:
+    """
+    `authenticate` for async endpoints: bcrypt runs in the password hashing
+    process pool and database calls in the threadpool, so the event loop is
+    never blocked.
+    """
+    db_user = await run_in_threadpool(get_user_by_email, session=session, email=email)
+    if not db_user:
+        return None
+    verified, new_hash = await verify_and_update_password_async(
+        password, db_user.hashed_password
+    )
+    if not verified:
+        return None
+    if new_hash:
+        await run_in_threadpool(
+            _upgrade_password_hash, session=session, db_user=db_user, new_hash=new_hash
+        )
+    return db_user
+
+
+def _upgrade_password_hash(*, session: Session, db_user: User, new_hash: str) -> None:
+    # The hash was made with outdated settings (e.g. fewer rounds)
+    db_user.hashed_password = new_hash
+    session.add(db_user)
+    session.commit()
+    session.refresh(db_user)
+
+
 def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
     session.add(db_item)
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+def get_items_for_update(
+    *, session: Session, ids: list[uuid.UUID]
+) -> dict[uuid.UUID, Item]:
+    """
+    The items among `ids` that exist, in one query, locked until the end of
+    the transaction so that they cannot change before `write_items`. Rows
+    are locked in id order: two batches sharing items wait for each other
+    instead of deadlocking.
+    """
+    if not ids:
+        return {}
+    statement = (
+        select(Item)
+        .where(col(Item.id).in_(ids))
+        .order_by(col(Item.id))
+        .with_for_update()
+    )
+    return {item.id: item for item in session.exec(statement).all()}
+
+
+def write_items(
+    *,
+    session: Session,
+    created: list[Item],
+    updated: list[ItemPublic],
+    deleted: list[uuid.UUID],
+) -> None:
+    """
+    Apply a batch of item changes in one transaction, with at most one
+    statement per kind of change: a multi-row INSERT, an UPDATE joined to a
+    VALUES list of the new titles and descriptions, and a DELETE by ids.
+    """
+    if created:
+        session.execute(insert(Item).values([item.model_dump() for item in created]))
+    if updated:
+        changes = values(
+            column("id", Uuid),
+            column("title", String),
+            column("description", String),
+            name="changes",
+        ).data([(item.id, item.title, item.description) for item in updated])
+        session.execute(
+            update(Item)
+            .where(col(Item.id) == changes.c.id)
+            .values(title=changes.c.title, description=changes.c.description)
+        )
+    if deleted:
+        session.execute(delete(Item).where(col(Item.id).in_(deleted)))
+    session.commit()
+
+
+def create_llm_batch_job(
+    *, session: Session, batch_in: LLMBatchRequest, doctor_id: uuid.UUID
+) -> LLMBatchJob:
+    db_job = LLMBatchJob(
+        doctor_id=doctor_id,
+        total=len(batch_in.prompts),
+        notify_each=batch_in.notify_each,
+    )
+    session.add(db_job)
+    session.add_all(
+        LLMBatchItem(job_id=db_job.id, position=position, prompt=prompt)
+        for position, prompt in enumerate(batch_in.prompts)
+    )
+    session.commit()
+    session.refresh(db_job)
+    return db_job
+
+
+# Used when the uploader did not send a content type, and for legacy inline files
+MEDICAL_RECORD_CONTENT_TYPES = {
+    MedicalRecordBlob.pdf_resume: "application/pdf",
+    MedicalRecordBlob.scanner_image: "application/octet-stream",
+}
+
+
+def set_medical_record_blob(
+    *,
+    record: MedicalRecord,
+    blob: MedicalRecordBlob,
+    info: BlobInfo,
+    content_type: str | None = None,
+) -> None:
+    setattr(record, blob.value, None)
+    setattr(record, f"{blob.value}_key", info.key)
+    setattr(record, f"{blob.value}_size", info.size)
+    setattr(
+        record,
+        f"{blob.value}_content_type",
+        content_type or MEDICAL_RECORD_CONTENT_TYPES[blob],
+    )
+
+
+def list_medical_records(
+    *,
+    session: Session,
+    patient_id: uuid.UUID,
+    limit: int,
+    after: tuple[str, uuid.UUID] | None = None,
+) -> list[MedicalRecord]:
+    """
+    Records of `patient_id`, newest first, without their inline file content
+    (deferred on the model). `after` is the (record_date, id) of the last row
+    seen; the row comparison walks the (patient_id, record_date, id) index.
+    """
+    statement = select(MedicalRecord).where(MedicalRecord.patient_id == patient_id)
+    if after is not None:
+        statement = statement.where(
+            tuple_(col(MedicalRecord.record_date), col(MedicalRecord.id))
+            < tuple_(literal(after[0]), literal(after[1]))
+        )
+    statement = statement.order_by(
+        col(MedicalRecord.record_date).desc(), col(MedicalRecord.id).desc()
+    ).limit(limit)
+    return list(session.exec(statement).all())
+
+
+def create_medical_record(
+    *,
+    session: Session,
+    record_in: MedicalRecordCreate,
+    blobs: dict[MedicalRecordBlob, tuple[BlobInfo, str | None]],
+) -> MedicalRecord:
+    db_record = MedicalRecord.model_validate(record_in)
+    for blob, (info, content_type) in blobs.items():
+        set_medical_record_blob(
+            record=db_record, blob=blob, info=info, content_type=content_type
+        )
+    session.add(db_record)
+    session.commit()
+    session.refresh(db_record)
+    return db_record
+
+
+def list_notifications(
+    *,
+    session: Session,
+    doctor_id: uuid.UUID,
+    limit: int,
+    after: tuple[datetime, uuid.UUID] | None = None,
+    since: datetime | None = None,
+    unread_only: bool = False,
+) -> list[Notification]:
+    """
+    Notifications of `doctor_id`, newest first. `after` is the (created_at, id)
+    of the last row seen; `since` keeps only the ones created after it, for
+    clients that already hold the older ones.
+    """
+    statement = _notifications_statement(doctor_id, limit, after, since, unread_only)
+    return list(session.exec(statement).all())
+
+
+async def list_notifications_async(
+    *,
+    session: AsyncSession,
+    doctor_id: uuid.UUID,
+    limit: int,
+    after: tuple[datetime, uuid.UUID] | None = None,
+    since: datetime | None = None,
+    unread_only: bool = False,
+) -> list[Notification]:
+    """`list_notifications` with an async session."""
+    statement = _notifications_statement(doctor_id, limit, after, since, unread_only)
+    return list((await session.exec(statement)).all())
+
+
+def _notifications_statement(
+    doctor_id: uuid.UUID,
+    limit: int,
+    after: tuple[datetime, uuid.UUID] | None,
+    since: datetime | None,
+    unread_only: bool,
+) -> SelectOfScalar[Notification]:
+    statement = select(Notification).where(Notification.doctor_id == doctor_id)
+    if after is not None:
+        statement = statement.where(
+            tuple_(col(Notification.created_at), col(Notification.id))
+            < tuple_(literal(naive_utc(after[0])), literal(after[1]))
+        )
+    if since is not None:
+        statement = statement.where(col(Notification.created_at) > naive_utc(since))
+    if unread_only:
+        statement = statement.where(col(Notification.read_at).is_(None))
+    return statement.order_by(
+        col(Notification.created_at).desc(), col(Notification.id).desc()
+    ).limit(limit)
+
+
+def mark_notifications_read(
+    *,
+    session: Session,
+    doctor_id: uuid.UUID,
+    ids: list[uuid.UUID] | None = None,
+    until: datetime | None = None,
+) -> int:
+    """
+    Mark unread notifications of `doctor_id` as read in a single UPDATE: the
+    given `ids`, or all of them (created up to `until` if given). Returns the
+    number of notifications marked.
+    """
+    statement = (
+        update(Notification)
+        .where(
+            col(Notification.doctor_id) == doctor_id,
+            col(Notification.read_at).is_(None),
+        )
+        .values(read_at=datetime.utcnow())
+    )
+    if ids is not None:
+        statement = statement.where(col(Notification.id).in_(ids))
+    if until is not None:
+        statement = statement.where(col(Notification.created_at) <= naive_utc(until))
+    result = session.exec(statement)  # type: ignore
+    session.commit()
+    return int(result.rowcount)
+
+
+def get_unread_notification_count(*, session: Session, doctor_id: uuid.UUID) -> int:
+    """Read from the per-doctor counter kept up to date by triggers."""
+    return session.exec(_unread_count_statement(doctor_id)).first() or 0
+
+
+async def get_unread_notification_count_async(
+    *, session: AsyncSession, doctor_id: uuid.UUID
+) -> int:
+    return (await session.exec(_unread_count_statement(doctor_id))).first() or 0
+
+
+def _unread_count_statement(doctor_id: uuid.UUID) -> SelectOfScalar[int]:
+    return select(NotificationCounter.unread).where(
+        NotificationCounter.doctor_id == doctor_id
+    )
+
+
+async def get_doctor_dashboard_async(
+    *,
+    session: AsyncSession,
+    doctor_id: uuid.UUID,
+    now: datetime,
+    appointments: int,
+    notifications: int,
+) -> tuple[int, int, list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Unread notification count, patient count, the next `appointments`
+    appointments starting from `now` and the `notifications` most recent
+    notifications, in a single statement: one CTE per part, the two lists
+    aggregated to JSON arrays so that everything comes back as one row.
+    """
+    unread = _unread_count_statement(doctor_id).cte("unread")
+    patients = (
+        select(func.count().label("patients"))
+        .select_from(User)
+        .where(User.doctor_id == doctor_id)
+        .cte("patients")
+    )
+    upcoming = (
+        select(Appointment)
+        .where(
+            Appointment.doctor_id == doctor_id,
+            col(Appointment.starts_at) >= naive_utc(now),
+        )
+        .order_by(col(Appointment.starts_at))
+        .limit(appointments)
+        .cte("upcoming")
+    )
+    recent = _notifications_statement(doctor_id, notifications, None, None, False).cte(
+        "recent"
+    )
+    empty: ColumnClause[Any] = literal_column("'[]'::json")
+    statement = select(
+        func.coalesce(select(unread.c.unread).scalar_subquery(), 0),
+        select(patients.c.patients).scalar_subquery(),
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(  # type: ignore[no-untyped-call]
+                        upcoming.table_valued(), upcoming.c.starts_at
+                    )
+                ),
+                empty,
+            )
+        ).scalar_subquery(),
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(  # type: ignore[no-untyped-call]
+                        recent.table_valued(),
+                        recent.c.created_at.desc(),
+                        recent.c.id.desc(),
+                    )
+                ),
+                empty,
+            )
+        ).scalar_subquery(),
+    )
+    unread_count, patient_count, upcoming_rows, recent_rows = (
+        await session.execute(statement)
+    ).one()
+    return unread_count, patient_count, upcoming_rows, recent_rows
+
+
+def list_doctor_messages(
+    *,
+    session: Session,
+    doctor_id: uuid.UUID,
+    limit: int,
+    patient_id: uuid.UUID | None = None,
+    after: tuple[datetime, uuid.UUID] | None = None,
+) -> list[DoctorMessage]:
+    """
+    Messages sent by `doctor_id`, newest first, optionally for one patient.
+    `after` is the (sent_at, id) of the last row seen; both filters are
+    served by an index scan on (doctor_id[, patient_id], sent_at).
+    """
+    statement = select(DoctorMessage).where(DoctorMessage.doctor_id == doctor_id)
+    if patient_id is not None:
+        statement = statement.where(DoctorMessage.patient_id == patient_id)
+    if after is not None:
+        statement = statement.where(
+            tuple_(col(DoctorMessage.sent_at), col(DoctorMessage.id))
+            < tuple_(literal(naive_utc(after[0])), literal(after[1]))
+        )
+    statement = statement.order_by(
+        col(DoctorMessage.sent_at).desc(), col(DoctorMessage.id).desc()
+    ).limit(limit)
+    return list(session.exec(statement).all())
+
+
+def get_doctor_patient_ids(
+    *, session: Session, doctor_id: uuid.UUID, patient_ids: list[uuid.UUID]
+) -> set[uuid.UUID]:
+    """Those of `patient_ids` that are patients of `doctor_id`."""
+    statement = select(User.id).where(
+        User.doctor_id == doctor_id, col(User.id).in_(set(patient_ids))
+    )
+    return set(session.exec(statement).all())
+
+
+def send_doctor_messages(
+    *,
+    session: Session,
+    doctor_id: uuid.UUID,
+    messages_in: list[DoctorMessageCreate],
+) -> list[DoctorMessage]:
+    """
+    Store `messages_in` with one multi-row INSERT. Ids and timestamps are
+    generated here, so the rows are returned without reading them back.
+    """
+    messages = [
+        DoctorMessage.model_validate(message_in, update={"doctor_id": doctor_id})
+        for message_in in messages_in
+    ]
+    session.execute(
+        insert(DoctorMessage).values([message.model_dump() for message in messages])
+    )
+    session.commit()
+    return messages
+
+
+def create_appointment(
+    *, session: Session, appointment_in: AppointmentCreate, doctor_id: uuid.UUID
+) -> Appointment | None:
+    """
+    Book an appointment, or return None if it overlaps another appointment of
+    the doctor. The exclusion constraint decides, so two concurrent bookings of
+    the same slot cannot both succeed.
+    """
+    appointment = Appointment.model_validate(
+        appointment_in,
+        update={
+            "doctor_id": doctor_id,
+            "starts_at": naive_utc(appointment_in.starts_at),
+            "ends_at": naive_utc(appointment_in.ends_at),
+        },
+    )
+    session.add(appointment)
+    try:
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        if isinstance(e.orig, psycopg.errors.ExclusionViolation):
+            return None
+        raise
+    session.refresh(appointment)
+    return appointment
+
+
+def list_doctor_appointments(
+    *, session: Session, doctor_id: uuid.UUID, start: datetime, end: datetime
+) -> list[Appointment]:
+    """
+    The doctor's appointments overlapping [start, end), in chronological order.
+    The range condition is the exclusion constraint's expression, so its GiST
+    index serves the query.
+    """
+    statement = (
+        select(Appointment)
+        .where(
+            Appointment.doctor_id == doctor_id,
+            text(f"{APPOINTMENT_RANGE} && tsrange(:start, :end, '[)')").bindparams(
+                start=naive_utc(start), end=naive_utc(end)
+            ),
+        )
+        .order_by(col(Appointment.starts_at))
+    )
+    return list(session.exec(statement).all())
+
+
+def get_weekly_appointment_stats(
+    *, session: Session, doctor_id: uuid.UUID, start: date, end: date
+) -> list[WeeklyAppointmentStats]:
+    """
+    The doctor's rollup rows for the weeks whose Monday is in [start, end], by
+    week: a range scan of the primary key. Weeks without appointments have no
+    row.
+    """
+    statement = (
+        select(WeeklyAppointmentStats)
+        .where(
+            WeeklyAppointmentStats.doctor_id == doctor_id,
+            col(WeeklyAppointmentStats.week) >= start,
+            col(WeeklyAppointmentStats.week) <= end,
+        )
+        .order_by(col(WeeklyAppointmentStats.week))
+    )
+    return list(session.exec(statement).all())
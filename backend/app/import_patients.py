@@ -0,0 +1,70 @@
+"""
+Crée des utilisateurs en masse depuis un fichier CSV ou JSONL (mêmes champs
+que `UserCreate`), par exemple les patients d'une nouvelle clinique.
+
+    python -m app.import_patients patients.jsonl --workers 8 --errors rejets.jsonl
+
+Le rapport des lignes refusées est écrit en JSONL dans --errors, sinon sur la
+sortie standard.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.security import shutdown_password_pool
+from app.services.patient_import import CHUNK_SIZE, ImportFormat, import_patients
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=[f.value for f in ImportFormat])
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.PASSWORD_HASH_WORKERS,
+        help="processus de hachage des mots de passe",
+    )
+    parser.add_argument("--errors", type=Path)
+    args = parser.parse_args()
+
+    file_format = (
+        ImportFormat(args.format)
+        if args.format
+        else ImportFormat.from_filename(args.path.name)
+    )
+    if file_format is None:
+        parser.error("unknown file type, pass --format")
+    # Lu à la création du pool, au premier hachage
+    settings.PASSWORD_HASH_WORKERS = args.workers
+
+    try:
+        with args.path.open("rb") as stream, Session(engine) as session:
+            report = import_patients(
+                session, stream, file_format, chunk_size=args.chunk_size
+            )
+    finally:
+        shutdown_password_pool()
+
+    lines = "".join(error.model_dump_json() + "\n" for error in report.errors)
+    if args.errors:
+        args.errors.write_text(lines)
+    else:
+        sys.stdout.write(lines)
+    logger.info(f"{report.imported} users imported, {len(report.errors)} rows rejected")
+
+
+if __name__ == "__main__":
+    main()
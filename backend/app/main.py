@@ -3,7 +3,9 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI
+import secrets
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 from sqlmodel import Session
@@ -11,7 +13,23 @@ from sqlmodel import Session
 from app.api.main import api_router
 from app.core.config import settings
 from app.initial_data import populate_db
-from app.core.db import engine
+from app.core.db import (
+    check_connection_budget,
+    engine,
+    warm_up_async_pool,
+    warm_up_pool,
+)
+from app.core.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    instrument_engines,
+    registry,
+)
+from app.core.security import shutdown_password_pool
+from app.services.email_queue import email_worker
+from app.services.llm_batch import stale_job_watcher
+from app.services.notification_hub import notification_hub
+from app.utils import preload_email_templates
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     tag = route.tags[0] if route.tags else "default"
@@ -39,6 +57,19 @@ if settings.all_cors_origins:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Per-route request counts, latencies and SQL statements, exposed on /metrics
+instrument_engines()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request) -> Response:
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 # Événement de démarrage pour peupler la base
 @app.on_event("startup")
 def on_startup():
@@ -46,3 +77,23 @@ def on_startup():
     if settings.ENVIRONMENT == "local":
         with Session(engine) as session:
             populate_db()
+    check_connection_budget()
+    warm_up_pool()
+    preload_email_templates()
+    if settings.emails_enabled:
+        email_worker.start()
+
+
+@app.on_event("startup")
+async def on_startup_async():
+    await warm_up_async_pool()
+    # Travaux LLM en lot laissés en cours par un worker redémarré
+    stale_job_watcher.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_password_pool()
+    email_worker.stop()
+    await stale_job_watcher.stop()
+    await notification_hub.close()
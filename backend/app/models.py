@@ -1,18 +1,37 @@
-from datetime import datetime
 import uuid
-
+from datetime import date, datetime, timezone
 from enum import Enum
+from typing import Annotated, Literal, Optional
+
+from pydantic import BaseModel, EmailStr, model_validator
+from pydantic import Field as PydanticField
+from sqlalchemy import BigInteger, CheckConstraint, Index, Text, text
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.orm import deferred
+from sqlmodel import Column, Field, LargeBinary, Relationship, SQLModel
+from typing_extensions import Self
+
 
 class NotificationTypeEnum(str, Enum):
     message = "message"
     consultation = "consultation"
     analysis = "analysis"
 
-from pydantic import EmailStr
-from sqlmodel import Field, Relationship, SQLModel, Column, LargeBinary
-from sqlalchemy import Enum as SAEnum
-from typing import Optional
-from pydantic import BaseModel
+
+class EmailStatusEnum(str, Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+
+class LLMBatchStatusEnum(str, Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
 
 # Shared properties
 class UserBase(SQLModel):
@@ -57,12 +76,28 @@ class UpdatePassword(SQLModel):
 
 # Database model, database table inferred from class name
 class User(UserBase, table=True):
+    # Trigram indexes (pg_trgm) serving the doctor's patient search
+    __table_args__ = (
+        Index(
+            "ix_user_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_user_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
     # Extra fields that apply based on role:
     specialization: str | None = Field(default=None, max_length=255)  # only for doctors
     date_of_birth: str | None = Field(default=None, max_length=10)  # only for patients
-    doctor_id: uuid.UUID | None = Field(default=None, foreign_key="user.id")
+    doctor_id: uuid.UUID | None = Field(default=None, foreign_key="user.id", index=True)
 
     # Relationship: if this user is a patient, the 'doctor' relationship points to a doctor record.
     doctor: Optional["User"] = Relationship(
@@ -99,9 +134,33 @@ class UserPublic(UserBase):
     id: uuid.UUID
 
 
+class PatientPublic(UserPublic):
+    date_of_birth: str | None = None
+    # Search relevance, only set when searching
+    score: float | None = None
+
+
+class PatientsPublic(SQLModel):
+    data: list[PatientPublic]
+    next_cursor: str | None = None
+
+
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+
+
+class UserImportError(SQLModel):
+    # Line of the row in the imported file (1 is a CSV header)
+    line: int
+    email: str | None = None
+    errors: list[str]
+
+
+class UsersImportReport(SQLModel):
+    imported: int
+    errors: list[UserImportError]
 
 
 # Shared properties
@@ -122,6 +181,9 @@ class ItemUpdate(ItemBase):
 
 # Database model, database table inferred from class name
 class Item(ItemBase, table=True):
+    # Serves the owner's item list in keyset (owner_id, id) order
+    __table_args__ = (Index("ix_item_owner_id_id", "owner_id", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     title: str = Field(max_length=255)
     owner_id: uuid.UUID = Field(
@@ -138,7 +200,46 @@ class ItemPublic(ItemBase):
 
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+
+
+# Operations of a batch request on items, told apart by `op`
+class ItemBatchCreate(SQLModel):
+    op: Literal["create"]
+    item: ItemCreate
+
+
+class ItemBatchUpdate(SQLModel):
+    op: Literal["update"]
+    id: uuid.UUID
+    item: ItemUpdate
+
+
+class ItemBatchDelete(SQLModel):
+    op: Literal["delete"]
+    id: uuid.UUID
+
+
+ItemBatchOperation = Annotated[
+    ItemBatchCreate | ItemBatchUpdate | ItemBatchDelete,
+    PydanticField(discriminator="op"),
+]
+
+
+class ItemsBatch(SQLModel):
+    operations: list[ItemBatchOperation] = Field(min_length=1, max_length=1000)
+
+
+class ItemBatchResult(SQLModel):
+    # HTTP status the single-item endpoint would have answered
+    status: int
+    item: ItemPublic | None = None
+    detail: str | None = None
+
+
+class ItemsBatchResults(SQLModel):
+    data: list[ItemBatchResult]
 
 
 # Generic message
@@ -157,6 +258,16 @@ class TokenPayload(SQLModel):
     sub: str | None = None
 
 
+# What authentication needs to know about a user, cached between requests
+class Principal(SQLModel):
+    id: uuid.UUID
+    email: EmailStr
+    full_name: str | None = None
+    is_active: bool
+    is_superuser: bool
+    specialization: str | None = None
+
+
 class NewPassword(SQLModel):
     token: str
     new_password: str = Field(min_length=8, max_length=40)
@@ -165,12 +276,54 @@ class NewPassword(SQLModel):
 ##################################################
 # Appointment model linking patients and doctors #
 ##################################################
-class Appointment(SQLModel, table=True):
+# Créneau [starts_at, ends_at) d'un rendez-vous, en UTC comme les autres dates
+APPOINTMENT_RANGE = "tsrange(starts_at, ends_at, '[)')"
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class AppointmentBase(SQLModel):
+    patient_id: uuid.UUID
+    starts_at: datetime
+    ends_at: datetime
+    reason: str | None = Field(default=None, max_length=255)
+
+
+class AppointmentCreate(AppointmentBase):
+    @model_validator(mode="after")
+    def _check_range(self) -> Self:
+        # Un début avec fuseau et une fin sans ne se comparent pas tels quels
+        self.starts_at = naive_utc(self.starts_at)
+        self.ends_at = naive_utc(self.ends_at)
+        if self.ends_at <= self.starts_at:
+            raise ValueError("ends_at must be after starts_at")
+        return self
+
+
+class Appointment(AppointmentBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     patient_id: uuid.UUID = Field(foreign_key="user.id")
     doctor_id: uuid.UUID = Field(foreign_key="user.id")
-    appointment_date: str = Field(max_length=19)  # Format "YYYY-MM-DD HH:MM:SS"
-    reason: str | None = Field(default=None, max_length=255)
+
+    __table_args__ = (
+        CheckConstraint("ends_at > starts_at", name="appointment_ends_after_start"),
+        # Deux rendez-vous d'un même médecin ne peuvent pas se chevaucher, même
+        # réservés en même temps. L'index GiST de la contrainte (btree_gist pour
+        # doctor_id) sert aussi les requêtes d'agenda sur la même expression.
+        ExcludeConstraint(  # type: ignore[no-untyped-call]
+            ("doctor_id", "="),
+            (text(APPOINTMENT_RANGE), "&&"),
+            name="appointment_doctor_id_range_excl",
+            using="gist",
+        ),
+        # Rendez-vous d'un médecin commençant dans une semaine (statistiques)
+        Index("ix_appointment_doctor_id_starts_at", "doctor_id", "starts_at"),
+    )
 
     # Relationships
     patient: User | None = Relationship(
@@ -183,31 +336,335 @@ class Appointment(SQLModel, table=True):
     )
 
 
-# MedicalRecord now stores a PDF resume and a scanner image (as file paths, URLs, or similar)
-class MedicalRecord(SQLModel, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+class AppointmentPublic(AppointmentBase):
+    id: uuid.UUID
+    doctor_id: uuid.UUID
+
+
+class AppointmentsPublic(SQLModel):
+    data: list[AppointmentPublic]
+
+
+class WeeklyAppointmentStats(SQLModel, table=True):
+    """
+    Rendez-vous et patients distincts par médecin et par semaine ISO (`week`
+    est son lundi, d'après `starts_at`). Tenu à jour par des triggers sur
+    `appointment` : seules les semaines touchées sont recalculées.
+    """
+
+    doctor_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    week: date = Field(primary_key=True)
+    appointments: int = 0
+    patients: int = 0
+
+
+class WeeklyAppointmentStatsPublic(SQLModel):
+    week: date
+    iso_year: int
+    iso_week: int
+    appointments: int
+    patients: int
+
+
+class WeeklyAppointmentStatsList(SQLModel):
+    data: list[WeeklyAppointmentStatsPublic]
+
+
+class MedicalRecordBlob(str, Enum):
+    pdf_resume = "pdf_resume"
+    scanner_image = "scanner_image"
+
+
+class MedicalRecordBase(SQLModel):
     patient_id: uuid.UUID = Field(foreign_key="user.id")
     record_date: str = Field(max_length=10)  # Format "YYYY-MM-DD"
     description: str = Field(max_length=1024)
-    pdf_resume: bytes | None = Field(default=None, sa_column=Column(LargeBinary))
-    scanner_image: bytes | None = Field(default=None, sa_column=Column(LargeBinary))
+
+
+class MedicalRecordCreate(MedicalRecordBase):
+    pass
+
+
+# Legacy inline content, moved to the blob store by app/move_medical_record_blobs.py.
+# Deferred and raising: they are never loaded with the row, only selected explicitly.
+_pdf_resume_column = Column("pdf_resume", LargeBinary)
+_scanner_image_column = Column("scanner_image", LargeBinary)
+
+
+# MedicalRecord stores a PDF resume and a scanner image in the blob store
+class MedicalRecord(MedicalRecordBase, table=True):
+    __table_args__ = (
+        Index(
+            "ix_medicalrecord_patient_id_record_date_id",
+            "patient_id",
+            "record_date",
+            "id",
+        ),
+    )
+    __mapper_args__ = {
+        "properties": {
+            "pdf_resume": deferred(_pdf_resume_column, group="blobs", raiseload=True),
+            "scanner_image": deferred(
+                _scanner_image_column, group="blobs", raiseload=True
+            ),
+        }
+    }
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    pdf_resume: bytes | None = Field(default=None, sa_column=_pdf_resume_column)
+    scanner_image: bytes | None = Field(default=None, sa_column=_scanner_image_column)
+    # Blob store references: key is the sha256 of the content
+    pdf_resume_key: str | None = Field(default=None, max_length=64)
+    pdf_resume_size: int | None = Field(default=None, sa_type=BigInteger)
+    pdf_resume_content_type: str | None = Field(default=None, max_length=255)
+    scanner_image_key: str | None = Field(default=None, max_length=64)
+    scanner_image_size: int | None = Field(default=None, sa_type=BigInteger)
+    scanner_image_content_type: str | None = Field(default=None, max_length=255)
     patient: User | None = Relationship(back_populates="medical_records")
 
+
+class MedicalRecordPublic(MedicalRecordBase):
+    id: uuid.UUID
+    pdf_resume_key: str | None = None
+    pdf_resume_size: int | None = None
+    pdf_resume_content_type: str | None = None
+    scanner_image_key: str | None = None
+    scanner_image_size: int | None = None
+    scanner_image_content_type: str | None = None
+
+
+class MedicalRecordsPublic(SQLModel):
+    data: list[MedicalRecordPublic]
+    next_cursor: str | None = None
+
 class TranslationRequest(SQLModel):
     input_str: str
 
+
 class Notification(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     doctor_id: uuid.UUID = Field(foreign_key="user.id")
     type: NotificationTypeEnum = Field(
         sa_column=Column(SAEnum(NotificationTypeEnum, name="notificationtype", create_constraint=True))
     )
-    content: Optional[str] = Field(default=None, max_length=255)
-    pdf_url: Optional[str] = Field(default=None, max_length=255)
+    content: str | None = Field(default=None, max_length=255)
+    pdf_url: str | None = Field(default=None, max_length=255)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    read_at: datetime | None = None
 
     # Relation avec l'utilisateur (docteur)
-    doctor: Optional["User"] = Relationship(back_populates="notifications")
+    doctor: User | None = Relationship(back_populates="notifications")
+
+    # Fil du médecin, du plus récent au plus ancien
+    __table_args__ = (
+        Index("ix_notification_doctor_id_created_at", "doctor_id", "created_at"),
+    )
+
+
+class NotificationPublic(SQLModel):
+    id: uuid.UUID
+    type: NotificationTypeEnum
+    content: str | None = None
+    pdf_url: str | None = None
+    created_at: datetime
+    read_at: datetime | None = None
+
+
+class NotificationsPublic(SQLModel):
+    data: list[NotificationPublic]
+    next_cursor: str | None = None
+    unread: int
+
+
+class NotificationsMarkRead(SQLModel):
+    # Sans ids : toutes les notifications non lues créées jusqu'à `until`
+    ids: list[uuid.UUID] | None = None
+    until: datetime | None = None
+
+
+class NotificationUnreadCount(SQLModel):
+    unread: int
+
+
+class NotificationCounter(SQLModel, table=True):
+    """
+    Nombre de notifications non lues par médecin, tenu à jour par des triggers
+    sur `notification` pour que le badge ne compte pas les lignes à chaque appel.
+    """
+
+    doctor_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    unread: int = 0
+
+
+class DoctorDashboardPublic(SQLModel):
+    unread_notifications: int
+    patients: int
+    upcoming_appointments: list[AppointmentPublic]
+    recent_notifications: list[NotificationPublic]
+
+
+# Messages échangés entre un médecin et ses patients
+class DoctorMessageBase(SQLModel):
+    patient_id: uuid.UUID
+    content: str = Field(min_length=1, max_length=5000)
+
+
+class DoctorMessageCreate(DoctorMessageBase):
+    pass
+
+
+class DoctorMessagesSend(SQLModel):
+    # Insérés en une seule requête
+    messages: list[DoctorMessageCreate] = Field(min_length=1, max_length=1000)
+
+
+class DoctorMessage(DoctorMessageBase, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    doctor_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    patient_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    sent_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        # Conversation avec un patient
+        Index(
+            "ix_doctormessage_doctor_id_patient_id_sent_at",
+            "doctor_id",
+            "patient_id",
+            "sent_at",
+        ),
+        # Historique de tous les patients du médecin
+        Index("ix_doctormessage_doctor_id_sent_at", "doctor_id", "sent_at"),
+    )
+
+
+class DoctorMessagePublic(DoctorMessageBase):
+    id: uuid.UUID
+    doctor_id: uuid.UUID
+    sent_at: datetime
+
+
+class DoctorMessagesPublic(SQLModel):
+    data: list[DoctorMessagePublic]
+    next_cursor: str | None = None
+
 
 class LLMAnalyzeRequest(BaseModel):
-    prompt: str
\ No newline at end of file
+    prompt: str
+    # Ignore la réponse en cache (la nouvelle réponse remplace l'ancienne)
+    bypass_cache: bool = False
+
+
+# Réponses LLM partagées entre workers, adressées par le hash de la requête
+class LLMCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=64)
+    model: str = Field(max_length=255)
+    response: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+
+# Analyse LLM groupée : un travail par soumission, une ligne par prompt
+class LLMBatchRequest(SQLModel):
+    prompts: list[str] = Field(min_length=1, max_length=200)
+    bypass_cache: bool = False
+    # Notifier le médecin à chaque prompt terminé, et pas seulement à la fin
+    notify_each: bool = False
+
+
+class LLMBatchJob(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    doctor_id: uuid.UUID = Field(foreign_key="user.id", index=True)
+    status: LLMBatchStatusEnum = Field(
+        default=LLMBatchStatusEnum.pending,
+        sa_column=Column(
+            SAEnum(LLMBatchStatusEnum, name="llmbatchstatus", create_constraint=True),
+            nullable=False,
+        ),
+    )
+    total: int
+    completed: int = 0
+    failed: int = 0
+    notify_each: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+
+    items: list["LLMBatchItem"] = Relationship(
+        back_populates="job", sa_relationship_kwargs={"cascade": "delete"}
+    )
+
+
+class LLMBatchItem(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    job_id: uuid.UUID = Field(
+        foreign_key="llmbatchjob.id", nullable=False, ondelete="CASCADE", index=True
+    )
+    position: int
+    prompt: str
+    status: LLMBatchStatusEnum = Field(
+        default=LLMBatchStatusEnum.pending,
+        sa_column=Column(
+            SAEnum(LLMBatchStatusEnum, name="llmbatchstatus", create_constraint=True),
+            nullable=False,
+        ),
+    )
+    result: str | None = None
+    error: str | None = Field(default=None, max_length=1024)
+    finished_at: datetime | None = None
+
+    job: LLMBatchJob | None = Relationship(back_populates="items")
+
+
+class LLMBatchItemPublic(SQLModel):
+    id: uuid.UUID
+    position: int
+    prompt: str
+    status: LLMBatchStatusEnum
+    result: str | None
+    error: str | None
+    finished_at: datetime | None
+
+
+class LLMBatchJobPublic(SQLModel):
+    id: uuid.UUID
+    status: LLMBatchStatusEnum
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: datetime | None
+    items: list[LLMBatchItemPublic] = []
+
+
+# Outgoing email, sent by the background worker in app/services/email_queue.py
+class OutboundEmail(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    email_to: EmailStr = Field(max_length=255)
+    subject: str = Field(max_length=1024)
+    html_content: str = Field(sa_type=Text)
+    status: EmailStatusEnum = Field(
+        default=EmailStatusEnum.pending,
+        sa_column=Column(
+            SAEnum(EmailStatusEnum, name="emailstatus", create_constraint=True),
+            nullable=False,
+        ),
+    )
+    attempts: int = 0
+    last_error: str | None = Field(default=None, max_length=1024)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # While sending, the end of the worker's claim on the email
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: datetime | None = None
+
+    __table_args__ = (
+        # Only pending emails and expired claims are polled; sent ones stay out
+        # of the index
+        Index(
+            "ix_outboundemail_due_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+    )
@@ -0,0 +1,66 @@
+import io
+import logging
+
+from sqlalchemy.orm import undefer_group
+from sqlmodel import Session, col, or_, select
+
+from app import crud
+from app.core.db import engine
+from app.models import MedicalRecord, MedicalRecordBlob
+from app.services.blob_store import BlobStore, blob_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+
+
+def move_inline_blobs(
+    session: Session, store: BlobStore, batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Déplace le contenu des colonnes binaires de MedicalRecord vers le blob store,
+    par lots pour ne garder que `batch_size` dossiers en mémoire. Chaque lot est
+    validé séparément : le script peut être interrompu et relancé.
+    """
+    moved = 0
+    while True:
+        records = session.exec(
+            select(MedicalRecord)
+            .options(undefer_group("blobs"))
+            .where(
+                or_(
+                    col(MedicalRecord.pdf_resume).is_not(None),
+                    col(MedicalRecord.scanner_image).is_not(None),
+                )
+            )
+            .limit(batch_size)
+        ).all()
+        if not records:
+            return moved
+        for record in records:
+            for blob in MedicalRecordBlob:
+                content = getattr(record, blob.value)
+                if content is None:
+                    continue
+                crud.set_medical_record_blob(
+                    record=record,
+                    blob=blob,
+                    info=store.put(io.BytesIO(content)),
+                )
+            session.add(record)
+        session.commit()
+        # Libère les octets déjà déplacés avant le lot suivant
+        session.expunge_all()
+        moved += len(records)
+        logger.info(f"Moved files of {moved} medical records to the blob store")
+
+
+def main() -> None:
+    with Session(engine) as session:
+        moved = move_inline_blobs(session, blob_store)
+    logger.info(f"{moved} medical records moved to the blob store")
+
+
+if __name__ == "__main__":
+    main()
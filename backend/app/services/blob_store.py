@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobNotFoundError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    # sha256 du contenu, qui sert aussi de clé
+    key: str
+    size: int
+
+
+class BlobStore(Protocol):
+    def put(self, stream: BinaryIO) -> BlobInfo: ...
+
+    def open(self, key: str) -> BinaryIO: ...
+
+    def exists(self, key: str) -> bool: ...
+
+
+class LocalBlobStore:
+    """
+    Blobs adressés par leur contenu sur le système de fichiers local :
+    `<root>/ab/cd/abcd...` pour la clé sha256 `abcd...`.
+
+    Un même fichier envoyé deux fois n'est stocké qu'une fois. Les blobs ne sont
+    jamais réécrits, ce qui permet de les servir sans verrou.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        if not _KEY_PATTERN.fullmatch(key):
+            raise BlobNotFoundError(key)
+        return self.root / key[:2] / key[2:4] / key
+
+    def put(self, stream: BinaryIO) -> BlobInfo:
+        """
+        Copie `stream` par morceaux dans un fichier temporaire en calculant son
+        hash, puis le renomme à sa place définitive.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(
+            dir=self.root, prefix=".upload-", delete=False
+        ) as tmp:
+            try:
+                while chunk := stream.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+
+        info = BlobInfo(key=digest.hexdigest(), size=size)
+        path = self._path(info.key)
+        if path.exists():
+            os.unlink(tmp.name)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp.name, path)
+        return info
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self._path(key).open("rb")
+        except FileNotFoundError:
+            raise BlobNotFoundError(key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            return self._path(key).is_file()
+        except BlobNotFoundError:
+            return False
+
+
+def iter_range(
+    file: BinaryIO, start: int, end: int, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Lit les octets `start` à `end` (inclus) de `file` par morceaux, puis le ferme."""
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def create_blob_store() -> BlobStore:
+    return LocalBlobStore(settings.BLOB_STORE_PATH)
+
+
+blob_store = create_blob_store()
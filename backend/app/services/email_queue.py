@@ -0,0 +1,357 @@
+import logging
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+import emails  # type: ignore
+from sqlmodel import Session, col, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import EmailStatusEnum, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+Connect = Callable[[], smtplib.SMTP]
+
+
+def smtp_connect() -> smtplib.SMTP:
+    """Ouvre une connexion SMTP selon la configuration (TLS/SSL, authentification)."""
+    assert settings.SMTP_HOST, "no provided configuration for email variables"
+    timeout = settings.SMTP_TIMEOUT_SECONDS
+    server: smtplib.SMTP
+    if settings.SMTP_TLS:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=timeout)
+        server.starttls()
+    elif settings.SMTP_SSL:
+        server = smtplib.SMTP_SSL(
+            settings.SMTP_HOST, settings.SMTP_PORT, timeout=timeout
+        )
+    else:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=timeout)
+    if settings.SMTP_USER and settings.SMTP_PASSWORD:
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+    return server
+
+
+def _quit(conn: smtplib.SMTP) -> None:
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        conn.close()
+
+
+class SMTPConnectionPool:
+    """
+    Au plus `size` connexions SMTP ouvertes, réutilisées d'un email à l'autre
+    pour ne pas refaire la connexion, STARTTLS et l'authentification à chaque
+    envoi. Une connexion inutilisée depuis plus de `idle_timeout` secondes est
+    fermée plutôt que réutilisée (le relais l'a probablement déjà coupée).
+    """
+
+    def __init__(
+        self, size: int, idle_timeout: float, connect: Connect = smtp_connect
+    ) -> None:
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.connect = connect
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: list[tuple[smtplib.SMTP, float]] = []
+        self.opened = 0
+        self.reused = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        with self._slots:
+            conn = self._take()
+            try:
+                yield conn
+            except smtplib.SMTPServerDisconnected:
+                conn.close()
+                raise
+            except smtplib.SMTPException:
+                # Refus du serveur : la connexion reste utilisable
+                self._give_back(conn)
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._give_back(conn)
+
+    def prune(self) -> None:
+        """Ferme les connexions restées inutilisées trop longtemps."""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            stale = [conn for conn, used in self._idle if used < deadline]
+            self._idle = [(conn, used) for conn, used in self._idle if used >= deadline]
+        for conn in stale:
+            _quit(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _quit(conn)
+
+    def _take(self) -> smtplib.SMTP:
+        self.prune()
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()[0]
+        conn = self.connect()
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _give_back(self, conn: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+
+def retry_delay(attempts: int) -> float:
+    """Délai avant la tentative suivante : doublé à chaque échec, avec un peu d'aléa."""
+    delay = min(
+        settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.EMAIL_RETRY_MAX_SECONDS,
+    )
+    return float(delay * random.uniform(0.8, 1.2))
+
+
+def _is_permanent(error: Exception) -> bool:
+    # Codes 5xx : inutile de réessayer, sauf erreur de configuration du relais
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return (
+        isinstance(error, smtplib.SMTPResponseException)
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+        and error.smtp_code >= 500
+    )
+
+
+def _message(email_to: str, subject: str, html_content: str) -> bytes:
+    message = emails.Message(
+        subject=subject,
+        html=html_content,
+        mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
+        mail_to=email_to,
+    )
+    return str(message.as_string()).encode()
+
+
+class EmailWorker:
+    """
+    Envoie en arrière-plan les emails de la table `outboundemail`.
+
+    Chaque lot d'emails dus est réservé (FOR UPDATE SKIP LOCKED, puis statut
+    `sending` validé aussitôt) avant l'envoi : plusieurs workers peuvent
+    tourner sans envoyer deux fois le même email, et aucune transaction ne
+    reste ouverte pendant les échanges SMTP. Un échec temporaire reprogramme
+    l'email avec un délai croissant ; après EMAIL_MAX_ATTEMPTS tentatives, ou sur un refus définitif
+    (5xx), il passe en `failed`.
+    """
+
+    def __init__(
+        self, pool: SMTPConnectionPool, *, concurrency: int, batch_size: int
+    ) -> None:
+        self.pool = pool
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._executor: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._sent_times: deque[float] = deque()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="email-worker", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.pool.close()
+
+    def wake(self) -> None:
+        """Signale un nouvel email, pour l'envoyer sans attendre le prochain passage."""
+        self._wake.set()
+
+    def run_once(self) -> int:
+        """Envoie un lot d'emails dus ; renvoie le nombre d'emails traités."""
+        due = self._claim()
+        if not due:
+            return 0
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix="email-send"
+            )
+        # Hors transaction : un relais lent ne garde ni connexion ni verrou
+        messages = [(e.email_to, e.subject, e.html_content) for e in due]
+        errors = list(self._executor.map(lambda m: self._send(*m), messages))
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            for email, error in zip(due, errors, strict=True):
+                self._record(email, error, now)
+                session.add(email)
+            session.commit()
+        return len(due)
+
+    def _claim(self) -> list[OutboundEmail]:
+        """
+        Réserve un lot d'emails dus en les passant en `sending` jusqu'à
+        `next_attempt_at` (maintenant + EMAIL_SEND_LEASE_SECONDS), dans une
+        transaction courte. Un email resté en `sending` après ce délai, parce
+        que son worker s'est arrêté, est de nouveau dû.
+        """
+        now = datetime.utcnow()
+        with Session(engine, expire_on_commit=False) as session:
+            statement = (
+                select(OutboundEmail)
+                .where(
+                    col(OutboundEmail.status).in_(
+                        [EmailStatusEnum.pending, EmailStatusEnum.sending]
+                    ),
+                    col(OutboundEmail.next_attempt_at) <= now,
+                )
+                .order_by(col(OutboundEmail.next_attempt_at))
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            due = list(session.exec(statement).all())
+            lease = now + timedelta(seconds=settings.EMAIL_SEND_LEASE_SECONDS)
+            for email in due:
+                email.status = EmailStatusEnum.sending
+                email.next_attempt_at = lease
+                session.add(email)
+            session.commit()
+        return due
+
+    def stats(self) -> dict[str, Any]:
+        with Session(engine) as session:
+            counts = dict(
+                session.exec(
+                    select(OutboundEmail.status, func.count())
+                    .where(
+                        col(OutboundEmail.status).in_(
+                            [EmailStatusEnum.pending, EmailStatusEnum.sending]
+                        )
+                    )
+                    .group_by(OutboundEmail.status)
+                ).all()
+            )
+        with self._stats_lock:
+            self._trim(time.monotonic())
+            recent = len(self._sent_times)
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "pending": counts.get(EmailStatusEnum.pending, 0),
+                "sending": counts.get(EmailStatusEnum.sending, 0),
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "sent_per_second": round(recent / THROUGHPUT_WINDOW_SECONDS, 2),
+                "smtp_connections_opened": self.pool.opened,
+                "smtp_connection_reuses": self.pool.reused,
+            }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Email worker failed to process a batch")
+                processed = 0
+            if processed < self.batch_size:
+                self.pool.prune()
+                self._wake.wait(settings.EMAIL_POLL_SECONDS)
+                self._wake.clear()
+
+    def _send(self, email_to: str, subject: str, html_content: str) -> Exception | None:
+        message = _message(email_to, subject, html_content)
+        for retry in (False, True):
+            try:
+                with self.pool.connection() as conn:
+                    conn.sendmail(str(settings.EMAILS_FROM_EMAIL), [email_to], message)
+                return None
+            except smtplib.SMTPServerDisconnected as e:
+                # Connexion réutilisée déjà fermée par le relais : une nouvelle suffit
+                if retry:
+                    return e
+            except Exception as e:
+                return e
+        return None
+
+    def _record(
+        self, email: OutboundEmail, error: Exception | None, now: datetime
+    ) -> None:
+        email.attempts += 1
+        with self._stats_lock:
+            if error is None:
+                email.status = EmailStatusEnum.sent
+                email.sent_at = now
+                email.last_error = None
+                self.sent += 1
+                self._sent_times.append(time.monotonic())
+                return
+            email.last_error = str(error)[:1024]
+            if _is_permanent(error) or email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                email.status = EmailStatusEnum.failed
+                self.failed += 1
+                logger.warning(f"Giving up on email {email.id}: {error}")
+            else:
+                email.status = EmailStatusEnum.pending
+                email.next_attempt_at = now + timedelta(
+                    seconds=retry_delay(email.attempts)
+                )
+                self.retried += 1
+
+    def _trim(self, now: float) -> None:
+        while (
+            self._sent_times and self._sent_times[0] < now - THROUGHPUT_WINDOW_SECONDS
+        ):
+            self._sent_times.popleft()
+
+
+def enqueue_email(
+    session: Session, *, email_to: str, subject: str, html_content: str
+) -> OutboundEmail:
+    """Enregistre l'email à envoyer ; il part en arrière-plan, hors de la requête."""
+    email = OutboundEmail(email_to=email_to, subject=subject, html_content=html_content)
+    session.add(email)
+    session.commit()
+    email_worker.wake()
+    return email
+
+
+email_worker = EmailWorker(
+    SMTPConnectionPool(
+        settings.EMAIL_WORKER_CONCURRENCY, settings.SMTP_IDLE_TIMEOUT_SECONDS
+    ),
+    concurrency=settings.EMAIL_WORKER_CONCURRENCY,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+)
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, col, func, select, update
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import (
+    LLMBatchItem,
+    LLMBatchJob,
+    LLMBatchStatusEnum,
+    Notification,
+    NotificationTypeEnum,
+)
+from app.services.llm_service import LLMGateway, LLMOverloadedError, llm_gateway
+
+logger = logging.getLogger(__name__)
+
+# Un travail en lot ne doit pas échouer parce que les requêtes interactives
+# occupent momentanément la file de la passerelle : on réessaie avec un délai.
+OVERLOAD_RETRIES = 5
+OVERLOAD_BACKOFF_SECONDS = 0.5
+
+
+async def run_batch_job(
+    job_id: uuid.UUID,
+    *,
+    use_cache: bool = True,
+    gateway: LLMGateway = llm_gateway,
+    concurrency: int | None = None,
+) -> None:
+    """
+    Traite les prompts d'un travail, au plus `concurrency` à la fois, enregistre
+    chaque résultat dès qu'il est prêt et notifie le médecin à la fin du travail
+    (et à chaque prompt si le travail le demande).
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.LLM_BATCH_CONCURRENCY)
+
+    async def process(item_id: uuid.UUID, prompt: str) -> None:
+        async with semaphore:
+            try:
+                result = await _generate(gateway, prompt, use_cache=use_cache)
+            except Exception as e:
+                logger.warning(f"Batch job {job_id}: item {item_id} failed: {e}")
+                await asyncio.to_thread(_finish_item, job_id, item_id, error=str(e))
+            else:
+                await asyncio.to_thread(_finish_item, job_id, item_id, result=result)
+
+    # Le travail est clos quoi qu'il arrive (erreur base, annulation à l'arrêt) :
+    # les prompts restés en attente y sont comptés en échec.
+    try:
+        items = await asyncio.to_thread(_start_job, job_id)
+        outcomes = await asyncio.gather(
+            *(process(item_id, prompt) for item_id, prompt in items),
+            return_exceptions=True,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                logger.error(f"Batch job {job_id}: item not recorded: {outcome!r}")
+    finally:
+        await asyncio.to_thread(_finish_job, job_id)
+
+
+def fail_stale_jobs(stale_after: float | None = None) -> int:
+    """
+    Clôt les travaux `pending` ou `running` sans prompt terminé depuis
+    `stale_after` secondes : le worker qui les traitait a redémarré et ne les
+    finira pas. Leurs prompts en attente passent en échec et le médecin est
+    notifié. Renvoie le nombre de travaux clos.
+    """
+    if stale_after is None:
+        stale_after = settings.LLM_BATCH_STALE_SECONDS
+    deadline = datetime.utcnow() - timedelta(seconds=stale_after)
+    last_finished = (
+        select(func.max(LLMBatchItem.finished_at))
+        .where(LLMBatchItem.job_id == LLMBatchJob.id)
+        .scalar_subquery()
+    )
+    with Session(engine) as session:
+        # SKIP LOCKED : plusieurs workers démarrent en même temps sans clore
+        # deux fois le même travail
+        jobs = session.exec(
+            select(LLMBatchJob)
+            .where(
+                col(LLMBatchJob.status).in_(
+                    [LLMBatchStatusEnum.pending, LLMBatchStatusEnum.running]
+                ),
+                func.greatest(LLMBatchJob.created_at, last_finished) < deadline,
+            )
+            .with_for_update(skip_locked=True)
+        ).all()
+        for job in jobs:
+            logger.warning(f"Batch job {job.id} interrupted, marking it as finished")
+            _close_job(session, job, interrupted=True)
+        session.commit()
+    return len(jobs)
+
+
+class StaleJobWatcher:
+    """
+    Appelle `fail_stale_jobs` au démarrage puis toutes les `interval`
+    secondes, pour les travaux d'un worker arrêté pendant qu'un autre tourne.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(fail_stale_jobs)
+            except Exception:
+                logger.exception("Failed to close stale batch jobs")
+            await asyncio.sleep(self.interval)
+
+
+async def _generate(gateway: LLMGateway, prompt: str, *, use_cache: bool) -> str:
+    for attempt in range(OVERLOAD_RETRIES):
+        try:
+            return await gateway.generate(prompt, use_cache=use_cache)
+        except LLMOverloadedError:
+            if attempt == OVERLOAD_RETRIES - 1:
+                raise
+            await asyncio.sleep(OVERLOAD_BACKOFF_SECONDS * 2**attempt)
+    raise AssertionError("unreachable")
+
+
+def _start_job(job_id: uuid.UUID) -> list[tuple[uuid.UUID, str]]:
+    with Session(engine) as session:
+        session.exec(
+            update(LLMBatchJob)  # type: ignore
+            .where(col(LLMBatchJob.id) == job_id)
+            .values(status=LLMBatchStatusEnum.running)
+        )
+        rows = session.exec(
+            select(LLMBatchItem.id, LLMBatchItem.prompt)
+            .where(
+                LLMBatchItem.job_id == job_id,
+                LLMBatchItem.status == LLMBatchStatusEnum.pending,
+            )
+            .order_by(col(LLMBatchItem.position))
+        ).all()
+        session.commit()
+    return [(item_id, prompt) for item_id, prompt in rows]
+
+
+def _finish_item(
+    job_id: uuid.UUID,
+    item_id: uuid.UUID,
+    *,
+    result: str | None = None,
+    error: str | None = None,
+) -> None:
+    status = LLMBatchStatusEnum.failed if error else LLMBatchStatusEnum.completed
+    with Session(engine) as session:
+        updated = session.exec(
+            update(LLMBatchItem)  # type: ignore
+            .where(
+                col(LLMBatchItem.id) == item_id,
+                col(LLMBatchItem.status) == LLMBatchStatusEnum.pending,
+            )
+            .values(
+                status=status,
+                result=result,
+                error=error[:1024] if error else None,
+                finished_at=datetime.utcnow(),
+            )
+        ).rowcount
+        if not updated:
+            # Travail déjà clos comme interrompu
+            return
+        # Incréments atomiques : plusieurs prompts du même travail finissent en parallèle
+        counter = LLMBatchJob.failed if error else LLMBatchJob.completed
+        job = session.exec(
+            update(LLMBatchJob)  # type: ignore
+            .where(col(LLMBatchJob.id) == job_id)
+            .values({counter: counter + 1})
+            .returning(
+                LLMBatchJob.doctor_id,
+                LLMBatchJob.notify_each,
+                LLMBatchJob.completed,
+                LLMBatchJob.failed,
+                LLMBatchJob.total,
+            )
+        ).one()
+        if job.notify_each:
+            done = job.completed + job.failed
+            outcome = "échec" if error else "terminé"
+            session.add(
+                Notification(
+                    doctor_id=job.doctor_id,
+                    type=NotificationTypeEnum.analysis,
+                    content=f"Analyse groupée : prompt {done}/{job.total} {outcome}",
+                )
+            )
+        session.commit()
+
+
+def _finish_job(job_id: uuid.UUID) -> None:
+    with Session(engine) as session:
+        job = session.get(LLMBatchJob, job_id, with_for_update=True)
+        if job is None or job.finished_at is not None:
+            return
+        _close_job(session, job, interrupted=False)
+        session.commit()
+
+
+def _close_job(session: Session, job: LLMBatchJob, *, interrupted: bool) -> None:
+    now = datetime.utcnow()
+    # Prompts jamais traités (erreur, annulation, redémarrage du worker)
+    if job.completed + job.failed < job.total:
+        job.failed += session.exec(
+            update(LLMBatchItem)  # type: ignore
+            .where(
+                col(LLMBatchItem.job_id) == job.id,
+                col(LLMBatchItem.status) == LLMBatchStatusEnum.pending,
+            )
+            .values(
+                status=LLMBatchStatusEnum.failed,
+                error="Batch job interrupted",
+                finished_at=now,
+            )
+        ).rowcount
+    job.status = (
+        LLMBatchStatusEnum.failed
+        if job.failed == job.total
+        else LLMBatchStatusEnum.completed
+    )
+    job.finished_at = now
+    session.add(job)
+    session.add(
+        Notification(
+            doctor_id=job.doctor_id,
+            type=NotificationTypeEnum.analysis,
+            content=(
+                f"Analyse groupée {'interrompue' if interrupted else 'terminée'} : "
+                f"{job.completed}/{job.total} réussie(s), {job.failed} en échec"
+            ),
+        )
+    )
+
+
+stale_job_watcher = StaleJobWatcher(interval=60)
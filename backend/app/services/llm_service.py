@@ -1,22 +1,522 @@
+import asyncio
+import hashlib
+import json
 import logging
-from google import genai
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator, Callable
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Protocol
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, select
+
 from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import llm_call_duration
+from app.models import LLMCacheEntry
+
+if TYPE_CHECKING:
+    from google import genai
 
 logger = logging.getLogger(__name__)
 
-# Initialise le client avec la clé d'API
-gemini_client = genai.Client(api_key=settings.LLM_API_KEY)
+CACHE_PRUNE_BATCH_SIZE = 100
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMOverloadedError(LLMError):
+    """Trop d'appels en attente sur ce worker : le client doit réessayer plus tard."""
+
+
+class LLMTimeoutError(LLMError):
+    """L'appel (attente comprise) a dépassé son échéance."""
+
+
+class LLMUnavailableError(LLMError):
+    """Le fournisseur configuré n'a pas pu être créé (clé d'API absente, par exemple)."""
+
+
+class LLMProvider(Protocol):
+    model_name: str
+    generation_params: dict[str, Any]
+
+    async def generate(self, prompt: str) -> str: ...
+
+    def stream(self, prompt: str) -> AsyncGenerator[str, None]: ...
+
+
+class GeminiProvider:
+    def __init__(
+        self,
+        client: "genai.Client",
+        model_name: str,
+        generation_params: dict[str, Any] | None = None,
+    ) -> None:
+        self.client = client
+        self.model_name = model_name
+        self.generation_params = generation_params or {}
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=self.generation_params or None,
+        )
+        return response.text or ""
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        chunks = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt,
+            config=self.generation_params or None,
+        )
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeProvider:
+    """
+    Fournisseur local sans réseau : attend `latency` secondes puis renvoie le prompt.
+    Sert aux tests et aux mesures de charge hors ligne.
+    """
+
+    def __init__(self, latency: float = 0.0, model_name: str = "fake") -> None:
+        self.latency = latency
+        self.model_name = model_name
+        self.generation_params: dict[str, Any] = {}
+
+    async def generate(self, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await self._answer(prompt)
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        first, *rest = (await self._answer(prompt)).split(" ")
+        yield first
+        for word in rest:
+            await asyncio.sleep(0)
+            yield " " + word
+
+    async def _answer(self, prompt: str) -> str:
+        return f"[{self.model_name}] {prompt}"
+
 
-def generate_content(prompt: str) -> str:
+def cache_key(model_name: str, prompt: str, params: dict[str, Any]) -> str:
     """
-    Utilise l'API Gemini pour générer du contenu à partir d'un prompt.
+    Hash SHA-256 de (modèle, prompt normalisé, paramètres de génération).
+    La normalisation (NFC, espaces regroupés) fait correspondre les prompts qui
+    ne diffèrent que par leur mise en forme.
     """
-    try:
-        response = gemini_client.models.generate_content(
-            model=settings.LLM_MODEL_NAME,
-            contents=prompt
+    normalized = " ".join(unicodedata.normalize("NFC", prompt).split())
+    payload = json.dumps(
+        {"model": model_name, "prompt": normalized, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache LRU en mémoire, avec expiration, des réponses LLM d'un worker.
+
+    Avec `persist`, les réponses sont aussi écrites dans la table `llmcacheentry`,
+    consultée quand le cache local n'a pas l'entrée : tous les workers profitent
+    ainsi des réponses déjà générées.
+    """
+
+    def __init__(self, *, max_entries: int, ttl: float, persist: bool = False) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist = persist
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, *, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.shared_hits = self.misses = 0
+
+    async def lookup(self, key: str) -> str | None:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.persist:
+            stored = await asyncio.to_thread(self._load, key)
+            if stored is not None:
+                value, remaining = stored
+                self.set(key, value, ttl=remaining)
+                self.hits += 1
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def store(self, key: str, model_name: str, value: str) -> None:
+        self.set(key, value)
+        if self.persist:
+            await asyncio.to_thread(self._save, key, model_name, value)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+        }
+
+    def _load(self, key: str) -> tuple[str, float] | None:
+        try:
+            with Session(engine) as session:
+                entry = session.exec(
+                    select(LLMCacheEntry).where(
+                        LLMCacheEntry.key == key,
+                        col(LLMCacheEntry.expires_at) > datetime.utcnow(),
+                    )
+                ).first()
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        if entry is None:
+            return None
+        remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+        return entry.response, remaining
+
+    def _save(self, key: str, model_name: str, value: str) -> None:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        statement = (
+            insert(LLMCacheEntry)
+            .values(
+                key=key,
+                model=model_name,
+                response=value,
+                created_at=now,
+                expires_at=expires_at,
+            )
+            .on_conflict_do_update(
+                index_elements=[LLMCacheEntry.key],
+                set_={"response": value, "created_at": now, "expires_at": expires_at},
+            )
+        )
+        # Les entrées expirées ne sont plus lues : chaque écriture en supprime
+        # jusqu'à CACHE_PRUNE_BATCH_SIZE, plus qu'elle n'en ajoute.
+        expired = (
+            select(LLMCacheEntry.key)
+            .where(col(LLMCacheEntry.expires_at) <= now)
+            .limit(CACHE_PRUNE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        prune = delete(LLMCacheEntry).where(col(LLMCacheEntry.key).in_(expired))
+        try:
+            with Session(engine) as session:
+                session.exec(statement)  # type: ignore
+                session.execute(prune)
+                session.commit()
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+
+class LLMGateway:
+    """
+    Passerelle asynchrone vers un fournisseur LLM, bornée par worker.
+
+    Au plus `max_concurrency` appels sont en cours en même temps ; au-delà,
+    jusqu'à `max_queue_depth` appelants attendent leur tour, et les suivants
+    sont refusés immédiatement avec `LLMOverloadedError`. Chaque appel, attente
+    comprise, est limité à `timeout` secondes. Les réponses en cache sont
+    servies sans passer par la file d'attente.
+
+    `provider` est un fournisseur ou le nom d'un fournisseur de
+    `provider_registry`, créé alors au premier appel.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider | str,
+        *,
+        max_concurrency: int,
+        max_queue_depth: int,
+        timeout: float,
+        cache: LLMResponseCache | None = None,
+    ) -> None:
+        self._provider = provider
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.timeout = timeout
+        # Appels admis (en attente ou en cours) et appels en cours
+        self.pending = 0
+        self.in_flight = 0
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Délais avant le premier fragment des derniers appels en streaming
+        self.ttft_samples: deque[float] = deque(maxlen=1024)
+
+    @property
+    def provider(self) -> LLMProvider:
+        if isinstance(self._provider, str):
+            self._provider = provider_registry.get(self._provider)
+        return self._provider
+
+    @provider.setter
+    def provider(self, provider: LLMProvider | str) -> None:
+        self._provider = provider
+
+    @property
+    def waiting(self) -> int:
+        return self.pending - self.in_flight
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Un sémaphore est lié à une boucle d'événements ; on en recrée un si la
+        # boucle change (un TestClient par module de tests, par exemple).
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def generate(
+        self, prompt: str, *, timeout: float | None = None, use_cache: bool = True
+    ) -> str:
+        """
+        Génère une réponse. Avec `use_cache=False`, le cache n'est pas consulté
+        mais la nouvelle réponse y remplace l'ancienne.
+        """
+        provider = self.provider
+        if self.cache is None:
+            return await self._generate(prompt, timeout)
+        key = cache_key(provider.model_name, prompt, provider.generation_params)
+        if use_cache:
+            cached = await self.cache.lookup(key)
+            if cached is not None:
+                return cached
+        generated = await self._generate(prompt, timeout)
+        await self.cache.store(key, self.provider.model_name, generated)
+        return generated
+
+    async def _generate(self, prompt: str, timeout: float | None) -> str:
+        if self.pending >= self.max_concurrency + self.max_queue_depth:
+            raise LLMOverloadedError(
+                f"{self.in_flight} LLM calls in flight, {self.waiting} waiting"
+            )
+        semaphore = self._get_semaphore()
+        deadline = timeout if timeout is not None else self.timeout
+        start = time.perf_counter()
+        outcome = "error"
+        self.pending += 1
+        try:
+            generated = await asyncio.wait_for(self._run(semaphore, prompt), deadline)
+            outcome = "ok"
+            return generated
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM call exceeded its {deadline}s deadline")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.pending -= 1
+            llm_call_duration.observe(
+                time.perf_counter() - start, self.provider.model_name, outcome
+            )
+
+    async def stream(
+        self, prompt: str, *, timeout: float | None = None, use_cache: bool = True
+    ) -> AsyncGenerator[str, None]:
+        """
+        Relaie la réponse fragment par fragment. Les erreurs d'admission et
+        d'échéance sont levées à la lecture du premier fragment ; fermer le
+        générateur (déconnexion du client) annule l'appel au fournisseur.
+        """
+        key = cache_key(
+            self.provider.model_name, prompt, self.provider.generation_params
         )
-        return response.text
-    except Exception as e:
-        logger.error(f"Error generating content with Gemini: {e}")
-        raise e
+        if self.cache is not None and use_cache:
+            cached = await self.cache.lookup(key)
+            if cached is not None:
+                yield cached
+                return
+        if self.pending >= self.max_concurrency + self.max_queue_depth:
+            raise LLMOverloadedError(
+                f"{self.in_flight} LLM calls in flight, {self.waiting} waiting"
+            )
+        semaphore = self._get_semaphore()
+        loop = asyncio.get_running_loop()
+        deadline = timeout if timeout is not None else self.timeout
+        started = loop.time()
+        expires_at = started + deadline
+        parts: list[str] = []
+        outcome = "error"
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), deadline)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise LLMTimeoutError(f"LLM call exceeded its {deadline}s deadline")
+            self.in_flight += 1
+            start = loop.time()
+            try:
+                async with aclosing(self.provider.stream(prompt)) as chunks:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(
+                                anext(chunks), expires_at - loop.time()
+                            )
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            outcome = "timeout"
+                            raise LLMTimeoutError(
+                                f"LLM call exceeded its {deadline}s deadline"
+                            )
+                        if not parts:
+                            self.ttft_samples.append(loop.time() - start)
+                        parts.append(chunk)
+                        yield chunk
+                outcome = "ok"
+            finally:
+                self.in_flight -= 1
+                semaphore.release()
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "cancelled"
+            raise
+        finally:
+            self.pending -= 1
+            llm_call_duration.observe(
+                loop.time() - started, self.provider.model_name, outcome
+            )
+        if self.cache is not None:
+            await self.cache.store(key, self.provider.model_name, "".join(parts))
+
+    def stats(self) -> dict[str, Any]:
+        ttft = sorted(self.ttft_samples)
+        return {
+            # Sans forcer la création d'un fournisseur pas encore utilisé
+            "provider": self._provider
+            if isinstance(self._provider, str)
+            else self._provider.model_name,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "ttft_count": len(ttft),
+            "ttft_p50_ms": ttft[len(ttft) // 2] * 1000 if ttft else None,
+            "ttft_p95_ms": ttft[int(len(ttft) * 0.95)] * 1000 if ttft else None,
+        }
+
+    async def _run(self, semaphore: asyncio.Semaphore, prompt: str) -> str:
+        async with semaphore:
+            self.in_flight += 1
+            try:
+                return await self.provider.generate(prompt)
+            except Exception as e:
+                logger.error(
+                    f"Error generating content with {self.provider.model_name}: {e}"
+                )
+                raise
+            finally:
+                self.in_flight -= 1
+
+
+def create_gemini_provider() -> GeminiProvider:
+    # Importé ici : le SDK coûte une bonne partie du démarrage d'un worker
+    from google import genai
+
+    return GeminiProvider(
+        genai.Client(api_key=settings.LLM_API_KEY), settings.LLM_MODEL_NAME
+    )
+
+
+def create_fake_provider() -> FakeProvider:
+    return FakeProvider(latency=settings.LLM_FAKE_LATENCY_SECONDS)
+
+
+class ProviderRegistry:
+    """
+    Fournisseurs LLM par nom, chacun créé à sa première utilisation puis
+    réutilisé : ni l'import du SDK ni la création du client ne sont payés par
+    les processus qui n'appellent pas le LLM (migrations, scripts, tests).
+    """
+
+    def __init__(self) -> None:
+        self._factories: dict[str, Callable[[], LLMProvider]] = {}
+        self._providers: dict[str, LLMProvider] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], LLMProvider]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._providers.pop(name, None)
+
+    def get(self, name: str) -> LLMProvider:
+        provider = self._providers.get(name)
+        if provider is not None:
+            return provider
+        with self._lock:
+            if name not in self._providers:
+                if name not in self._factories:
+                    raise LLMUnavailableError(f"Unknown LLM provider {name!r}")
+                try:
+                    self._providers[name] = self._factories[name]()
+                except Exception as e:
+                    raise LLMUnavailableError(
+                        f"LLM provider {name!r} could not be created: {e}"
+                    ) from e
+            return self._providers[name]
+
+    def created(self, name: str) -> bool:
+        return name in self._providers
+
+
+provider_registry = ProviderRegistry()
+provider_registry.register("gemini", create_gemini_provider)
+provider_registry.register("fake", create_fake_provider)
+
+
+llm_gateway = LLMGateway(
+    settings.LLM_PROVIDER,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue_depth=settings.LLM_MAX_QUEUE_DEPTH,
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    cache=LLMResponseCache(
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl=settings.LLM_CACHE_TTL_SECONDS,
+        persist=settings.LLM_CACHE_PERSIST,
+    )
+    if settings.LLM_CACHE_ENABLED
+    else None,
+)
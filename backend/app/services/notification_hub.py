@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict, deque
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any
+
+import psycopg
+from sqlalchemy import literal, tuple_
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Notification
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "notification"
+RECONNECT_DELAY_SECONDS = 1.0
+LISTEN_TIMEOUT_SECONDS = 5.0
+KEEPALIVE_SECONDS = 15.0
+# Au-delà, l'abonné est trop lent : sa file est vidée et il relit la base
+QUEUE_SIZE = 100
+REPLAY_LIMIT = 500
+
+# (created_at, id) de la dernière notification envoyée ; id à None pour
+# « tout ce qui est créé à partir de created_at »
+Cursor = tuple[datetime, uuid.UUID | None]
+# File d'un flux ouvert : des lignes de notification, ou None pour « relire la base »
+Subscriber = asyncio.Queue[dict[str, Any] | None]
+
+
+class NotificationHub:
+    """
+    Registre, propre à chaque worker, des flux de notifications ouverts.
+
+    Une seule connexion Postgres par worker écoute le canal `notification`
+    (alimenté par un trigger à chaque insertion) et répartit les lignes reçues
+    entre les abonnés du médecin concerné. Les files reçoivent `None` quand des
+    notifications ont pu être perdues (reconnexion, abonné trop lent) : l'abonné
+    doit alors relire la base depuis sa dernière notification.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._subscribers: defaultdict[uuid.UUID, set[Subscriber]] = defaultdict(set)
+        self._task: asyncio.Task[None] | None = None
+        self._ready = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, doctor_id: uuid.UUID) -> AsyncIterator[Subscriber]:
+        await self._ensure_listening()
+        queue: Subscriber = asyncio.Queue(QUEUE_SIZE)
+        self._subscribers[doctor_id].add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(doctor_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[doctor_id]
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _ensure_listening(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # Nouvelle boucle (tests) ou tâche arrêtée : on relance l'écoute
+            self._loop = loop
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._listen())
+        # Les abonnés relisent la base juste après : LISTEN doit déjà être actif
+        await asyncio.wait_for(self._ready.wait(), LISTEN_TIMEOUT_SECONDS)
+
+    async def _listen(self) -> None:
+        connected_before = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.dsn, autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    self._ready.set()
+                    if connected_before:
+                        self._broadcast(None)
+                    connected_before = True
+                    async for notify in conn.notifies():
+                        self._dispatch(json.loads(notify.payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification listener disconnected: {e}")
+                self._ready.clear()
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _dispatch(self, payload: dict[str, Any]) -> None:
+        doctor_id = uuid.UUID(payload["doctor_id"])
+        for queue in self._subscribers.get(doctor_id, ()):
+            _put(queue, payload)
+
+    def _broadcast(self, payload: dict[str, Any] | None) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                _put(queue, payload)
+
+
+def _put(queue: Subscriber, payload: dict[str, Any] | None) -> None:
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+def _cursor_of(notification: Notification) -> Cursor:
+    return notification.created_at, notification.id
+
+
+def _start_cursor(doctor_id: uuid.UUID, last_event_id: str | None) -> Cursor:
+    now: Cursor = datetime.utcnow(), None
+    if not last_event_id:
+        return now
+    try:
+        last_id = uuid.UUID(last_event_id)
+    except ValueError:
+        return now
+    with Session(engine) as session:
+        last = session.get(Notification, last_id)
+    if last is None or last.doctor_id != doctor_id:
+        return now
+    return _cursor_of(last)
+
+
+def _notifications_after(doctor_id: uuid.UUID, cursor: Cursor) -> list[Notification]:
+    created_at, last_id = cursor
+    statement = select(Notification).where(Notification.doctor_id == doctor_id)
+    if last_id is None:
+        statement = statement.where(Notification.created_at >= created_at)
+    else:
+        statement = statement.where(
+            tuple_(col(Notification.created_at), col(Notification.id))
+            > tuple_(literal(created_at), literal(last_id))
+        )
+    statement = statement.order_by(
+        col(Notification.created_at), col(Notification.id)
+    ).limit(REPLAY_LIMIT)
+    with Session(engine) as session:
+        return list(session.exec(statement).all())
+
+
+def _event(notification: Notification) -> str:
+    return (
+        f"id: {notification.id}\n"
+        f"event: notification\n"
+        f"data: {notification.model_dump_json()}\n\n"
+    )
+
+
+async def notification_events(
+    hub: NotificationHub, doctor_id: uuid.UUID, last_event_id: str | None = None
+) -> AsyncGenerator[str, None]:
+    """
+    Flux SSE des nouvelles notifications du médecin.
+
+    Avec `last_event_id` (en-tête Last-Event-ID envoyé à la reconnexion), les
+    notifications créées depuis celle-ci sont d'abord renvoyées depuis la base.
+    """
+    async with hub.subscribe(doctor_id) as queue:
+        cursor = await asyncio.to_thread(_start_cursor, doctor_id, last_event_id)
+        # Les notifications reçues à la fois par la base et par NOTIFY ne sont envoyées qu'une fois
+        sent: deque[uuid.UUID] = deque(maxlen=REPLAY_LIMIT)
+        replay = last_event_id is not None
+        while True:
+            if replay:
+                replay = False
+                backlog = await asyncio.to_thread(
+                    _notifications_after, doctor_id, cursor
+                )
+                for notification in backlog:
+                    if notification.id not in sent:
+                        sent.append(notification.id)
+                        cursor = max(cursor, _cursor_of(notification), key=_sort_key)
+                        yield _event(notification)
+            try:
+                payload = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if payload is None:
+                replay = True
+                continue
+            notification = Notification.model_validate(payload)
+            if notification.id in sent:
+                continue
+            sent.append(notification.id)
+            cursor = max(cursor, _cursor_of(notification), key=_sort_key)
+            yield _event(notification)
+
+
+def _sort_key(cursor: Cursor) -> tuple[datetime, str]:
+    return cursor[0], str(cursor[1] or "")
+
+
+notification_hub = NotificationHub(
+    str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+psycopg", "postgresql")
+)
@@ -0,0 +1,227 @@
+import csv
+import json
+import logging
+import uuid
+from collections.abc import Iterable, Iterator
+from enum import Enum
+from itertools import islice
+from typing import Any
+
+import psycopg
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlmodel import Session, col, select
+
+from app.core.security import get_password_hashes
+from app.models import User, UserCreate, UserImportError, UsersImportReport
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+# Colonnes chargées par COPY, dans l'ordre des lignes écrites
+COLUMNS = (
+    "id",
+    "email",
+    "is_active",
+    "is_superuser",
+    "full_name",
+    "hashed_password",
+    "specialization",
+    "date_of_birth",
+    "doctor_id",
+)
+EMAIL_EXISTS = "The user with this email already exists in the system."
+
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+    @classmethod
+    def from_filename(cls, filename: str) -> "ImportFormat | None":
+        suffix = filename.rsplit(".", 1)[-1].lower()
+        return {"csv": cls.csv, "jsonl": cls.jsonl, "ndjson": cls.jsonl}.get(suffix)
+
+
+def read_rows(
+    stream: Iterable[bytes], file_format: ImportFormat
+) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Lit le fichier au fil de l'eau : `(ligne, champs)` par enregistrement, ou
+    `(ligne, message)` si l'enregistrement est illisible. Les cellules CSV
+    vides valent « absent », pour que les valeurs par défaut s'appliquent.
+    """
+    text_stream = _decode_lines(stream)
+    if file_format is ImportFormat.csv:
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, "More values than columns"
+                continue
+            yield (
+                reader.line_num,
+                {key: value for key, value in row.items() if value},
+            )
+        return
+    for line, raw in enumerate(text_stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except json.JSONDecodeError as e:
+            yield line, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line, "Expected a JSON object"
+            continue
+        yield line, row
+
+
+def _decode_lines(stream: Iterable[bytes]) -> Iterator[str]:
+    # Ligne par ligne plutôt que io.TextIOWrapper : le SpooledTemporaryFile
+    # d'UploadFile n'a pas de readable() avant Python 3.11.
+    for number, raw in enumerate(stream):
+        line = raw.decode("utf-8")
+        yield line.removeprefix("\ufeff") if number == 0 else line
+
+
+def import_patients(
+    session: Session,
+    stream: Iterable[bytes],
+    file_format: ImportFormat,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+) -> UsersImportReport:
+    """
+    Crée les utilisateurs d'un fichier CSV ou JSONL par lots de `chunk_size` :
+    chaque ligne est validée comme `UserCreate`, les mots de passe d'un lot sont
+    hachés en parallèle dans le pool de processus, puis le lot est chargé par
+    COPY et validé. Les lignes refusées (invalides, email déjà pris, médecin
+    inconnu) sont listées dans le rapport sans arrêter l'import ; aucun email
+    de bienvenue n'est envoyé.
+    """
+    report = UsersImportReport(imported=0, errors=[])
+    seen: set[str] = set()
+
+    def valid_rows() -> Iterator[tuple[int, UserCreate]]:
+        for line, row in read_rows(stream, file_format):
+            if isinstance(row, str):
+                report.errors.append(UserImportError(line=line, errors=[row]))
+                continue
+            try:
+                user_in = UserCreate.model_validate(row)
+            except ValidationError as e:
+                email = row.get("email")
+                report.errors.append(
+                    UserImportError(
+                        line=line,
+                        email=email if isinstance(email, str) else None,
+                        errors=[_error_message(error) for error in e.errors()],
+                    )
+                )
+                continue
+            if user_in.email in seen:
+                report.errors.append(
+                    UserImportError(
+                        line=line,
+                        email=user_in.email,
+                        errors=["Duplicate email in the file"],
+                    )
+                )
+                continue
+            seen.add(user_in.email)
+            yield line, user_in
+
+    rows = valid_rows()
+    while chunk := list(islice(rows, chunk_size)):
+        report.imported += _load_chunk(session, chunk, report.errors)
+        logger.info(f"Imported {report.imported} users")
+    report.errors.sort(key=lambda error: error.line)
+    return report
+
+
+def _error_message(error: Any) -> str:
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def _load_chunk(
+    session: Session,
+    chunk: list[tuple[int, UserCreate]],
+    errors: list[UserImportError],
+) -> int:
+    emails = [user_in.email for _, user_in in chunk]
+    existing = set(
+        session.exec(select(User.email).where(col(User.email).in_(emails))).all()
+    )
+    doctor_ids = {user_in.doctor_id for _, user_in in chunk if user_in.doctor_id}
+    doctors = (
+        set(session.exec(select(User.id).where(col(User.id).in_(doctor_ids))).all())
+        if doctor_ids
+        else set()
+    )
+
+    accepted = []
+    for line, user_in in chunk:
+        if user_in.email in existing:
+            errors.append(
+                UserImportError(line=line, email=user_in.email, errors=[EMAIL_EXISTS])
+            )
+        elif user_in.doctor_id and user_in.doctor_id not in doctors:
+            errors.append(
+                UserImportError(
+                    line=line, email=user_in.email, errors=["Doctor not found"]
+                )
+            )
+        else:
+            accepted.append((line, user_in))
+    if not accepted:
+        return 0
+
+    hashes = get_password_hashes([user_in.password for _, user_in in accepted])
+    columns = ", ".join(COLUMNS)
+    # Table de transit : un email créé entre-temps ailleurs ne fait pas échouer
+    # tout le lot, il est écarté par ON CONFLICT et signalé.
+    session.execute(
+        text(
+            'CREATE TEMP TABLE user_import (LIKE "user" INCLUDING DEFAULTS) '
+            "ON COMMIT DROP"
+        )
+    )
+    connection = session.connection().connection.driver_connection
+    assert isinstance(connection, psycopg.Connection)
+    with (
+        connection.cursor() as cursor,
+        cursor.copy(f"COPY user_import ({columns}) FROM STDIN") as copy,
+    ):
+        for (_, user_in), hashed_password in zip(accepted, hashes, strict=True):
+            copy.write_row(
+                (
+                    uuid.uuid4(),
+                    user_in.email,
+                    user_in.is_active,
+                    user_in.is_superuser,
+                    user_in.full_name,
+                    hashed_password,
+                    user_in.specialization,
+                    user_in.date_of_birth,
+                    user_in.doctor_id,
+                )
+            )
+    inserted = set(
+        session.execute(
+            text(
+                f'INSERT INTO "user" ({columns}) SELECT {columns} FROM user_import '
+                "ON CONFLICT (email) DO NOTHING RETURNING email"
+            )
+        ).scalars()
+    )
+    session.commit()
+
+    for line, user_in in accepted:
+        if user_in.email not in inserted:
+            errors.append(
+                UserImportError(line=line, email=user_in.email, errors=[EMAIL_EXISTS])
+            )
+    return len(inserted)
@@ -0,0 +1,91 @@
+from collections.abc import Generator
+
+import pytest
+
+from app.core import query_profiler
+from app.core.config import settings
+
+# Most SQL statements a single request to each route may execute in these
+# tests. A lazy relationship loaded per row, or a new query in a hot route,
+# makes the test that calls the route fail: raise the budget only when the
+# extra statements are intended.
+QUERY_BUDGETS = {
+    "DELETE /items/{id}": 2,
+    # session.delete() loads each relationship of the user once
+    "DELETE /users/me": 9,
+    "DELETE /users/{user_id}": 9,
+    "GET /doctor/appointments": 1,
+    # Plus the doctor's principal when the principal cache entry expired
+    "GET /doctor/dashboard": 2,
+    "GET /doctor/llm/batch/{job_id}": 2,
+    "GET /doctor/llm/cache": 0,
+    "GET /doctor/llm/stats": 0,
+    "GET /doctor/messages": 1,
+    "GET /doctor/notifications": 2,
+    "GET /doctor/notifications/stream": 0,
+    "GET /doctor/notifications/unread-count": 1,
+    "GET /doctor/patients": 1,
+    # Plus the doctor's principal when the principal cache entry expired
+    "GET /doctor/stats/weekly": 2,
+    # Page, count when asked for, and the principal on a cold principal cache
+    "GET /items/": 3,
+    "GET /items/{id}": 2,
+    "GET /medical-records/": 2,
+    "GET /medical-records/{id}/{blob}": 3,
+    "GET /users/": 3,
+    "GET /users/me": 1,
+    "GET /users/{user_id}": 2,
+    "GET /utils/db-pool/": 1,
+    "GET /utils/principal-cache/": 0,
+    "PATCH /users/me": 5,
+    "PATCH /users/me/password": 4,
+    "PATCH /users/{user_id}": 4,
+    # Plus the doctor's principal when the principal cache entry expired
+    "POST /doctor/appointments": 4,
+    "POST /doctor/llm/analyze": 1,
+    "POST /doctor/llm/analyze/stream": 0,
+    # Background job included: one update per prompt of the test batch
+    "POST /doctor/llm/batch": 23,
+    "POST /doctor/messages/bulk": 2,
+    "POST /doctor/messages/send": 2,
+    "POST /doctor/notifications/read": 2,
+    "POST /items/": 3,
+    # Ownership query, then one INSERT, UPDATE and DELETE for the whole batch
+    "POST /items/batch": 5,
+    "POST /login/access-token": 3,
+    "POST /login/test-token": 0,
+    "POST /medical-records/": 4,
+    "POST /password-recovery/{email}": 3,
+    "POST /private/users/": 2,
+    "POST /reset-password/": 3,
+    "POST /users/": 5,
+    # One import chunk; COPY goes through the driver and is not counted
+    "POST /users/import": 5,
+    "POST /users/signup": 3,
+    "PUT /items/{id}": 3,
+}
+
+
+@pytest.fixture(autouse=True)
+def query_budget(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[list[query_profiler.QueryProfile], None, None]:
+    """Profiles the requests of each test and checks them against QUERY_BUDGETS."""
+    profiles: list[query_profiler.QueryProfile] = []
+    monkeypatch.setattr(settings, "SQL_PROFILER_ENABLED", True)
+    query_profiler.profile_hooks.append(profiles.append)
+    try:
+        yield profiles
+    finally:
+        query_profiler.profile_hooks.remove(profiles.append)
+
+    for profile in profiles:
+        route = f"{profile.method} {profile.route.removeprefix(settings.API_V1_STR)}"
+        assert route in QUERY_BUDGETS, f"No query budget for {route}"
+        repeated = "\n".join(
+            f"  {times}x {statement}" for statement, times in profile.repeated()
+        )
+        assert profile.count <= QUERY_BUDGETS[route], (
+            f"{route} executed {profile.count} SQL statements, over its budget of "
+            f"{QUERY_BUDGETS[route]}. Repeated statements:\n{repeated or '  none'}"
+        )
@@ -0,0 +1,49 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import async_reads
+from app.core.config import settings
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    app = FastAPI()
+    app.include_router(async_reads.router, prefix=settings.API_V1_STR)
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/items/?limit=5",
+        "/doctor/notifications?limit=5",
+        "/doctor/patients?limit=5",
+        "/doctor/patients?q=a&limit=5",
+    ],
+)
+def test_async_reads_match_sync(
+    client: TestClient,
+    async_client: TestClient,
+    doctor_token_headers: dict[str, str],
+    path: str,
+) -> None:
+    url = f"{settings.API_V1_STR}{path}"
+    r = client.get(url, headers=doctor_token_headers)
+    assert r.status_code == 200
+    r_async = async_client.get(url, headers=doctor_token_headers)
+    assert r_async.status_code == 200
+    assert r_async.json() == r.json()
+
+
+def test_async_reads_require_a_doctor(
+    async_client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = async_client.get(
+        f"{settings.API_V1_STR}/doctor/notifications",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 403
@@ -0,0 +1,746 @@
+import json
+import uuid
+from collections.abc import Generator
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, col, delete, func, select, update
+
+from app import crud
+from app.backfill_weekly_stats import backfill_weekly_stats
+from app.core.config import settings
+from app.core.query_profiler import QueryProfile
+from app.models import (
+    Appointment,
+    LLMBatchItem,
+    LLMBatchJob,
+    LLMBatchStatusEnum,
+    Notification,
+    NotificationTypeEnum,
+    User,
+    UserCreate,
+    WeeklyAppointmentStats,
+)
+from app.services import llm_batch
+from app.services.llm_service import FakeProvider, llm_gateway
+from app.tests.utils.user import TEST_DOCTOR_EMAIL, create_random_user
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+@pytest.fixture(autouse=True)
+def fake_llm_provider() -> Generator[FakeProvider, None, None]:
+    provider = FakeProvider()
+    llm_gateway.provider = provider
+    if llm_gateway.cache is not None:
+        llm_gateway.cache.clear()
+    yield provider
+    llm_gateway.provider = settings.LLM_PROVIDER
+
+
+def test_llm_analyze(client: TestClient, doctor_token_headers: dict[str, str]) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/analyze",
+        headers=doctor_token_headers,
+        json={"prompt": "Résumé du patient"},
+    )
+    assert r.status_code == 200
+    assert r.json() == {"generated_text": "[fake] Résumé du patient"}
+
+
+def test_llm_analyze_provider_unavailable(
+    client: TestClient, doctor_token_headers: dict[str, str]
+) -> None:
+    llm_gateway.provider = "missing"
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/analyze",
+        headers=doctor_token_headers,
+        json={"prompt": "Résumé du patient"},
+    )
+    assert r.status_code == 503
+    assert "missing" in r.json()["detail"]
+
+
+def test_llm_analyze_not_doctor(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/analyze",
+        headers=normal_user_token_headers,
+        json={"prompt": "Résumé du patient"},
+    )
+    assert r.status_code == 403
+
+
+def test_stream_notifications_not_doctor(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/notifications/stream",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 403
+
+
+def test_notification_feed(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    url = f"{settings.API_V1_STR}/doctor/notifications"
+    unread = client.get(f"{url}/unread-count", headers=doctor_token_headers).json()
+    since = datetime.utcnow()
+    notifications = [
+        Notification(
+            doctor_id=doctor.id,
+            type=NotificationTypeEnum.message,
+            content=f"Fil {i}",
+            created_at=since + timedelta(seconds=i + 1),
+        )
+        for i in range(3)
+    ]
+    db.add_all(notifications)
+    db.commit()
+
+    params: dict[str, str] = {"since": since.isoformat(), "limit": "2"}
+    r = client.get(url, headers=doctor_token_headers, params=params)
+    assert r.status_code == 200
+    page = r.json()
+    assert [n["content"] for n in page["data"]] == ["Fil 2", "Fil 1"]
+    assert page["unread"] == unread["unread"] + 3
+
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={**params, "cursor": page["next_cursor"]},
+    )
+    page = r.json()
+    assert [n["content"] for n in page["data"]] == ["Fil 0"]
+    assert page["next_cursor"] is None
+
+    r = client.post(
+        f"{url}/read",
+        headers=doctor_token_headers,
+        json={"ids": [str(notifications[2].id)]},
+    )
+    assert r.status_code == 200
+    assert r.json() == {"unread": unread["unread"] + 2}
+
+    r = client.post(f"{url}/read", headers=doctor_token_headers, json={})
+    assert r.json() == {"unread": 0}
+    r = client.get(
+        url, headers=doctor_token_headers, params={**params, "unread_only": "true"}
+    )
+    assert r.json()["data"] == []
+
+    r = client.get(url, headers=doctor_token_headers, params={"cursor": "nope"})
+    assert r.status_code == 400
+
+
+def test_llm_analyze_timeout(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    fake_llm_provider: FakeProvider,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake_llm_provider.latency = 1
+    monkeypatch.setattr(llm_gateway, "timeout", 0.01)
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/analyze",
+        headers=doctor_token_headers,
+        json={"prompt": "Résumé du patient"},
+    )
+    assert r.status_code == 504
+
+
+def test_llm_analyze_cache(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    fake_llm_provider: FakeProvider,
+) -> None:
+    url = f"{settings.API_V1_STR}/doctor/llm/analyze"
+    r = client.post(url, headers=doctor_token_headers, json={"prompt": "Bilan  ECG"})
+    assert r.json() == {"generated_text": "[fake] Bilan  ECG"}
+    # Same prompt up to whitespace: served from the cache
+    r = client.post(url, headers=doctor_token_headers, json={"prompt": "Bilan ECG "})
+    assert r.json() == {"generated_text": "[fake] Bilan  ECG"}
+    r = client.post(
+        url,
+        headers=doctor_token_headers,
+        json={"prompt": "Bilan ECG", "bypass_cache": True},
+    )
+    assert r.json() == {"generated_text": "[fake] Bilan ECG"}
+    # The model is part of the key
+    fake_llm_provider.model_name = "other"
+    r = client.post(url, headers=doctor_token_headers, json={"prompt": "Bilan ECG"})
+    assert r.json() == {"generated_text": "[other] Bilan ECG"}
+
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/llm/cache", headers=doctor_token_headers
+    )
+    assert r.status_code == 200
+    stats = r.json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_llm_analyze_stream(
+    client: TestClient, doctor_token_headers: dict[str, str]
+) -> None:
+    with client.stream(
+        "POST",
+        f"{settings.API_V1_STR}/doctor/llm/analyze/stream",
+        headers=doctor_token_headers,
+        json={"prompt": "Bilan du patient"},
+    ) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert "x-time-to-first-token-ms" in r.headers
+        events = [e for e in r.read().decode().split("\n\n") if e]
+
+    texts = [json.loads(e.removeprefix("data: "))["text"] for e in events[:-1]]
+    assert "".join(texts) == "[fake] Bilan du patient"
+    assert len(texts) > 1
+    assert events[-1].startswith("event: done\n")
+
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/llm/stats", headers=doctor_token_headers
+    )
+    assert r.json()["ttft_count"] >= 1
+
+
+def test_llm_analyze_stream_timeout(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    fake_llm_provider: FakeProvider,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake_llm_provider.latency = 1
+    monkeypatch.setattr(llm_gateway, "timeout", 0.01)
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/analyze/stream",
+        headers=doctor_token_headers,
+        json={"prompt": "Bilan du patient"},
+    )
+    assert r.status_code == 504
+    assert llm_gateway.pending == 0
+
+
+def test_llm_batch(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    prompts = [f"Patient {i}" for i in range(5)]
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/batch",
+        headers=doctor_token_headers,
+        json={"prompts": prompts, "notify_each": True},
+    )
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+
+    # The TestClient returns once background tasks are done
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/llm/batch/{job_id}",
+        headers=doctor_token_headers,
+    )
+    assert r.status_code == 200
+    job = r.json()
+    assert job["status"] == "completed"
+    assert job["completed"] == 5
+    assert [item["result"] for item in job["items"]] == [f"[fake] {p}" for p in prompts]
+
+    notifications = db.exec(
+        select(Notification)
+        .join(User, col(User.id) == Notification.doctor_id)
+        .where(
+            User.email == TEST_DOCTOR_EMAIL,
+            col(Notification.content).contains("groupée"),
+        )
+    ).all()
+    assert len(notifications) == 6
+    assert all(n.type == NotificationTypeEnum.analysis for n in notifications)
+
+
+def test_llm_batch_finished_when_an_item_is_not_recorded(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    finish_item = llm_batch._finish_item
+
+    def flaky_finish_item(
+        job_id: uuid.UUID, item_id: uuid.UUID, **kwargs: str | None
+    ) -> None:
+        if kwargs.get("result") == "[fake] Patient 1":
+            raise RuntimeError("connection lost")
+        finish_item(job_id, item_id, **kwargs)
+
+    monkeypatch.setattr(llm_batch, "_finish_item", flaky_finish_item)
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/llm/batch",
+        headers=doctor_token_headers,
+        json={"prompts": [f"Patient {i}" for i in range(3)]},
+    )
+    assert r.status_code == 202
+
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/llm/batch/{r.json()['id']}",
+        headers=doctor_token_headers,
+    )
+    job = r.json()
+    assert job["status"] == "completed"
+    assert (job["completed"], job["failed"]) == (2, 1)
+    assert job["finished_at"] is not None
+    assert [item["status"] for item in job["items"]] == [
+        "completed",
+        "failed",
+        "completed",
+    ]
+    assert job["items"][1]["error"] == "Batch job interrupted"
+
+
+def test_fail_stale_llm_batch_jobs(db: Session) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    stale = LLMBatchJob(
+        doctor_id=doctor.id,
+        status=LLMBatchStatusEnum.running,
+        total=2,
+        completed=1,
+        created_at=long_ago,
+    )
+    fresh = LLMBatchJob(doctor_id=doctor.id, status=LLMBatchStatusEnum.running, total=1)
+    db.add_all([stale, fresh])
+    db.flush()
+    db.add_all(
+        [
+            LLMBatchItem(
+                job_id=stale.id,
+                position=0,
+                prompt="Patient 0",
+                status=LLMBatchStatusEnum.completed,
+                result="[fake] Patient 0",
+                finished_at=long_ago,
+            ),
+            LLMBatchItem(job_id=stale.id, position=1, prompt="Patient 1"),
+            LLMBatchItem(job_id=fresh.id, position=0, prompt="Patient 0"),
+        ]
+    )
+    db.commit()
+
+    assert llm_batch.fail_stale_jobs(stale_after=60) == 1
+    db.expire_all()
+    assert stale.status == LLMBatchStatusEnum.completed
+    assert (stale.completed, stale.failed) == (1, 1)
+    assert stale.finished_at is not None
+    assert [item.status for item in stale.items] == [
+        LLMBatchStatusEnum.completed,
+        LLMBatchStatusEnum.failed,
+    ]
+    assert fresh.status == LLMBatchStatusEnum.running
+    assert db.exec(
+        select(Notification).where(
+            Notification.doctor_id == doctor.id,
+            col(Notification.content).startswith("Analyse groupée interrompue : 1/2"),
+        )
+    ).first()
+    # Déjà clos : pas de seconde notification
+    assert llm_batch.fail_stale_jobs(stale_after=60) == 0
+
+
+def test_llm_batch_not_found(
+    client: TestClient, doctor_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/doctor/llm/batch/{uuid.uuid4()}",
+        headers=doctor_token_headers,
+    )
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Batch job not found"
+
+
+def test_search_patients(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    other_doctor = create_random_user(db)
+    for full_name, doctor_id in [
+        ("Alice Martin", doctor.id),
+        ("Martine Dupont", doctor.id),
+        ("Bob Stone", doctor.id),
+        ("Paul Martin", other_doctor.id),
+    ]:
+        user_in = UserCreate(
+            email=random_email(),
+            password=random_lower_string(),
+            full_name=full_name,
+            doctor_id=doctor_id,
+        )
+        crud.create_user(session=db, user_create=user_in)
+
+    url = f"{settings.API_V1_STR}/doctor/patients"
+    r = client.get(
+        url, headers=doctor_token_headers, params={"q": "martin", "limit": 1}
+    )
+    assert r.status_code == 200
+    page = r.json()
+    assert len(page["data"]) == 1
+    assert page["data"][0]["score"] is not None
+    assert "hashed_password" not in page["data"][0]
+    assert page["next_cursor"]
+
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"q": "martin", "limit": 1, "cursor": page["next_cursor"]},
+    )
+    second_page = r.json()
+    names = {page["data"][0]["full_name"], second_page["data"][0]["full_name"]}
+    assert names == {"Alice Martin", "Martine Dupont"}
+    assert second_page["next_cursor"] is None
+
+    r = client.get(url, headers=doctor_token_headers)
+    assert {p["full_name"] for p in r.json()["data"]} >= {
+        "Alice Martin",
+        "Martine Dupont",
+        "Bob Stone",
+    }
+
+
+def test_send_messages(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    patients = [
+        crud.create_user(
+            session=db,
+            user_create=UserCreate(
+                email=random_email(),
+                password=random_lower_string(),
+                doctor_id=doctor.id,
+            ),
+        )
+        for _ in range(2)
+    ]
+    url = f"{settings.API_V1_STR}/doctor/messages"
+    r = client.post(
+        f"{url}/send",
+        headers=doctor_token_headers,
+        params={"patient_id": str(patients[0].id), "content": "Bonjour"},
+    )
+    assert r.status_code == 200
+    assert r.json()["doctor_id"] == str(doctor.id)
+
+    r = client.post(
+        f"{url}/bulk",
+        headers=doctor_token_headers,
+        json={
+            "messages": [
+                {"patient_id": str(patient.id), "content": f"Rappel {i}"}
+                for i, patient in enumerate(patients * 2)
+            ]
+        },
+    )
+    assert r.status_code == 200
+    assert len(r.json()) == 4
+
+    params: dict[str, str] = {"patient_id": str(patients[0].id), "limit": "2"}
+    r = client.get(url, headers=doctor_token_headers, params=params)
+    assert r.status_code == 200
+    page = r.json()
+    assert len(page["data"]) == 2
+    assert all(m["patient_id"] == str(patients[0].id) for m in page["data"])
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={**params, "cursor": page["next_cursor"]},
+    )
+    rest = r.json()
+    assert len(rest["data"]) == 1
+    assert rest["next_cursor"] is None
+    sent = [m["sent_at"] for m in page["data"] + rest["data"]]
+    assert sent == sorted(sent, reverse=True)
+    assert {m["content"] for m in page["data"] + rest["data"]} == {
+        "Bonjour",
+        "Rappel 0",
+        "Rappel 2",
+    }
+
+
+def test_send_messages_not_own_patient(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    other = create_random_user(db)
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/messages/bulk",
+        headers=doctor_token_headers,
+        json={"messages": [{"patient_id": str(other.id), "content": "Bonjour"}]},
+    )
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Patient not found"
+
+
+def test_appointments(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    patient = create_random_user(db)
+    patient.doctor_id = doctor.id
+    db.add(patient)
+    db.commit()
+    url = f"{settings.API_V1_STR}/doctor/appointments"
+    nine = datetime(2031, 5, 12, 9, 0)
+
+    def book(start: datetime, minutes: int = 30) -> int:
+        r = client.post(
+            url,
+            headers=doctor_token_headers,
+            json={
+                "patient_id": str(patient.id),
+                "starts_at": start.isoformat(),
+                "ends_at": (start + timedelta(minutes=minutes)).isoformat(),
+                "reason": "Consultation",
+            },
+        )
+        return r.status_code
+
+    assert book(nine) == 200
+    # Back to back is fine, any overlap is not
+    assert book(nine + timedelta(minutes=30)) == 200
+    assert book(nine + timedelta(minutes=15)) == 409
+    assert book(nine - timedelta(minutes=10), minutes=90) == 409
+    assert book(nine, minutes=0) == 422
+
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={
+            "start": (nine + timedelta(minutes=20)).isoformat(),
+            "end": (nine + timedelta(hours=2)).isoformat(),
+        },
+    )
+    assert r.status_code == 200
+    starts = [a["starts_at"] for a in r.json()["data"]]
+    assert starts == ["2031-05-12T09:00:00", "2031-05-12T09:30:00"]
+
+
+def test_appointments_mixed_timezones(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    patient = create_random_user(db)
+    patient.doctor_id = doctor.id
+    db.add(patient)
+    db.commit()
+    url = f"{settings.API_V1_STR}/doctor/appointments"
+
+    # 08:00 at UTC+02:00 is 06:00 UTC, before the naive (UTC) 06:30 end
+    r = client.post(
+        url,
+        headers=doctor_token_headers,
+        json={
+            "patient_id": str(patient.id),
+            "starts_at": "2031-06-02T08:00:00+02:00",
+            "ends_at": "2031-06-02T06:30:00",
+        },
+    )
+    assert r.status_code == 200
+    assert r.json()["starts_at"] == "2031-06-02T06:00:00"
+    r = client.post(
+        url,
+        headers=doctor_token_headers,
+        json={
+            "patient_id": str(patient.id),
+            "starts_at": "2031-06-02T09:00:00Z",
+            "ends_at": "2031-06-02T08:30:00",
+        },
+    )
+    assert r.status_code == 422
+
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"start": "2031-06-02T00:00:00Z", "end": "2031-06-03T00:00:00"},
+    )
+    assert r.status_code == 200
+    assert [a["starts_at"] for a in r.json()["data"]] == ["2031-06-02T06:00:00"]
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"start": "2031-06-02T12:00:00+02:00", "end": "2031-06-02T10:00:00"},
+    )
+    assert r.status_code == 422
+
+
+def test_appointment_not_own_patient(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    other = create_random_user(db)
+    r = client.post(
+        f"{settings.API_V1_STR}/doctor/appointments",
+        headers=doctor_token_headers,
+        json={
+            "patient_id": str(other.id),
+            "starts_at": "2031-05-12T14:00:00",
+            "ends_at": "2031-05-12T14:30:00",
+        },
+    )
+    assert r.status_code == 404
+
+
+def test_weekly_stats(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    first, second = create_random_user(db), create_random_user(db)
+    for patient in (first, second):
+        patient.doctor_id = doctor.id
+        db.add(patient)
+    db.commit()
+    monday = datetime(2032, 3, 1, 9, 0)
+    for patient, start in (
+        (first, monday),
+        (first, monday + timedelta(days=2)),
+        (second, monday + timedelta(days=4)),
+        (second, monday + timedelta(days=7)),
+    ):
+        r = client.post(
+            f"{settings.API_V1_STR}/doctor/appointments",
+            headers=doctor_token_headers,
+            json={
+                "patient_id": str(patient.id),
+                "starts_at": start.isoformat(),
+                "ends_at": (start + timedelta(minutes=30)).isoformat(),
+            },
+        )
+        assert r.status_code == 200
+
+    def weekly() -> list[tuple[str, int, int, int]]:
+        r = client.get(
+            f"{settings.API_V1_STR}/doctor/stats/weekly",
+            headers=doctor_token_headers,
+            params={"start": "2032-02-25", "end": "2032-03-14"},
+        )
+        assert r.status_code == 200
+        return [
+            (w["week"], w["iso_week"], w["appointments"], w["patients"])
+            for w in r.json()["data"]
+        ]
+
+    assert weekly() == [
+        ("2032-02-23", 9, 0, 0),
+        ("2032-03-01", 10, 3, 2),
+        ("2032-03-08", 11, 1, 1),
+    ]
+
+    # Moved to the previous week, then cancelled: both weeks follow
+    friday = monday - timedelta(days=3)
+    db.exec(  # type: ignore
+        update(Appointment)
+        .where(
+            col(Appointment.doctor_id) == doctor.id,
+            col(Appointment.starts_at) == monday + timedelta(days=7),
+        )
+        .values(starts_at=friday, ends_at=friday + timedelta(minutes=30))
+    )
+    db.exec(  # type: ignore
+        delete(Appointment).where(
+            col(Appointment.doctor_id) == doctor.id,
+            col(Appointment.starts_at) == monday + timedelta(days=2),
+        )
+    )
+    db.commit()
+    assert weekly() == [
+        ("2032-02-23", 9, 1, 1),
+        ("2032-03-01", 10, 2, 2),
+        ("2032-03-08", 11, 0, 0),
+    ]
+
+    # The backfill repairs a rollup row that drifted
+    row = db.get(WeeklyAppointmentStats, (doctor.id, date(2032, 3, 1)))
+    assert row
+    row.appointments = 40
+    db.add(row)
+    db.commit()
+    backfill_weekly_stats(db, batch_size=1)
+    db.refresh(row)
+    assert (row.appointments, row.patients) == (2, 2)
+
+
+def test_weekly_stats_window(
+    client: TestClient, doctor_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/doctor/stats/weekly"
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"start": "2032-03-14", "end": "2032-03-01"},
+    )
+    assert r.status_code == 422
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"start": "2000-01-01", "end": "2032-01-01"},
+    )
+    assert r.status_code == 422
+
+
+def test_dashboard(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    db: Session,
+    query_budget: list[QueryProfile],
+) -> None:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    patient = create_random_user(db)
+    patient.doctor_id = doctor.id
+    db.add(patient)
+    tomorrow = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    db.add(
+        Appointment(
+            doctor_id=doctor.id,
+            patient_id=patient.id,
+            starts_at=tomorrow,
+            ends_at=tomorrow + timedelta(minutes=30),
+        )
+    )
+    latest = Notification(
+        doctor_id=doctor.id,
+        type=NotificationTypeEnum.consultation,
+        content="Dernière",
+        created_at=datetime.utcnow() + timedelta(hours=1),
+    )
+    db.add(latest)
+    db.commit()
+    url = f"{settings.API_V1_STR}/doctor"
+    # Also caches the doctor's principal
+    unread = client.get(
+        f"{url}/notifications/unread-count", headers=doctor_token_headers
+    )
+
+    r = client.get(
+        f"{url}/dashboard",
+        headers=doctor_token_headers,
+        params={"appointments": 1, "notifications": 2},
+    )
+    assert r.status_code == 200
+    dashboard = r.json()
+    assert query_budget[-1].count == 1
+    assert dashboard["unread_notifications"] == unread.json()["unread"]
+    patients = db.exec(select(func.count()).where(User.doctor_id == doctor.id)).one()
+    assert dashboard["patients"] == patients
+    assert [a["starts_at"] for a in dashboard["upcoming_appointments"]] == [
+        tomorrow.isoformat()
+    ]
+    recent = dashboard["recent_notifications"]
+    assert len(recent) == 2
+    assert recent[0]["id"] == str(latest.id)
+    assert recent[0]["type"] == "consultation"
+    assert recent[0]["created_at"] > recent[1]["created_at"]
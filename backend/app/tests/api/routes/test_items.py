@@ -3,7 +3,10 @@ import uuid
 from fastapi.testclient import TestClient
 from sqlmodel import Session
 
+from app import crud
 from app.core.config import settings
+from app.core.query_profiler import QueryProfile
+from app.models import Item, ItemCreate
 from app.tests.utils.item import create_random_item
 
 
@@ -79,6 +82,38 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_cursor(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    for i in range(3):
+        client.post(
+            f"{settings.API_V1_STR}/items/",
+            headers=normal_user_token_headers,
+            json={"title": f"Item {i}"},
+        )
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"limit": 2, "count": "exact"},
+    )
+    first_page = r.json()
+    assert len(first_page["data"]) == 2
+    assert first_page["count"] >= 3
+    assert first_page["next_cursor"]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"limit": 2, "cursor": first_page["next_cursor"]},
+    )
+    second_page = r.json()
+    assert second_page["data"]
+    assert second_page["count"] is None
+    first_ids = {item["id"] for item in first_page["data"]}
+    assert first_ids.isdisjoint(item["id"] for item in second_page["data"])
+    assert max(first_ids) < min(item["id"] for item in second_page["data"])
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -162,3 +197,57 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_batch_items(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    query_budget: list[QueryProfile],
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    mine = [
+        crud.create_item(
+            session=db, item_in=ItemCreate(title=f"Mine {i}"), owner_id=user.id
+        )
+        for i in range(4)
+    ]
+    other = create_random_item(db)
+    missing = uuid.uuid4()
+    operations = [
+        {"op": "create", "item": {"title": "New", "description": "Batch"}},
+        {"op": "update", "id": str(mine[0].id), "item": {"description": "Changed"}},
+        {"op": "update", "id": str(mine[1].id), "item": {"title": "Renamed"}},
+        {"op": "delete", "id": str(mine[2].id)},
+        {"op": "delete", "id": str(other.id)},
+        {"op": "update", "id": str(missing), "item": {"title": "Nope"}},
+        {"op": "delete", "id": str(mine[0].id)},
+        {"op": "update", "id": str(mine[1].id), "item": {"title": "Again"}},
+        {"op": "update", "id": str(mine[3].id), "item": {"title": None}},
+    ]
+    response = client.post(
+        f"{settings.API_V1_STR}/items/batch",
+        headers=normal_user_token_headers,
+        json={"operations": operations},
+    )
+    assert response.status_code == 200
+    results = response.json()["data"]
+    statuses = [r["status"] for r in results]
+    assert statuses == [200, 200, 200, 200, 400, 404, 400, 400, 422]
+    assert results[1]["item"]["title"] == "Mine 0"
+    assert results[1]["item"]["description"] == "Changed"
+    # One ownership query and one statement per kind of change, whatever the
+    # number of operations
+    assert not query_budget[-1].repeated()
+
+    created = db.get(Item, uuid.UUID(results[0]["item"]["id"]))
+    assert created
+    assert created.owner_id == user.id
+    deleted_id = mine[2].id
+    db.expire_all()
+    assert (mine[0].title, mine[0].description) == ("Mine 0", "Changed")
+    assert mine[1].title == "Renamed"
+    assert mine[3].title == "Mine 3"
+    assert db.get(Item, deleted_id) is None
+    assert db.get(Item, other.id)
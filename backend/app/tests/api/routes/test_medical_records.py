@@ -0,0 +1,195 @@
+import re
+import uuid
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.config import settings
+from app.models import MedicalRecord, UserCreate
+from app.move_medical_record_blobs import move_inline_blobs
+from app.services.blob_store import LocalBlobStore, blob_store
+from app.tests.utils.user import TEST_DOCTOR_EMAIL
+from app.tests.utils.utils import random_email, random_lower_string
+
+PDF = b"%PDF-1.4 " + bytes(range(256)) * 10
+
+
+@pytest.fixture(autouse=True)
+def blob_root(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Generator[Path, None, None]:
+    assert isinstance(blob_store, LocalBlobStore)
+    monkeypatch.setattr(blob_store, "root", tmp_path)
+    yield tmp_path
+
+
+def create_patient(db: Session) -> uuid.UUID:
+    doctor = crud.get_user_by_email(session=db, email=TEST_DOCTOR_EMAIL)
+    assert doctor
+    user_in = UserCreate(
+        email=random_email(), password=random_lower_string(), doctor_id=doctor.id
+    )
+    return crud.create_user(session=db, user_create=user_in).id
+
+
+def create_record(
+    client: TestClient, headers: dict[str, str], patient_id: uuid.UUID
+) -> dict[str, Any]:
+    r = client.post(
+        f"{settings.API_V1_STR}/medical-records/",
+        headers=headers,
+        data={
+            "patient_id": str(patient_id),
+            "record_date": "2024-05-01",
+            "description": "Bilan cardiaque",
+        },
+        files={"pdf_resume": ("bilan.pdf", PDF, "application/pdf")},
+    )
+    assert r.status_code == 200
+    record: dict[str, Any] = r.json()
+    return record
+
+
+def test_create_and_download_medical_record(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    record = create_record(client, doctor_token_headers, create_patient(db))
+    assert record["pdf_resume_size"] == len(PDF)
+    assert record["pdf_resume_content_type"] == "application/pdf"
+    assert record["scanner_image_key"] is None
+
+    url = f"{settings.API_V1_STR}/medical-records/{record['id']}/pdf_resume"
+    r = client.get(url, headers=doctor_token_headers)
+    assert r.status_code == 200
+    assert r.content == PDF
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"] == f'"{record["pdf_resume_key"]}"'
+
+    r = client.get(url, headers={**doctor_token_headers, "Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == PDF[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(PDF)}"
+
+    r = client.get(url, headers={**doctor_token_headers, "Range": "bytes=-5"})
+    assert r.status_code == 206
+    assert r.content == PDF[-5:]
+
+    r = client.get(url, headers={**doctor_token_headers, "Range": f"bytes={len(PDF)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(PDF)}"
+
+    r = client.get(
+        f"{settings.API_V1_STR}/medical-records/{record['id']}/scanner_image",
+        headers=doctor_token_headers,
+    )
+    assert r.status_code == 404
+
+
+def test_medical_record_not_own_patient(
+    client: TestClient,
+    doctor_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+) -> None:
+    patient_id = create_patient(db)
+    r = client.post(
+        f"{settings.API_V1_STR}/medical-records/",
+        headers=normal_user_token_headers,
+        data={
+            "patient_id": str(patient_id),
+            "record_date": "2024-05-01",
+            "description": "Bilan cardiaque",
+        },
+    )
+    assert r.status_code == 403
+
+    record = create_record(client, doctor_token_headers, patient_id)
+    r = client.get(
+        f"{settings.API_V1_STR}/medical-records/{record['id']}/pdf_resume",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 403
+
+
+def test_move_inline_blobs(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    record = MedicalRecord(
+        patient_id=create_patient(db),
+        record_date="2020-01-01",
+        description="Ancien dossier",
+        pdf_resume=PDF,
+    )
+    db.add(record)
+    db.commit()
+    record_id = record.id
+
+    # Legacy rows are served from the table until they are moved
+    url = f"{settings.API_V1_STR}/medical-records/{record_id}/pdf_resume"
+    r = client.get(url, headers={**doctor_token_headers, "Range": "bytes=0-3"})
+    assert r.content == b"%PDF"
+
+    assert move_inline_blobs(db, blob_store, batch_size=1) >= 1
+    moved = db.get(MedicalRecord, record_id)
+    assert moved
+    inline = db.exec(
+        select(MedicalRecord.pdf_resume).where(MedicalRecord.id == record_id)
+    ).one()
+    assert inline is None
+    assert moved.pdf_resume_size == len(PDF)
+    assert blob_store.exists(moved.pdf_resume_key or "")
+
+    r = client.get(url, headers=doctor_token_headers)
+    assert r.content == PDF
+
+
+def test_read_medical_records(
+    client: TestClient, doctor_token_headers: dict[str, str], db: Session
+) -> None:
+    patient_id = create_patient(db)
+    for record_date in ["2021-03-01", "2023-07-15", "2022-11-30"]:
+        db.add(
+            MedicalRecord(
+                patient_id=patient_id,
+                record_date=record_date,
+                description="Consultation",
+                scanner_image=PDF,
+            )
+        )
+    db.commit()
+
+    url = f"{settings.API_V1_STR}/medical-records/"
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={"patient_id": str(patient_id), "limit": 2},
+    )
+    assert r.status_code == 200
+    page = r.json()
+    assert [rec["record_date"] for rec in page["data"]] == ["2023-07-15", "2022-11-30"]
+    assert "scanner_image" not in page["data"][0]
+
+    r = client.get(
+        url,
+        headers=doctor_token_headers,
+        params={
+            "patient_id": str(patient_id),
+            "limit": 2,
+            "cursor": page["next_cursor"],
+        },
+    )
+    page = r.json()
+    assert [rec["record_date"] for rec in page["data"]] == ["2021-03-01"]
+    assert page["next_cursor"] is None
+
+
+def test_medical_record_blobs_are_deferred() -> None:
+    columns = re.findall(r"medicalrecord\.(\w+)", str(select(MedicalRecord)))
+    assert "pdf_resume_size" in columns
+    assert "pdf_resume" not in columns
+    assert "scanner_image" not in columns
@@ -8,6 +8,7 @@ from app import crud
 from app.core.config import settings
 from app.core.security import verify_password
 from app.models import User, UserCreate
+from app.tests.utils.user import user_authentication_headers
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -163,11 +164,70 @@ def test_retrieve_users(
     all_users = r.json()
 
     assert len(all_users["data"]) > 1
-    assert "count" in all_users
+    # Only counted on request
+    assert all_users["count"] is None
     for item in all_users["data"]:
         assert "email" in item
 
 
+def test_retrieve_users_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(3):
+        user_in = UserCreate(email=random_email(), password=random_lower_string())
+        crud.create_user(session=db, user_create=user_in)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "exact"},
+    )
+    total = r.json()["count"]
+
+    seen: list[str] = []
+    params: dict[str, str | int] = {"limit": 2}
+    while True:
+        r = client.get(
+            f"{settings.API_V1_STR}/users/",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert r.status_code == 200
+        page = r.json()
+        assert page["count"] is None
+        seen.extend(user["id"] for user in page["data"])
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    assert len(seen) == total
+    assert seen == sorted(seen)
+
+
+def test_retrieve_users_estimated_count(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"count": "estimated"},
+    )
+    assert r.status_code == 200
+    assert isinstance(r.json()["count"], int)
+
+
+def test_retrieve_users_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid cursor"
+
+
 def test_update_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -346,6 +406,40 @@ def test_update_user(
     assert user_db.full_name == "Updated_full_name"
 
 
+def test_principal_cache_invalidated_on_update(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    username = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=username, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    headers = user_authentication_headers(
+        client=client, email=username, password=password
+    )
+
+    stats_url = f"{settings.API_V1_STR}/utils/principal-cache/"
+    hits = client.get(stats_url, headers=superuser_token_headers).json()["hits"]
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    # The superuser's own lookup for the stats request is a hit as well
+    assert (
+        client.get(stats_url, headers=superuser_token_headers).json()["hits"]
+        >= hits + 2
+    )
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Inactive user"
+
+
 def test_update_user_not_exists(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -484,3 +578,96 @@ def test_delete_user_without_privileges(
     )
     assert r.status_code == 403
     assert r.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_import_users_csv(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    doctor = crud.create_user(
+        session=db,
+        user_create=UserCreate(
+            email=random_email(),
+            password=random_lower_string(),
+            specialization="Cardiology",
+        ),
+    )
+    first, second = random_email(), random_email()
+    password = random_lower_string()
+    content = "\n".join(
+        [
+            "email,password,full_name,date_of_birth,doctor_id",
+            f"{first},{password},Alice Martin,1990-01-01,{doctor.id}",
+            f"{second},{password},,,",
+            f"not-an-email,{password},,,",
+            f"{first},{password},Alice Martin,,",
+            f"{doctor.email},{password},,,",
+            f"{random_email()},{password},,,{uuid.uuid4()}",
+            f"{random_email()},short,,,",
+        ]
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=superuser_token_headers,
+        files={"file": ("patients.csv", content.encode())},
+    )
+    assert r.status_code == 200
+    report = r.json()
+    assert report["imported"] == 2
+    errors = {e["line"]: e["errors"] for e in report["errors"]}
+    assert sorted(errors) == [4, 5, 6, 7, 8]
+    assert errors[4][0].startswith("email: value is not a valid email address")
+    assert errors[5] == ["Duplicate email in the file"]
+    assert errors[6] == ["The user with this email already exists in the system."]
+    assert errors[7] == ["Doctor not found"]
+    assert errors[8] == ["password: String should have at least 8 characters"]
+
+    user = crud.get_user_by_email(session=db, email=first)
+    assert user
+    assert user.full_name == "Alice Martin"
+    assert user.doctor_id == doctor.id
+    assert verify_password(password, user.hashed_password)
+    user = crud.get_user_by_email(session=db, email=second)
+    assert user
+    assert user.full_name is None
+    assert user.is_active
+
+
+def test_import_users_jsonl(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    email = random_email()
+    content = "\n".join(
+        [
+            f'{{"email": "{email}", "password": "{random_lower_string()}"}}',
+            "{not json",
+            "[]",
+        ]
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=superuser_token_headers,
+        files={"file": ("patients.jsonl", content.encode())},
+    )
+    assert r.status_code == 200
+    report = r.json()
+    assert report["imported"] == 1
+    assert [e["line"] for e in report["errors"]] == [2, 3]
+    assert crud.get_user_by_email(session=db, email=email)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=superuser_token_headers,
+        files={"file": ("patients.xlsx", b"")},
+    )
+    assert r.status_code == 422
+
+
+def test_import_users_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=normal_user_token_headers,
+        files={"file": ("patients.csv", b"email,password\n")},
+    )
+    assert r.status_code == 403
@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.db import check_connection_budget
+
+
+def test_db_pool_stats(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    stats = r.json()
+    assert stats["size"] == settings.POSTGRES_POOL_SIZE
+    assert stats["checkouts"] >= 1
+    assert stats["timeouts"] == 0
+
+
+def test_db_pool_stats_not_superuser(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
+
+
+def test_connection_budget(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    assert check_connection_budget()
+    monkeypatch.setattr(settings, "WORKERS", 10_000)
+    assert not check_connection_budget()
+    assert "over max_connections" in caplog.text
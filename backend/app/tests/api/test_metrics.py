@@ -0,0 +1,100 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+from app.core.query_profiler import HEADER, QueryProfile
+from app.services.llm_service import FakeProvider, LLMGateway
+
+
+def sample(text: str, line_start: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {line_start!r}")
+
+
+def test_metrics_per_route(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    client.get(
+        f"{settings.API_V1_STR}/items/00000000-0000-0000-0000-000000000000",
+        headers=normal_user_token_headers,
+    )
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    route = f'method="GET",route="{settings.API_V1_STR}/items/{{id}}"'
+    assert sample(r.text, f'http_requests_total{{{route},status="404"}}') >= 1
+    assert sample(r.text, f"http_request_duration_seconds_count{{{route}}}") >= 1
+    assert sample(r.text, f"http_request_db_statements_sum{{{route}}}") >= 1
+    assert sample(r.text, "db_statements_total") >= 1
+
+
+def test_metrics_token(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scraper-token")
+    assert client.get("/metrics").status_code == 401
+    r = client.get("/metrics", headers={"Authorization": "Bearer scraper-token"})
+    assert r.status_code == 200
+
+
+def test_llm_call_duration(client: TestClient) -> None:
+    gateway = LLMGateway(
+        FakeProvider(model_name="metrics-test"),
+        max_concurrency=1,
+        max_queue_depth=1,
+        timeout=5,
+    )
+    asyncio.run(gateway.generate("Bonjour"))
+
+    r = client.get("/metrics")
+    labels = 'model="metrics-test",outcome="ok"'
+    assert sample(r.text, f"llm_call_duration_seconds_count{{{labels}}}") == 1
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    histogram = Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+
+    assert histogram.samples() == [
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1.0"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 3.65',
+        'latency_count{route="/a"} 4',
+    ]
+
+
+def test_sql_profile_header(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    assert HEADER not in r.headers
+
+    monkeypatch.setattr(settings, "SQL_PROFILER_ENABLED", True)
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    assert r.headers[HEADER].startswith("queries=")
+
+
+def test_sql_profile_repeated_statements(caplog: pytest.LogCaptureFixture) -> None:
+    by_id = "SELECT * FROM item WHERE owner_id = %(owner_id)s"
+    profile = QueryProfile(
+        "GET",
+        "/users/",
+        [("SELECT * FROM user", 0.001)] + [(by_id, 0.0005)] * 4,
+    )
+
+    assert profile.count == 5
+    assert profile.repeated() == [(by_id, 4)]
+    assert profile.header() == "queries=5; time_ms=3.00; repeated=3"
+    with caplog.at_level(logging.INFO, logger="app.core.query_profiler"):
+        profile.log()
+    assert "Possible N+1 in GET /users/: statement executed 4 times" in caplog.text
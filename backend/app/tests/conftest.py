@@ -7,8 +7,16 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
-from app.tests.utils.user import authentication_token_from_email
+from app.models import (
+    Appointment,
+    Item,
+    LLMBatchJob,
+    MedicalRecord,
+    Notification,
+    OutboundEmail,
+    User,
+)
+from app.tests.utils.user import TEST_DOCTOR_EMAIL, authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
 
@@ -17,6 +25,16 @@ def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         init_db(session)
         yield session
+        statement = delete(OutboundEmail)
+        session.execute(statement)
+        statement = delete(Appointment)
+        session.execute(statement)
+        statement = delete(LLMBatchJob)
+        session.execute(statement)
+        statement = delete(Notification)
+        session.execute(statement)
+        statement = delete(MedicalRecord)
+        session.execute(statement)
         statement = delete(Item)
         session.execute(statement)
         statement = delete(User)
@@ -40,3 +58,10 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture(scope="module")
+def doctor_token_headers(client: TestClient, db: Session) -> dict[str, str]:
+    return authentication_token_from_email(
+        client=client, email=TEST_DOCTOR_EMAIL, db=db, specialization="Cardiology"
+    )
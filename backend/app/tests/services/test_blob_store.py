@@ -0,0 +1,43 @@
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+
+from app.services.blob_store import (
+    BlobNotFoundError,
+    LocalBlobStore,
+    iter_range,
+)
+
+
+def test_put_is_content_addressed(tmp_path: Path) -> None:
+    store = LocalBlobStore(tmp_path)
+    content = b"scan" * 100_000
+
+    info = store.put(io.BytesIO(content))
+    assert info.key == hashlib.sha256(content).hexdigest()
+    assert info.size == len(content)
+    assert store.put(io.BytesIO(content)) == info
+    # One file per content, no temporary file left behind
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == [
+        tmp_path / info.key[:2] / info.key[2:4] / info.key
+    ]
+
+    with store.open(info.key) as f:
+        assert f.read() == content
+
+
+def test_open_missing_blob(tmp_path: Path) -> None:
+    store = LocalBlobStore(tmp_path)
+    with pytest.raises(BlobNotFoundError):
+        store.open("0" * 64)
+    with pytest.raises(BlobNotFoundError):
+        store.open("../../etc/passwd")
+    assert not store.exists("0" * 64)
+
+
+def test_iter_range() -> None:
+    file = io.BytesIO(b"0123456789")
+    assert b"".join(iter_range(file, 2, 5, chunk_size=3)) == b"2345"
+    assert file.closed
@@ -0,0 +1,143 @@
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import EmailStatusEnum, OutboundEmail
+from app.services.email_queue import EmailWorker, SMTPConnectionPool, enqueue_email
+from app.tests.utils.smtp import LocalSMTPServer
+from app.tests.utils.utils import random_email
+
+
+@pytest.fixture
+def smtp() -> Generator[LocalSMTPServer, None, None]:
+    with LocalSMTPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def worker(smtp: LocalSMTPServer) -> Generator[EmailWorker, None, None]:
+    pool = SMTPConnectionPool(1, idle_timeout=60, connect=smtp.connect)
+    worker = EmailWorker(pool, concurrency=1, batch_size=50)
+    # Emails queued by other tests go out first
+    worker.run_once()
+    yield worker
+    worker.stop()
+
+
+def enqueue(db: Session) -> OutboundEmail:
+    return enqueue_email(
+        db, email_to=random_email(), subject="Test", html_content="<p>Bonjour</p>"
+    )
+
+
+def reload(db: Session, email: OutboundEmail) -> OutboundEmail:
+    reloaded = db.get(OutboundEmail, email.id, populate_existing=True)
+    assert reloaded
+    return reloaded
+
+
+def test_worker_sends_over_one_connection(
+    db: Session, smtp: LocalSMTPServer, worker: EmailWorker
+) -> None:
+    emails = [enqueue(db) for _ in range(3)]
+
+    assert worker.run_once() == 3
+    assert smtp.recipients()[-3:] == [e.email_to for e in emails]
+    assert smtp.connections == 1
+    assert all(reload(db, e).status == EmailStatusEnum.sent for e in emails)
+    assert worker.stats()["sent"] >= 3
+    assert worker.pool.opened == 1
+
+
+def test_worker_retries_temporary_failure(
+    db: Session, smtp: LocalSMTPServer, worker: EmailWorker
+) -> None:
+    smtp.failures.append("451 Try again later")
+    email = enqueue(db)
+
+    assert worker.run_once() == 1
+    email = reload(db, email)
+    assert email.status == EmailStatusEnum.pending
+    assert email.attempts == 1
+    assert email.last_error and "451" in email.last_error
+    assert email.next_attempt_at > datetime.utcnow()
+    assert worker.run_once() == 0
+
+    email.next_attempt_at = datetime.utcnow()
+    db.add(email)
+    db.commit()
+    assert worker.run_once() == 1
+    assert reload(db, email).status == EmailStatusEnum.sent
+    assert smtp.recipients()[-1] == email.email_to
+
+
+def test_worker_claims_emails_before_sending(
+    db: Session, worker: EmailWorker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    email = enqueue(db)
+    send = worker._send
+    seen: list[tuple[EmailStatusEnum, datetime]] = []
+
+    def checked_send(
+        email_to: str, subject: str, html_content: str
+    ) -> Exception | None:
+        # The claim is committed: another session sees it while the email goes out
+        with Session(engine) as other:
+            claimed = other.get(OutboundEmail, email.id)
+            assert claimed
+            seen.append((claimed.status, claimed.next_attempt_at))
+        return send(email_to, subject, html_content)
+
+    monkeypatch.setattr(worker, "_send", checked_send)
+    assert worker.run_once() == 1
+    [(status, lease)] = seen
+    assert status == EmailStatusEnum.sending
+    assert lease > datetime.utcnow()
+    assert reload(db, email).status == EmailStatusEnum.sent
+
+
+def test_worker_reclaims_expired_claim(
+    db: Session, smtp: LocalSMTPServer, worker: EmailWorker
+) -> None:
+    email = enqueue(db)
+    email.status = EmailStatusEnum.sending
+    email.next_attempt_at = datetime.utcnow() + timedelta(minutes=5)
+    db.add(email)
+    db.commit()
+    assert worker.run_once() == 0
+
+    # The worker holding the claim stopped before recording the result
+    email.next_attempt_at = datetime.utcnow()
+    db.add(email)
+    db.commit()
+    assert worker.run_once() == 1
+    assert reload(db, email).status == EmailStatusEnum.sent
+    assert smtp.recipients()[-1] == email.email_to
+
+
+def test_worker_gives_up_on_permanent_failure(
+    db: Session, smtp: LocalSMTPServer, worker: EmailWorker
+) -> None:
+    smtp.failures.append("550 No such user")
+    email = enqueue(db)
+
+    assert worker.run_once() == 1
+    email = reload(db, email)
+    assert email.status == EmailStatusEnum.failed
+    assert email.attempts == 1
+    assert worker.stats()["failed"] == 1
+
+
+def test_email_queue_stats(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/email-queue/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    assert {"pending", "sending", "sent", "sent_per_second"} <= r.json().keys()
@@ -0,0 +1,192 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, col, delete
+
+from app.models import LLMCacheEntry
+from app.services.llm_service import (
+    FakeProvider,
+    LLMGateway,
+    LLMOverloadedError,
+    LLMResponseCache,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    ProviderRegistry,
+    cache_key,
+)
+from app.tests.utils.utils import random_lower_string
+
+
+class CountingProvider(FakeProvider):
+    def __init__(self, latency: float) -> None:
+        super().__init__(latency=latency)
+        self.current = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            return await super().generate(prompt)
+        finally:
+            self.current -= 1
+
+
+def test_gateway_bounds_concurrency() -> None:
+    provider = CountingProvider(latency=0.02)
+    gateway = LLMGateway(provider, max_concurrency=2, max_queue_depth=10, timeout=5)
+
+    async def run() -> list[str]:
+        return await asyncio.gather(*(gateway.generate(f"p{i}") for i in range(6)))
+
+    results = asyncio.run(run())
+    assert results == [f"[fake] p{i}" for i in range(6)]
+    assert provider.peak == 2
+    assert gateway.in_flight == 0
+    assert gateway.waiting == 0
+
+
+def test_gateway_rejects_when_queue_is_full() -> None:
+    gateway = LLMGateway(
+        FakeProvider(latency=0.05), max_concurrency=1, max_queue_depth=1, timeout=5
+    )
+
+    async def run() -> None:
+        running = asyncio.ensure_future(gateway.generate("running"))
+        queued = asyncio.ensure_future(gateway.generate("queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError):
+            await gateway.generate("rejected")
+        await asyncio.gather(running, queued)
+
+    asyncio.run(run())
+
+
+def test_gateway_deadline() -> None:
+    gateway = LLMGateway(
+        FakeProvider(latency=1), max_concurrency=1, max_queue_depth=1, timeout=0.01
+    )
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(gateway.generate("slow"))
+    assert gateway.in_flight == 0
+
+
+def test_cache_key_normalizes_prompt() -> None:
+    assert cache_key("m", " Bilan\n ECG ", {}) == cache_key("m", "Bilan ECG", {})
+    assert cache_key("m", "Bilan ECG", {}) != cache_key("n", "Bilan ECG", {})
+    assert cache_key("m", "Bilan ECG", {}) != cache_key(
+        "m", "Bilan ECG", {"temperature": 0}
+    )
+
+
+def test_cache_lru_and_ttl() -> None:
+    cache = LLMResponseCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    cache.set("d", "4", ttl=0)
+    assert cache.get("d") is None
+
+
+def test_gateway_uses_cache() -> None:
+    provider = CountingProvider(latency=0)
+    gateway = LLMGateway(
+        provider,
+        max_concurrency=1,
+        max_queue_depth=1,
+        timeout=5,
+        cache=LLMResponseCache(max_entries=10, ttl=60),
+    )
+
+    async def run() -> None:
+        await gateway.generate("same")
+        await gateway.generate("same")
+        await gateway.generate("same", use_cache=False)
+
+    asyncio.run(run())
+    assert provider.calls == 2
+    assert gateway.cache is not None
+    assert gateway.cache.stats()["hits"] == 1
+
+
+def test_persisted_cache_is_shared(db: Session) -> None:
+    key = cache_key("fake", random_lower_string(), {})
+    writer = LLMResponseCache(max_entries=10, ttl=60, persist=True)
+    reader = LLMResponseCache(max_entries=10, ttl=60, persist=True)
+
+    asyncio.run(writer.store(key, "fake", "réponse"))
+    assert asyncio.run(reader.lookup(key)) == "réponse"
+    assert reader.shared_hits == 1
+
+    db.exec(delete(LLMCacheEntry).where(col(LLMCacheEntry.key) == key))  # type: ignore
+    db.commit()
+
+
+def test_persisted_cache_prunes_expired_entries(db: Session) -> None:
+    expired_key = cache_key("fake", random_lower_string(), {})
+    expired = LLMCacheEntry(
+        key=expired_key,
+        model="fake",
+        response="périmée",
+        expires_at=datetime.utcnow() - timedelta(minutes=1),
+    )
+    db.add(expired)
+    db.commit()
+    key = cache_key("fake", random_lower_string(), {})
+    cache = LLMResponseCache(max_entries=10, ttl=60, persist=True)
+
+    asyncio.run(cache.store(key, "fake", "réponse"))
+    db.expire_all()
+    assert db.get(LLMCacheEntry, expired_key) is None
+    assert db.get(LLMCacheEntry, key) is not None
+
+    db.exec(delete(LLMCacheEntry).where(col(LLMCacheEntry.key) == key))  # type: ignore
+    db.commit()
+
+
+def test_gateway_stream_close_releases_slot() -> None:
+    gateway = LLMGateway(
+        FakeProvider(), max_concurrency=1, max_queue_depth=0, timeout=5
+    )
+
+    async def run() -> None:
+        chunks = gateway.stream("un deux trois")
+        assert await anext(chunks) == "[fake]"
+        assert gateway.in_flight == 1
+        # What the SSE response does when the client goes away
+        await chunks.aclose()
+        assert gateway.in_flight == 0
+        assert gateway.pending == 0
+        assert await gateway.generate("encore") == "[fake] encore"
+
+    asyncio.run(run())
+    assert len(gateway.ttft_samples) == 1
+
+
+def test_provider_registry_creates_on_first_use() -> None:
+    registry = ProviderRegistry()
+    created: list[FakeProvider] = []
+
+    def create() -> FakeProvider:
+        created.append(FakeProvider())
+        return created[-1]
+
+    registry.register("fake", create)
+    assert not registry.created("fake")
+    assert registry.get("fake") is registry.get("fake") is created[0]
+    assert len(created) == 1
+
+    def fail() -> FakeProvider:
+        raise ValueError("Missing key inputs argument!")
+
+    registry.register("broken", fail)
+    with pytest.raises(LLMUnavailableError, match="Missing key"):
+        registry.get("broken")
+    with pytest.raises(LLMUnavailableError, match="Unknown"):
+        registry.get("missing")
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models import Notification, NotificationTypeEnum
+from app.services.notification_hub import (
+    NotificationHub,
+    notification_events,
+    notification_hub,
+)
+from app.tests.utils.user import create_random_user
+
+
+def insert_notification(doctor_id: uuid.UUID, content: str) -> uuid.UUID:
+    with Session(engine) as session:
+        notification = Notification(
+            doctor_id=doctor_id, type=NotificationTypeEnum.message, content=content
+        )
+        session.add(notification)
+        session.commit()
+        return notification.id
+
+
+def new_hub() -> NotificationHub:
+    # A hub of its own, bound to this test's event loop
+    return NotificationHub(notification_hub.dsn)
+
+
+def test_notification_events_pushes_inserts(db: Session) -> None:
+    doctor = create_random_user(db)
+    other_doctor = create_random_user(db)
+    hub = new_hub()
+
+    async def run() -> str:
+        events = notification_events(hub, doctor.id)
+        next_event = asyncio.ensure_future(anext(events))
+        while hub.subscriber_count == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(insert_notification, other_doctor.id, "autre")
+        notification_id = await asyncio.to_thread(
+            insert_notification, doctor.id, "nouveau message"
+        )
+        event = await asyncio.wait_for(next_event, 5)
+        assert event.startswith(f"id: {notification_id}\nevent: notification\n")
+        await events.aclose()
+        assert hub.subscriber_count == 0
+        await hub.close()
+        return event
+
+    assert "nouveau message" in asyncio.run(run())
+
+
+def test_notification_events_resume_from_last_event_id(db: Session) -> None:
+    doctor = create_random_user(db)
+    first = insert_notification(doctor.id, "premier")
+    second = insert_notification(doctor.id, "second")
+    hub = new_hub()
+
+    async def run() -> str:
+        events = notification_events(hub, doctor.id, last_event_id=str(first))
+        event = await asyncio.wait_for(anext(events), 5)
+        await events.aclose()
+        await hub.close()
+        return event
+
+    assert asyncio.run(run()).startswith(f"id: {second}\n")
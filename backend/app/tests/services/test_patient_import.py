@@ -0,0 +1,32 @@
+import tempfile
+
+from app.services.patient_import import ImportFormat, read_rows
+
+
+def test_read_rows_spooled_upload() -> None:
+    # What UploadFile.file is; before Python 3.11 it has no readable()
+    with tempfile.SpooledTemporaryFile() as upload:
+        upload.write(
+            "\ufeffemail,full_name\r\n"
+            'a@example.com,"Martin,\r\nAlice"\r\n'
+            "b@example.com,\r\n".encode()
+        )
+        upload.seek(0)
+        rows = list(read_rows(upload, ImportFormat.csv))
+
+    assert rows == [
+        (3, {"email": "a@example.com", "full_name": "Martin,\r\nAlice"}),
+        (4, {"email": "b@example.com"}),
+    ]
+
+
+def test_read_rows_jsonl() -> None:
+    lines = [b'{"email": "a@example.com"}\n', b"\n", b"[1]\n", b"{oops\n"]
+
+    rows = list(read_rows(lines, ImportFormat.jsonl))
+
+    assert rows == [
+        (1, {"email": "a@example.com"}),
+        (3, "Expected a JSON object"),
+        (4, "Invalid JSON: Expecting property name enclosed in double quotes"),
+    ]
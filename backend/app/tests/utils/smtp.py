@@ -0,0 +1,89 @@
+import smtplib
+import socketserver
+import threading
+from types import TracebackType
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        smtp = self.server.owner
+        with smtp.lock:
+            smtp.connections += 1
+        self.reply("220 localhost ready")
+        recipients: list[str] = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b""
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data += chunk
+                with smtp.lock:
+                    failure = smtp.failures.pop(0) if smtp.failures else None
+                    if failure is None:
+                        smtp.messages.append((recipients, data))
+                self.reply(failure or "250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    owner: "LocalSMTPServer"
+
+
+class LocalSMTPServer:
+    """
+    Minimal SMTP server on localhost recording the messages it accepts.
+    Replies queued in `failures` are returned, in order, instead of accepting
+    the next messages.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.messages: list[tuple[list[str], bytes]] = []
+        self.failures: list[str] = []
+        self.connections = 0
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+
+    def connect(self) -> smtplib.SMTP:
+        return smtplib.SMTP("127.0.0.1", self.port, timeout=5)
+
+    def recipients(self) -> list[str]:
+        with self.lock:
+            return [to for recipients, _ in self.messages for to in recipients]
+
+    def __enter__(self) -> "LocalSMTPServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self._server.shutdown()
+        self._server.server_close()
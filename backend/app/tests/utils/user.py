@@ -6,6 +6,8 @@ from app.core.config import settings
 from app.models import User, UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
 
+TEST_DOCTOR_EMAIL = "doctor-test@example.com"
+
 
 def user_authentication_headers(
     *, client: TestClient, email: str, password: str
@@ -28,7 +30,7 @@ def create_random_user(db: Session) -> User:
 
 
 def authentication_token_from_email(
-    *, client: TestClient, email: str, db: Session
+    *, client: TestClient, email: str, db: Session, specialization: str | None = None
 ) -> dict[str, str]:
     """
     Return a valid token for the user with given email.
@@ -38,7 +40,9 @@ def authentication_token_from_email(
     password = random_lower_string()
     user = crud.get_user_by_email(session=db, email=email)
     if not user:
-        user_in_create = UserCreate(email=email, password=password)
+        user_in_create = UserCreate(
+            email=email, password=password, specialization=specialization
+        )
         user = crud.create_user(session=db, user_create=user_in_create)
     else:
         user_in_update = UserUpdate(password=password)
@@ -9,5 +9,8 @@ python app/backend_pre_start.py
 # Run migrations
 alembic upgrade head
 
+# Move medical record files still stored in the database to the blob store
+python app/move_medical_record_blobs.py
+
 # Create initial data in DB
 python app/initial_data.py
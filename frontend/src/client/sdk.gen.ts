@@ -65,6 +65,7 @@ export class ItemsService {
       query: {
         skip: data.skip,
         limit: data.limit,
+        count: data.count,
       },
       errors: {
         422: "Validation Error",
@@ -291,6 +292,7 @@ export class UsersService {
       query: {
         skip: data.skip,
         limit: data.limit,
+        count: data.count,
       },
       errors: {
         422: "Validation Error",
@@ -9,6 +9,8 @@ export type Body_login_login_access_token = {
   client_secret?: string | null
 }
 
+export type CountMode = "none" | "estimated" | "exact"
+
 export type HTTPValidationError = {
   detail?: Array<ValidationError>
 }
@@ -27,7 +29,7 @@ export type ItemPublic = {
 
 export type ItemsPublic = {
   data: Array<ItemPublic>
-  count: number
+  count: number | null
 }
 
 export type ItemUpdate = {
@@ -78,7 +80,7 @@ export type UserRegister = {
 
 export type UsersPublic = {
   data: Array<UserPublic>
-  count: number
+  count: number | null
 }
 
 export type UserUpdate = {
@@ -101,6 +103,7 @@ export type ValidationError = {
 }
 
 export type ItemsReadItemsData = {
+  count?: CountMode
   limit?: number
   skip?: number
 }
@@ -159,6 +162,7 @@ export type LoginRecoverPasswordHtmlContentData = {
 export type LoginRecoverPasswordHtmlContentResponse = string
 
 export type UsersReadUsersData = {
+  count?: CountMode
   limit?: number
   skip?: number
 }
@@ -23,7 +23,11 @@ const PER_PAGE = 5
 function getUsersQueryOptions({ page }: { page: number }) {
   return {
     queryFn: () =>
-      UsersService.readUsers({ skip: (page - 1) * PER_PAGE, limit: PER_PAGE }),
+      UsersService.readUsers({
+        skip: (page - 1) * PER_PAGE,
+        limit: PER_PAGE,
+        count: "exact",
+      }),
     queryKey: ["users", { page }],
   }
 }